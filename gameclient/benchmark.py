@@ -0,0 +1,228 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""A small benchmark harness that can catch performance regressions.
+
+A Benchmark is a named function, called repeatedly with the value its
+setup function returns. Measure times it for at least min_time seconds, a
+few times over, and keeps the best rate, since noise only ever slows a
+run down. As a leak check, it also counts the GC-tracked objects
+(containers: lists, tuples, dicts, instances) that each call leaves
+alive: 0 for code that cleans up after itself, more for code that leaks
+or grows a cache. This is not an allocation count; objects that are
+allocated and freed within a call are not seen.
+
+Results are saved as JSON by Save and read back by Load, and Compare
+checks a run against a saved baseline: a benchmark has regressed if its
+rate fell by more than the threshold. run_benchmarks.py is the suite.
+"""
+
+import gc
+import json
+import platform
+import re
+import time
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+FORMAT_VERSION = 2
+
+
+class Benchmark(object):
+  """A function to time.
+
+  Attributes:
+    name: A dotted name, e.g. 'cardlib.deck'.
+    func: Called as func(arg), where arg is what setup returned.
+    setup: A function of no arguments, called once before timing, or None
+           (func is then called with None).
+    ops: The number of operations one call of func performs, so that
+         cheap operations can be looped inside func.
+  """
+  def __init__(self, name, func, setup=None, ops=1):
+    self.name = name
+    self.func = func
+    self.setup = setup
+    self.ops = ops
+
+
+class Result(object):
+  """The measurements of one Benchmark.
+
+  Attributes:
+    name: The benchmark's name.
+    ops_per_sec: The best rate of operations per second.
+    retained_per_op: The GC-tracked objects left alive per operation.
+    calls: The number of calls of func in the best run.
+  """
+  def __init__(self, name, ops_per_sec, retained_per_op, calls):
+    self.name = name
+    self.ops_per_sec = ops_per_sec
+    self.retained_per_op = retained_per_op
+    self.calls = calls
+
+  def ToDict(self):
+    return {'ops_per_sec': self.ops_per_sec,
+            'retained_per_op': self.retained_per_op, 'calls': self.calls}
+
+  def __repr__(self):
+    return '<Result %s: %.1f ops/s, %.2f retained/op>' % (
+        self.name, self.ops_per_sec, self.retained_per_op)
+
+
+def _Time(func, arg, calls):
+  start = time.time()
+  for _ in xrange(calls):
+    func(arg)
+  return time.time() - start
+
+
+def _Retained(func, arg, calls):
+  """Returns the GC-tracked objects left alive by calls of func."""
+  gc.collect()
+  enabled = gc.isenabled()
+  gc.disable()
+  try:
+    before = gc.get_count()[0]
+    for _ in xrange(calls):
+      func(arg)
+    return gc.get_count()[0] - before
+  finally:
+    if enabled:
+      gc.enable()
+
+
+def Measure(bench, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+  """Time a Benchmark.
+
+  Arguments:
+    bench: The Benchmark.
+    min_time: The least number of seconds for one timed run.
+    repeat: The number of timed runs; the fastest is kept.
+
+  Returns:
+    A Result.
+  """
+  arg = None
+  if bench.setup is not None:
+    arg = bench.setup()
+  # Warm up, and find how many calls take min_time.
+  calls = 1
+  while True:
+    elapsed = _Time(bench.func, arg, calls)
+    if elapsed >= min_time:
+      break
+    if elapsed <= 0:
+      calls *= 10
+    else:
+      calls = max(calls + 1, int(calls * min(10.0, 1.2 * min_time / elapsed)))
+  best = elapsed
+  for _ in xrange(repeat - 1):
+    best = min(best, _Time(bench.func, arg, calls))
+  # The difference of two counts cancels the loop's own constant overhead.
+  counted = min(calls, 100)
+  retained = (_Retained(bench.func, arg, 2 * counted)
+              - _Retained(bench.func, arg, counted))
+  return Result(bench.name, bench.ops * calls / max(best, 1e-9),
+                max(0.0, float(retained) / (bench.ops * counted)), calls)
+
+
+def Run(benchmarks, pattern=None, min_time=DEFAULT_MIN_TIME,
+        repeat=DEFAULT_REPEAT, report=None):
+  """Measure several Benchmarks.
+
+  Arguments:
+    benchmarks: A sequence of Benchmarks.
+    pattern: A regular expression; only benchmarks whose names it
+             matches (re.search) are run.
+    min_time, repeat: As for Measure.
+    report: A function called with each Result as it is measured, or None.
+
+  Returns:
+    The list of Results, in the order of benchmarks.
+  """
+  results = []
+  for bench in benchmarks:
+    if pattern is not None and not re.search(pattern, bench.name):
+      continue
+    result = Measure(bench, min_time, repeat)
+    if report is not None:
+      report(result)
+    results.append(result)
+  return results
+
+
+def Save(results, out):
+  """Write Results to a file-like object as JSON."""
+  json.dump({'version': FORMAT_VERSION,
+             'python': platform.python_version(),
+             'machine': platform.machine(),
+             'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'results': dict((r.name, r.ToDict()) for r in results)},
+            out, indent=2, sort_keys=True)
+  out.write('\n')
+
+
+def Load(f):
+  """Read Results saved by Save from a file-like object.
+
+  Returns:
+    A dict mapping benchmark names to Results.
+
+  Raises:
+    Error if the file is not a saved benchmark run.
+  """
+  try:
+    data = json.load(f)
+    version = data.get('version')
+    if version not in (1, FORMAT_VERSION):
+      raise Error('Unknown benchmark file version %r.' % version)
+    # Version 1 called retained_per_op allocs_per_op.
+    retained = version == 1 and 'allocs_per_op' or 'retained_per_op'
+    return dict((name, Result(name, r['ops_per_sec'], r[retained],
+                              r['calls']))
+                for name, r in data['results'].iteritems())
+  except (ValueError, KeyError, AttributeError, TypeError), e:
+    raise Error('Not a benchmark file: %s' % e)
+
+
+class Regression(object):
+  """A benchmark that is slower than its baseline."""
+  def __init__(self, name, baseline, current):
+    self.name = name
+    self.baseline = baseline
+    self.current = current
+    self.ratio = current / baseline
+
+  def __str__(self):
+    return '%s: %.1f ops/s, was %.1f (%+.1f%%)' % (
+        self.name, self.current, self.baseline, 100 * (self.ratio - 1))
+
+
+def Compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+  """Find the benchmarks that have regressed.
+
+  Arguments:
+    results: A sequence of Results.
+    baseline: A dict mapping names to Results, as returned by Load.
+    threshold: The fraction by which a rate may fall before it counts as
+               a regression.
+
+  Returns:
+    A list of Regressions; benchmarks missing from baseline are skipped.
+  """
+  regressions = []
+  for r in results:
+    base = baseline.get(r.name)
+    if base is None or base.ops_per_sec <= 0:
+      continue
+    if r.ops_per_sec < base.ops_per_sec * (1 - threshold):
+      regressions.append(Regression(r.name, base.ops_per_sec,
+                                    r.ops_per_sec))
+  return regressions
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient import benchmark
+
+import StringIO
+import unittest
+
+
+class TestBenchmark(unittest.TestCase):
+  def testMeasure(self):
+    calls = []
+    bench = benchmark.Benchmark('count', lambda arg: calls.append(arg),
+                                setup=lambda: [], ops=10)
+    result = benchmark.Measure(bench, min_time=0.01, repeat=2)
+    self.assertEqual(result.name, 'count')
+    self.failUnless(result.calls > 1)
+    self.failUnless(result.ops_per_sec > 10 * result.calls / 1.0)
+    # The setup value is passed through, even when it is false.
+    self.assertEqual(calls[0], [])
+
+  def testRetained(self):
+    kept = []
+    leaky = benchmark.Benchmark('leak', lambda _: kept.append([]))
+    tidy = benchmark.Benchmark('tidy', lambda _: [[], []])
+    self.assertEqual(benchmark.Measure(leaky, 0.01, 1).retained_per_op, 1.0)
+    self.assertEqual(benchmark.Measure(tidy, 0.01, 1).retained_per_op, 0.0)
+
+  def testRun(self):
+    benches = [benchmark.Benchmark(name, lambda _: None)
+               for name in ('a.x', 'a.y', 'b.x')]
+    seen = []
+    results = benchmark.Run(benches, 'x$', 0.01, 1, seen.append)
+    self.assertEqual([r.name for r in results], ['a.x', 'b.x'])
+    self.assertEqual(seen, results)
+
+  def testSaveAndCompare(self):
+    results = [benchmark.Result('a', 100.0, 0.0, 10),
+               benchmark.Result('b', 200.0, 1.5, 20)]
+    out = StringIO.StringIO()
+    benchmark.Save(results, out)
+    baseline = benchmark.Load(StringIO.StringIO(out.getvalue()))
+    self.assertEqual(sorted(baseline), ['a', 'b'])
+    self.assertEqual(baseline['b'].ops_per_sec, 200.0)
+    self.assertEqual(baseline['b'].retained_per_op, 1.5)
+    now = [benchmark.Result('a', 95.0, 0.0, 10),
+           benchmark.Result('b', 150.0, 0.0, 10),
+           benchmark.Result('c', 1.0, 0.0, 10)]
+    regressions = benchmark.Compare(now, baseline, threshold=0.1)
+    self.assertEqual([r.name for r in regressions], ['b'])
+    self.assertEqual(regressions[0].ratio, 0.75)
+    self.assertEqual(benchmark.Compare(now, baseline, threshold=0.3), [])
+    self.assertRaises(benchmark.Error, benchmark.Load,
+                      StringIO.StringIO('[1, 2]'))
+    self.assertRaises(benchmark.Error, benchmark.Load,
+                      StringIO.StringIO('{"version": 99}'))
+    old = benchmark.Load(StringIO.StringIO(
+        '{"version": 1, "results": {"a": {"ops_per_sec": 1.0, '
+        '"allocs_per_op": 2.0, "calls": 3}}}'))
+    self.assertEqual(old['a'].retained_per_op, 2.0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""A board: one deal with its auction, play and result.
+
+Boards are what the pbn and lin modules read and write. Seats are offsets
+into Rules.players, with 0 for North, 1 for East, 2 for South and 3 for
+West.
+"""
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+SEATS = 'NESW'
+SEAT_INDEX = dict((s, i) for i, s in enumerate(SEATS))
+
+# Suits in the order that hand records list them.
+SUITS_DOWN = (cardlib.Card.SPADES, cardlib.Card.HEARTS,
+              cardlib.Card.DIAMONDS, cardlib.Card.CLUBS)
+# Rank characters, indexed by the rank's position in a CardSet lane.
+RANKS_UP = '23456789TJQKA'
+_RANK_POSITION = dict((r, i) for i, r in enumerate(RANKS_UP))
+_RANK_POSITION['0'] = _RANK_POSITION['T']
+
+# Cards keyed by (suit abbreviation, rank character) and the reverse, so
+# that parsers and writers reuse the interned cards.
+_CARDS = {}
+_CARD_NAMES = {}
+for _suit in SUITS_DOWN:
+  for _position, _rank in enumerate(RANKS_UP):
+    _card = cardlib.Card(_suit, _position + 2)
+    _CARDS[(_suit.abbrev, _rank)] = _card
+    _CARD_NAMES[_card] = (_suit.abbrev, _rank)
+  _CARDS[(_suit.abbrev, '0')] = _CARDS[(_suit.abbrev, 'T')]
+del _suit, _position, _rank, _card
+
+
+def LookupCard(suit, rank):
+  """Returns the Card for a suit abbreviation and a rank character.
+
+  Raises:
+    Error if there is no such card.
+  """
+  try:
+    return _CARDS[(suit.upper(), rank.upper())]
+  except KeyError:
+    raise Error('"%s%s" is not a card.' % (suit, rank))
+
+
+def CardName(card):
+  """Returns (suit abbreviation, rank character) for a Card."""
+  return _CARD_NAMES[card]
+
+
+def SuitBits(ranks, suit):
+  """Returns the CardSet bits for a string of rank characters in suit.
+
+  Raises:
+    Error if a rank character is unknown.
+  """
+  shift = suit.index * cardlib.SUIT_BITS
+  bits = 0
+  for r in ranks:
+    try:
+      bits |= 1 << (_RANK_POSITION[r] + shift)
+    except KeyError:
+      raise Error('"%s" is not a rank.' % r)
+  return bits
+
+
+def SuitRanks(hand, suit):
+  """Returns the rank characters of hand's cards in suit, from the top."""
+  lane = hand.SuitBits(suit)
+  return ''.join(RANKS_UP[i] for i in xrange(cardlib.SUIT_BITS - 1, -1, -1)
+                 if lane >> i & 1)
+
+
+def TrickWinner(cards, leader, trump):
+  """Like Rules.EvaluateTrick, with trump a Card.Suit or None."""
+  return rules.TRICKS.Winner(cards, leader, trump)
+
+
+# The vulnerability of boards 1 to 16 under the usual rotation, as
+# (N-S, E-W); board 17 is like board 1, and so on.
+_VULNERABILITY = ((False, False), (True, False), (False, True), (True, True),
+                  (True, False), (False, True), (True, True), (False, False),
+                  (False, True), (True, True), (False, False), (True, False),
+                  (True, True), (False, False), (True, False), (False, True))
+
+
+def BoardDealer(number):
+  """Returns the dealer's seat for a board number; board 1 is North's."""
+  return (number - 1) % 4
+
+
+def BoardVulnerability(number):
+  """Returns (N-S vulnerable, E-W vulnerable) for a board number."""
+  return _VULNERABILITY[(number - 1) % len(_VULNERABILITY)]
+
+
+class Board(object):
+  """A deal, its auction, play and result, and any other tags."""
+  def __init__(self, number=None, dealer=None, vulnerable=(False, False),
+               hands=None, auction=None, contract=None, play=None,
+               result=None, tags=None):
+    """Initialize a Board.
+
+    Arguments:
+      number: The board number, or None.
+      dealer: The dealer's seat, or None.
+      vulnerable: A pair of bools, whether N-S and E-W are vulnerable.
+      hands: A list of 4 cardlib.CardSets indexed by seat, or None.
+      auction: A list of rules.Calls starting with the dealer's, or None.
+      contract: A rules.Contract whose declarer is a seat, or None.
+      play: A list of cardlib.Cards in the order played, or None.
+      result: The number of tricks taken by declarer, or None.
+      tags: A list of (name, value) pairs for anything else recorded.
+    """
+    self.number = number
+    self.dealer = dealer
+    self.vulnerable = vulnerable
+    self.hands = hands
+    self.auction = auction
+    self.contract = contract
+    self.play = play
+    self.result = result
+    self.tags = tags or []
+
+  def Trump(self):
+    """Returns the trump suit of the contract, or None at no trump."""
+    if self.contract is None or self.contract.level == 0:
+      return None
+    return self.contract.strain.suit
+
+  def OpeningLeader(self):
+    """Returns the seat on lead to the first trick, or None."""
+    if self.contract is None or self.contract.level == 0:
+      return None
+    return (self.contract.declarer + 1) % 4
+
+  def Tricks(self):
+    """Split the play into tricks.
+
+    Returns:
+      A list of (leader, cards) pairs in the order played; the last trick
+      may be incomplete.
+    """
+    tricks = []
+    if not self.play:
+      return tricks
+    leader = self.OpeningLeader()
+    trump = self.Trump()
+    for i in xrange(0, len(self.play), 4):
+      cards = self.play[i:i + 4]
+      tricks.append((leader, cards))
+      if len(cards) == 4:
+        leader = TrickWinner(cards, leader, trump)
+    return tricks
+
+  def __eq__(self, other):
+    if not isinstance(other, Board):
+      return False
+    return (self.number == other.number and self.dealer == other.dealer
+            and tuple(self.vulnerable) == tuple(other.vulnerable)
+            and self.hands == other.hands
+            and _CallIndexes(self.auction) == _CallIndexes(other.auction)
+            and str(self.contract) == str(other.contract)
+            and getattr(self.contract, 'declarer', None)
+                == getattr(other.contract, 'declarer', None)
+            and self.play == other.play and self.result == other.result)
+  def __ne__(self, other):
+    return not self == other
+
+  def __repr__(self):
+    return ('Board(number=%r, dealer=%r, vulnerable=%r, hands=%r, '
+            'auction=%r, contract=%r, play=%r, result=%r, tags=%r)'
+            % (self.number, self.dealer, self.vulnerable, self.hands,
+               self.auction, self.contract, self.play, self.result,
+               self.tags))
+
+
+def _CallIndexes(calls):
+  # Bids do not compare with other calls, so compare indexes instead.
+  if calls is None:
+    return None
+  return [c.index for c in calls]
+
+
+def AuctionContract(dealer, calls):
+  """Returns the rules.Contract that calls end in, with a seat declarer.
+
+  Returns None if the auction is not over.
+  """
+  return rules.Auction(range(4), dealer, calls).contract
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import board
+
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+def _Cards(shorts):
+  return [cardlib.Card.NewCard(s) for s in shorts.split()]
+
+
+class TestBoard(unittest.TestCase):
+  def testCards(self):
+    self.failUnless(board.LookupCard('s', 't') is cardlib.Card.NewCard('0S'))
+    self.failUnless(board.LookupCard('H', 'A') is cardlib.Card.NewCard('AH'))
+    self.assertEqual(board.CardName(cardlib.Card.NewCard('0D')), ('D', 'T'))
+    self.assertRaises(board.Error, board.LookupCard, 'X', 'A')
+    hand = cardlib.CardSet.FromBits(board.SuitBits('AT2', cardlib.Card.HEARTS))
+    self.assertEqual(hand, cardlib.CardSet(_Cards('AH 0H 2H')))
+    self.assertEqual(board.SuitRanks(hand, cardlib.Card.HEARTS), 'AT2')
+    self.assertRaises(board.Error, board.SuitBits, 'AZ', cardlib.Card.CLUBS)
+
+  def testTrickWinner(self):
+    spades = cardlib.Card.SPADES
+    self.assertEqual(board.TrickWinner(_Cards('2H AH 3S KH'), 1, None), 2)
+    self.assertEqual(board.TrickWinner(_Cards('2H AH 3S KH'), 1, spades), 3)
+    self.assertEqual(board.TrickWinner(_Cards('2H 3D 3C 4C'), 3, None), 3)
+
+  def testTricks(self):
+    contract = rules.Contract(rules.Bid(4, 'S'), 0)
+    b = board.Board(contract=contract,
+                    play=_Cards('2H AH 3S KH 4S 5S 6S 7S 8D'))
+    self.assertEqual(b.OpeningLeader(), 1)
+    self.assertEqual([(leader, len(cards)) for leader, cards in b.Tricks()],
+                     [(1, 4), (3, 4), (2, 1)])
+    self.assertEqual(board.Board().Tricks(), [])
+
+  def testAuctionContract(self):
+    calls = [rules.Pass(), rules.Bid(1, 'S'), rules.Pass(), rules.Bid(4, 'S'),
+             rules.Pass(), rules.Pass(), rules.Pass()]
+    contract = board.AuctionContract(3, calls)
+    self.assertEqual((str(contract), contract.declarer), ('4S', 0))
+    self.assertEqual(board.AuctionContract(3, calls[:-1]), None)
+
+
+  def testBoardNumbers(self):
+    self.assertEqual([board.BoardDealer(n) for n in (1, 2, 4, 5, 16)],
+                     [0, 1, 3, 0, 3])
+    self.assertEqual(board.BoardVulnerability(1), (False, False))
+    self.assertEqual(board.BoardVulnerability(7), (True, True))
+    self.assertEqual(board.BoardVulnerability(16), (False, True))
+    self.assertEqual(board.BoardVulnerability(17), (False, False))
+
+if __name__ == '__main__':
+  unittest.main()
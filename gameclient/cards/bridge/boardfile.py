@@ -0,0 +1,313 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""A compact binary file format for boards.
+
+A board file is a 16-byte header followed by fixed-size records, one per
+board.Board. The header is the magic string 'GCBF', a format version byte,
+a reserved byte, the number of auction bytes per record (little-endian
+uint16) and the record size (uint16), then padding. A record holds, in
+order and little-endian:
+
+  number    uint32  The board number, or 0 if unknown.
+  dealer    uint8   The dealer's seat, or NO_SEAT.
+  flags     uint8   VUL_NS | VUL_EW | HAS_DEAL | HAS_AUCTION.
+  contract  uint8   0 if unknown, PASSED_OUT, or the Call.index of the bid.
+  declarer  uint8   The declarer's seat | DOUBLED | REDOUBLED.
+  result    int8    Declarer's tricks, or -1 if unknown.
+  deal      13 B    The seat of each card, two bits per card by
+                    Card.index, four cards to a byte from the low bits.
+  play      52 B    Card.index + 1 of each card in the order played; 0
+                    pads.
+  auction   n B     Call.index + 1 of each call; 0 pads.
+
+BoardFile memory-maps a file and builds a board only when asked for it;
+Records exposes the data as a NumPy structured array without copying.
+"""
+
+import mmap
+import os
+import struct
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+MAGIC = 'GCBF'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHH6x')
+DEFAULT_AUCTION_BYTES = 40
+DEFAULT_BUFFER_BOARDS = 1000
+
+NO_SEAT = 4
+VUL_NS = 1
+VUL_EW = 2
+HAS_DEAL = 4
+HAS_AUCTION = 8
+PASSED_OUT = 1
+DOUBLED = 4
+REDOUBLED = 8
+
+_DEAL_BYTES = 13
+_PLAY_BYTES = 52
+
+
+def _RecordStruct(auction_bytes):
+  return struct.Struct('<IBBBBb%ds%ds%ds'
+                       % (_DEAL_BYTES, _PLAY_BYTES, auction_bytes))
+
+
+def RecordDtype(auction_bytes=DEFAULT_AUCTION_BYTES):
+  """Returns the NumPy dtype of a record."""
+  if numpy is None:
+    raise Error('RecordDtype requires NumPy.')
+  return numpy.dtype([('number', '<u4'), ('dealer', 'u1'), ('flags', 'u1'),
+                      ('contract', 'u1'), ('declarer', 'u1'),
+                      ('result', 'i1'), ('deal', 'u1', (_DEAL_BYTES,)),
+                      ('play', 'u1', (_PLAY_BYTES,)),
+                      ('auction', 'u1', (auction_bytes,))])
+
+
+def PackDeal(hands):
+  """Returns the 13-byte packed form of 4 CardSets indexed by seat."""
+  seats = [0] * 52
+  for seat, hand in enumerate(hands):
+    bits = hand.bits
+    while bits:
+      low = bits & -bits
+      seats[low.bit_length() - 1] = seat
+      bits ^= low
+  return ''.join(chr(seats[i] | seats[i + 1] << 2 | seats[i + 2] << 4
+                     | seats[i + 3] << 6) for i in xrange(0, 52, 4))
+
+
+# _SPREAD[b] is the (N, E, S, W) bits that the 4 cards of byte b give each
+# seat, with the byte's first card at bit 0.
+_SPREAD = []
+for _b in xrange(256):
+  _masks = [0] * 4
+  for _k in xrange(4):
+    _masks[_b >> 2 * _k & 3] |= 1 << _k
+  _SPREAD.append(tuple(_masks))
+del _b, _masks, _k
+
+
+def UnpackDeal(packed):
+  """Returns the 4 CardSets, indexed by seat, of a packed deal."""
+  n = e = s = w = 0
+  for i, c in enumerate(packed):
+    shift = 4 * i
+    bn, be, bs, bw = _SPREAD[ord(c)]
+    n |= bn << shift
+    e |= be << shift
+    s |= bs << shift
+    w |= bw << shift
+  return [cardlib.CardSet.FromBits(h) for h in (n, e, s, w)]
+
+
+def _Pack(b, record, auction_bytes):
+  flags = 0
+  if b.vulnerable[0]:
+    flags |= VUL_NS
+  if b.vulnerable[1]:
+    flags |= VUL_EW
+  deal = ''
+  if b.hands is not None:
+    if None in b.hands:
+      raise Error('Board %s has unknown hands.' % b.number)
+    flags |= HAS_DEAL
+    deal = PackDeal(b.hands)
+  contract = 0
+  declarer = NO_SEAT
+  if b.contract is not None:
+    if b.contract.level == 0:
+      contract = PASSED_OUT
+    else:
+      contract = rules.Bid(b.contract.level, b.contract.strain).index
+      declarer = b.contract.declarer
+      if b.contract.doubled:
+        declarer |= DOUBLED
+      if b.contract.redoubled:
+        declarer |= REDOUBLED
+  if b.auction is not None:
+    flags |= HAS_AUCTION
+  auction = ''.join(chr(c.index + 1) for c in b.auction or ())
+  if len(auction) > auction_bytes:
+    raise Error('Board %s has %d calls; records hold %d.'
+                % (b.number, len(auction), auction_bytes))
+  play = ''.join(chr(c.index + 1) for c in b.play or ())
+  dealer = b.dealer
+  if dealer is None:
+    dealer = NO_SEAT
+  result = b.result
+  if result is None:
+    result = -1
+  return record.pack(b.number or 0, dealer, flags, contract, declarer,
+                     result, deal, play, auction)
+
+
+def _Unpack(data, offset, record):
+  (number, dealer, flags, contract, declarer, result, deal, play,
+   auction) = record.unpack_from(data, offset)
+  b = board.Board()
+  if number:
+    b.number = number
+  if dealer != NO_SEAT:
+    b.dealer = dealer
+  b.vulnerable = (bool(flags & VUL_NS), bool(flags & VUL_EW))
+  if flags & HAS_DEAL:
+    b.hands = UnpackDeal(deal)
+  if contract == PASSED_OUT:
+    b.contract = rules.Contract(None, None)
+  elif contract:
+    b.contract = rules.Contract(rules.ALL_CALLS[contract], declarer & 3,
+                                bool(declarer & DOUBLED),
+                                bool(declarer & REDOUBLED))
+  if result >= 0:
+    b.result = result
+  if flags & HAS_AUCTION:
+    b.auction = [rules.ALL_CALLS[ord(c) - 1] for c in auction.rstrip('\0')]
+  cards = play.rstrip('\0')
+  if cards:
+    b.play = [cardlib.Card.FromIndex(ord(c) - 1) for c in cards]
+  return b
+
+
+def Write(boards, out, auction_bytes=DEFAULT_AUCTION_BYTES,
+          buffer_boards=DEFAULT_BUFFER_BOARDS):
+  """Write boards in the binary format.
+
+  Arguments:
+    boards: An iterable of board.Boards.
+    out: A file-like object opened for binary writing.
+    auction_bytes: The maximum number of calls in a record.
+    buffer_boards: The number of boards packed between writes.
+
+  Returns:
+    The number of boards written.
+
+  Raises:
+    Error if a board's auction is too long or its deal incomplete.
+  """
+  record = _RecordStruct(auction_bytes)
+  out.write(HEADER.pack(MAGIC, VERSION, 0, auction_bytes, record.size))
+  buf = []
+  count = 0
+  for b in boards:
+    buf.append(_Pack(b, record, auction_bytes))
+    count += 1
+    if len(buf) >= buffer_boards:
+      out.write(''.join(buf))
+      buf = []
+  if buf:
+    out.write(''.join(buf))
+  return count
+
+
+class BoardFile(object):
+  """A read-only, memory-mapped board file."""
+  def __init__(self, path):
+    """Open a board file.
+
+    Raises:
+      Error if the file is not a board file.
+    """
+    self.path = path
+    self._file = open(path, 'rb')
+    size = os.fstat(self._file.fileno()).st_size
+    if size < HEADER.size:
+      self._file.close()
+      raise Error('%s is not a board file.' % path)
+    self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, auction_bytes, record_size = HEADER.unpack(
+        self._map[:HEADER.size])
+    self._record = _RecordStruct(auction_bytes)
+    if (magic != MAGIC or version != VERSION
+        or record_size != self._record.size
+        or (size - HEADER.size) % record_size):
+      self.Close()
+      raise Error('%s is not a board file.' % path)
+    self.auction_bytes = auction_bytes
+    self.record_size = record_size
+    self._count = (size - HEADER.size) // record_size
+
+  def Close(self):
+    self._map.close()
+    self._file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *unused):
+    self.Close()
+
+  def __len__(self):
+    return self._count
+
+  def Record(self, i):
+    """Returns record i as a read-only buffer of its bytes, without copying.
+
+    (mmap objects do not support memoryview in this version of Python.)
+    """
+    if not 0 <= i < self._count:
+      raise IndexError('No record %d.' % i)
+    return buffer(self._map, HEADER.size + i * self.record_size,
+                  self.record_size)
+
+  def __getitem__(self, i):
+    """Returns record i as a board.Board."""
+    if i < 0:
+      i += self._count
+    if not 0 <= i < self._count:
+      raise IndexError('No record %d.' % i)
+    return _Unpack(self._map, HEADER.size + i * self.record_size,
+                   self._record)
+
+  def __iter__(self):
+    for i in xrange(self._count):
+      yield self[i]
+
+  def Records(self):
+    """Returns all records as a read-only NumPy structured array.
+
+    The array maps the file rather than copying it; see RecordDtype for
+    its fields.
+    """
+    if numpy is None:
+      raise Error('Records requires NumPy.')
+    return numpy.memmap(self.path, dtype=RecordDtype(self.auction_bytes),
+                        mode='r', offset=HEADER.size, shape=(self._count,))
+
+
+def DealMasks(deals):
+  """Unpack the deal column of Records into hand masks.
+
+  Arguments:
+    deals: An (N, 13) uint8 array of packed deals.
+
+  Returns:
+    An (N, 4) uint64 array of CardSet bits indexed by seat.
+  """
+  if numpy is None:
+    raise Error('DealMasks requires NumPy.')
+  deals = numpy.asarray(deals, dtype=numpy.uint8)
+  # seats[d, c] is the seat holding card c of deal d.
+  seats = numpy.empty((len(deals), 52), dtype=numpy.uint8)
+  for k in xrange(4):
+    seats[:, k::4] = deals >> (2 * k) & 3
+  bits = numpy.left_shift(numpy.uint64(1), numpy.arange(52, dtype=numpy.uint64))
+  masks = numpy.empty((len(deals), 4), dtype=numpy.uint64)
+  for seat in xrange(4):
+    masks[:, seat] = numpy.where(seats == seat, bits, numpy.uint64(0)).sum(
+        axis=1, dtype=numpy.uint64)
+  return masks
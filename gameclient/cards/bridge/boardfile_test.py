@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import boardfile
+
+import os
+import pickle
+import random
+import StringIO
+import tempfile
+import unittest
+
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import pbn_test
+from gameclient.cards.bridge import rules
+
+
+class TestBoardFile(unittest.TestCase):
+  def setUp(self):
+    rand = random.Random(6)
+    self.boards = [pbn_test._RandomBoard(rand, i + 1) for i in xrange(40)]
+    self.boards.append(board.Board())
+    fd, self.path = tempfile.mkstemp(suffix='.gcbf')
+    out = os.fdopen(fd, 'wb')
+    self.assertEqual(boardfile.Write(self.boards, out, buffer_boards=16),
+                     len(self.boards))
+    out.close()
+
+  def tearDown(self):
+    os.remove(self.path)
+
+  def testRoundTrip(self):
+    f = boardfile.BoardFile(self.path)
+    try:
+      self.assertEqual(len(f), len(self.boards))
+      self.assertEqual(list(f), self.boards)
+      self.assertEqual(f[-1], self.boards[-1])
+      self.failUnless(f[0].auction[0] is self.boards[0].auction[0])
+      self.assertRaises(IndexError, f.__getitem__, len(self.boards))
+      record = f.Record(3)
+      self.assertEqual(record[0], chr(4))
+      self.assertEqual(len(record), f.record_size)
+    finally:
+      f.Close()
+    size = os.path.getsize(self.path)
+    self.failUnless(size * 3 < len(pickle.dumps(self.boards)))
+
+  def testPackDeal(self):
+    hands = self.boards[0].hands
+    packed = boardfile.PackDeal(hands)
+    self.assertEqual(len(packed), 13)
+    self.assertEqual(boardfile.UnpackDeal(packed), hands)
+
+  @unittest.skipIf(boardfile.numpy is None, 'NumPy is not installed.')
+  def testRecords(self):
+    with boardfile.BoardFile(self.path) as f:
+      records = f.Records()
+      self.assertEqual(len(records), len(self.boards))
+      self.assertEqual(list(records['number'][:3]), [1, 2, 3])
+      masks = boardfile.DealMasks(records['deal'][:-1])
+      for b, row in zip(self.boards, masks):
+        self.assertEqual([int(m) for m in row], [h.bits for h in b.hands])
+      del records
+
+  def testErrors(self):
+    long_auction = board.Board(auction=[rules.Pass()] * 41)
+    self.assertRaises(boardfile.Error, boardfile.Write, [long_auction],
+                      StringIO.StringIO())
+    self.assertRaises(boardfile.Error, boardfile.Write,
+                      [board.Board(hands=[None] * 4)], StringIO.StringIO())
+    out = open(self.path, 'wb')
+    out.write('not a board file, really')
+    out.close()
+    self.assertRaises(boardfile.Error, boardfile.BoardFile, self.path)
+
+
+if __name__ == '__main__':
+  unittest.main()
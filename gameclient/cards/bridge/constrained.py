@@ -0,0 +1,251 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Dealing bridge hands that satisfy constraints.
+
+A Dealer fixes some cards to some seats (the predeal), deals the rest of
+the deck at random and keeps only the deals whose hands satisfy a HandSpec
+for each constrained seat. Hands are handled as 52-bit integers in the
+layout of cardlib.CardSet, and the high card points and length of every
+possible 13-bit suit lane are precomputed (in handeval and cardlib), so a
+rejected deal costs a shuffle and a handful of table lookups.
+
+Seats are offsets into Rules.players; seats 0 and 2 are partners, as are
+seats 1 and 3.
+"""
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import handeval
+
+import random
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class NoDealFound(Error):
+  """No deal satisfying the constraints was found."""
+
+
+SEATS = 4
+DEFAULT_MAX_TRIES = 1000000
+
+# Shape patterns, matched in any suit order.
+BALANCED = ('4333', '4432', '5332')
+
+_LANE = cardlib.SUIT_BITS
+_LANE_MASK = cardlib.LANE_MASK
+_LANE_LENGTH = cardlib.LANE_LENGTH
+
+# The high card points and suit lengths of a hand's bits.
+Hcp = handeval.Hcp
+Lengths = handeval.Lengths
+
+
+def _Range(value, what):
+  """Normalize an integer or (low, high) pair to a (low, high) pair."""
+  if isinstance(value, (int, long)):
+    return (value, value)
+  try:
+    low, high = value
+  except (TypeError, ValueError):
+    raise Error('Bad %s range: %s' % (what, repr(value)))
+  if low > high:
+    raise Error('Empty %s range: %s' % (what, repr(value)))
+  return (low, high)
+
+
+def _Pattern(pattern):
+  """Parse a shape pattern like '4333' or '4-4-3-2' to a sorted tuple."""
+  lengths = [int(c, 16) for c in str(pattern) if c != '-']
+  if len(lengths) != 4 or sum(lengths) != cardlib.HAND_SIZE:
+    raise Error('Bad shape pattern: %s' % repr(pattern))
+  return tuple(sorted(lengths, reverse=True))
+
+
+def _Seat(seat):
+  if not isinstance(seat, (int, long)) or not 0 <= seat < SEATS:
+    raise Error('Bad seat: %s' % repr(seat))
+  return seat
+
+
+def _Bits(cards):
+  if isinstance(cards, cardlib.CardSet):
+    return cards.bits
+  return cardlib.CardSet(cards).bits
+
+
+class HandSpec(object):
+  """Constraints on a single hand."""
+  def __init__(self, hcp=None, lengths=None, shapes=None, predicate=None):
+    """Initialize a HandSpec.
+
+    Arguments:
+      hcp: An integer or (low, high) pair of high card points, inclusive.
+      lengths: A dict mapping cardlib.Card.Suits (or their abbreviations)
+               to an integer or (low, high) pair of suit lengths.
+      shapes: An iterable of shape patterns like '4333' or '5-4-3-1',
+              matched in any suit order (see BALANCED).
+      predicate: A function of a cardlib.CardSet returning a bool, checked
+                 only once every other constraint holds.
+    """
+    self.hcp = None
+    if hcp is not None:
+      self.hcp = _Range(hcp, 'hcp')
+    self.lengths = []
+    for suit, value in (lengths or {}).iteritems():
+      if not isinstance(suit, cardlib.Card.Suit):
+        try:
+          suit = cardlib.Card.Suit.NewSuit(suit)
+        except KeyError:
+          raise Error('Bad suit: %s' % repr(suit))
+      low, high = _Range(value, 'length')
+      self.lengths.append((suit.index * _LANE, low, high))
+    self.shapes = None
+    if shapes is not None:
+      self.shapes = frozenset(_Pattern(p) for p in shapes)
+    self.predicate = predicate
+
+  def Accepts(self, bits):
+    """Returns whether a hand, given as CardSet bits, meets the spec."""
+    if self.hcp is not None:
+      hcp = Hcp(bits)
+      if hcp < self.hcp[0] or self.hcp[1] < hcp:
+        return False
+    for shift, low, high in self.lengths:
+      n = _LANE_LENGTH[bits >> shift & _LANE_MASK]
+      if n < low or high < n:
+        return False
+    if (self.shapes is not None
+        and tuple(sorted(Lengths(bits), reverse=True)) not in self.shapes):
+      return False
+    if self.predicate is not None:
+      return bool(self.predicate(cardlib.CardSet.FromBits(bits)))
+    return True
+
+  def __repr__(self):
+    return ('HandSpec(hcp=%s, lengths=%s, shapes=%s, predicate=%s)'
+            % (repr(self.hcp), repr(self.lengths), repr(self.shapes),
+               repr(self.predicate)))
+
+
+class Stats(object):
+  """Acceptance statistics for a Dealer."""
+  def __init__(self):
+    self.Reset()
+
+  def Reset(self):
+    self.tries = 0
+    self.accepted = 0
+    # rejected[seat] counts the deals rejected by seat's HandSpec. Specs
+    # are checked in seat order and the first failure rejects the deal.
+    self.rejected = [0] * SEATS
+
+  def AcceptanceRate(self):
+    """Returns the fraction of tried deals that were accepted."""
+    if not self.tries:
+      return 0.0
+    return float(self.accepted) / self.tries
+
+  def __str__(self):
+    return ('%d/%d deals accepted (%.4g%%); rejected by seat: %s'
+            % (self.accepted, self.tries, 100 * self.AcceptanceRate(),
+               ' '.join(str(r) for r in self.rejected)))
+
+
+class Dealer(object):
+  """Deals random deals subject to a predeal and per-seat HandSpecs."""
+  def __init__(self, predeal=None, specs=None, rand=None):
+    """Initialize a Dealer.
+
+    Arguments:
+      predeal: A dict mapping seats to a cardlib.CardSet or a sequence of
+               Cards that seat must hold.
+      specs: A dict mapping seats to HandSpecs.
+      rand: A random.Random, or a seed for one. A fresh random.Random by
+            default.
+
+    Raises:
+      Error if a card is predealt twice or a seat is given too many cards.
+    """
+    if rand is None or not isinstance(rand, random.Random):
+      rand = random.Random(rand)
+    self._shuffle = rand.shuffle
+    self._fixed = [0] * SEATS
+    dealt = 0
+    for seat, cards in (predeal or {}).iteritems():
+      bits = _Bits(cards)
+      if bits & dealt:
+        raise Error('Cards predealt twice: %s'
+                    % repr(cardlib.CardSet.FromBits(bits & dealt)))
+      dealt |= bits
+      self._fixed[_Seat(seat)] |= bits
+    # The rest of the deck; each seat is dealt a slice of it.
+    self._rest = cardlib.CardBits(dealt)
+    self._slices = []
+    start = 0
+    for seat in xrange(SEATS):
+      need = (cardlib.HAND_SIZE
+              - len(cardlib.CardSet.FromBits(self._fixed[seat])))
+      if need < 0:
+        raise Error('Seat %d was predealt more than %d cards.'
+                    % (seat, cardlib.HAND_SIZE))
+      self._slices.append((start, start + need))
+      start += need
+    self._specs = sorted((_Seat(seat), spec)
+                         for seat, spec in (specs or {}).iteritems())
+    self.stats = Stats()
+
+  def _Hand(self, seat):
+    start, end = self._slices[seat]
+    return self._fixed[seat] + cardlib.SliceBits(self._rest, start, end)
+
+  def DealBits(self, max_tries=DEFAULT_MAX_TRIES):
+    """Deal one acceptable deal as four integers in CardSet layout.
+
+    Arguments:
+      max_tries: The number of deals to try before giving up.
+
+    Raises:
+      NoDealFound if no acceptable deal was found in max_tries tries.
+    """
+    stats = self.stats
+    rejected = stats.rejected
+    shuffle = self._shuffle
+    rest = self._rest
+    fixed = self._fixed
+    slices = self._slices
+    slice_bits = cardlib.SliceBits
+    for _ in xrange(max_tries):
+      shuffle(rest)
+      stats.tries += 1
+      for seat, spec in self._specs:
+        start, end = slices[seat]
+        if not spec.Accepts(fixed[seat] + slice_bits(rest, start, end)):
+          rejected[seat] += 1
+          break
+      else:
+        stats.accepted += 1
+        return [self._Hand(seat) for seat in xrange(SEATS)]
+    raise NoDealFound('No acceptable deal in %d tries (%s).'
+                      % (max_tries, stats))
+
+  def Deal(self, max_tries=DEFAULT_MAX_TRIES):
+    """Deal one acceptable deal.
+
+    Arguments:
+      max_tries: The number of deals to try before giving up.
+
+    Returns:
+      A list of 4 cardlib.CardSets, indexed by seat.
+
+    Raises:
+      NoDealFound if no acceptable deal was found in max_tries tries.
+    """
+    return [cardlib.CardSet.FromBits(h) for h in self.DealBits(max_tries)]
+
+  def Deals(self, n, max_tries=DEFAULT_MAX_TRIES):
+    """Yields n acceptable deals, each as from Deal."""
+    for _ in xrange(n):
+      yield self.Deal(max_tries)
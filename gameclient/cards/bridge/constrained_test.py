@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import constrained
+
+import unittest
+
+from gameclient.cards import cardlib
+
+
+def _Set(shorts):
+  return cardlib.CardSet(cardlib.Card.NewCard(s) for s in shorts.split())
+
+
+class TestTables(unittest.TestCase):
+  def testHcpAndLengths(self):
+    hand = _Set('AS KS 2S QH JH 0H 9D 8D 7D 6C 5C 4C 3C')
+    self.assertEqual(constrained.Hcp(hand.bits), 10)
+    self.assertEqual(constrained.Lengths(hand.bits), (4, 3, 3, 3))
+    self.assertEqual(constrained.Hcp(cardlib.CardSet(cardlib.Deck().Pick(52))
+                                     .bits), 40)
+
+
+class TestHandSpec(unittest.TestCase):
+  def setUp(self):
+    self.hand = _Set('AS KS 2S QH JH 0H 9D 8D 7D 6C 5C 4C 3C').bits
+
+  def testAccepts(self):
+    self.failUnless(constrained.HandSpec().Accepts(self.hand))
+    self.failUnless(constrained.HandSpec(hcp=(8, 10)).Accepts(self.hand))
+    self.failIf(constrained.HandSpec(hcp=(15, 17)).Accepts(self.hand))
+    self.failUnless(constrained.HandSpec(lengths={'C': 4}).Accepts(self.hand))
+    self.failIf(constrained.HandSpec(
+        lengths={cardlib.Card.SPADES: (5, 13)}).Accepts(self.hand))
+    self.failUnless(constrained.HandSpec(
+        shapes=constrained.BALANCED).Accepts(self.hand))
+    self.failIf(constrained.HandSpec(shapes=['5-4-3-1']).Accepts(self.hand))
+    self.failIf(constrained.HandSpec(
+        predicate=lambda h: cardlib.Card.NewCard('AH') in h)
+                .Accepts(self.hand))
+
+  def testBadSpecs(self):
+    self.assertRaises(constrained.Error, constrained.HandSpec, hcp=(17, 15))
+    self.assertRaises(constrained.Error, constrained.HandSpec, hcp='x')
+    self.assertRaises(constrained.Error, constrained.HandSpec,
+                      lengths={'X': 3})
+    self.assertRaises(constrained.Error, constrained.HandSpec,
+                      shapes=['4432', '4443'])
+
+
+class TestConstrainedDealer(unittest.TestCase):
+  def testPredeal(self):
+    north = _Set('AS KS QS JS 0S')
+    dealer = constrained.Dealer(predeal={0: north, 3: _Set('AH')}, rand=1)
+    for hands in dealer.Deals(20):
+      self.assertEqual(map(len, hands), [13] * 4)
+      self.assertEqual(len(hands[0] | hands[1] | hands[2] | hands[3]), 52)
+      self.assertEqual(hands[0] & north, north)
+      self.failUnless(cardlib.Card.NewCard('AH') in hands[3])
+    self.assertEqual(dealer.stats.tries, 20)
+    self.assertEqual(dealer.stats.AcceptanceRate(), 1.0)
+
+  def testConstraints(self):
+    notrump = constrained.HandSpec(hcp=(15, 17), shapes=constrained.BALANCED)
+    spades = constrained.HandSpec(lengths={'S': (5, 13)})
+    dealer = constrained.Dealer(specs={0: notrump, 2: spades}, rand=2)
+    for hands in dealer.Deals(10):
+      self.failUnless(15 <= constrained.Hcp(hands[0].bits) <= 17)
+      self.failUnless(hands[2].SuitLength(cardlib.Card.SPADES) >= 5)
+    stats = dealer.stats
+    self.assertEqual(stats.accepted, 10)
+    self.assertEqual(stats.tries, 10 + sum(stats.rejected))
+    self.failUnless(stats.rejected[0] > 0)
+    self.failUnless(0 < stats.AcceptanceRate() < 1)
+    self.assertEqual(constrained.Dealer(specs={0: notrump}, rand=2).Deal(),
+                     constrained.Dealer(specs={0: notrump}, rand=2).Deal())
+
+  def testErrors(self):
+    self.assertRaises(constrained.Error, constrained.Dealer,
+                      predeal={0: _Set('AS'), 1: _Set('AS')})
+    self.assertRaises(constrained.Error, constrained.Dealer,
+                      predeal={4: _Set('AS')})
+    self.assertRaises(constrained.Error, constrained.Dealer,
+                      predeal={0: cardlib.Deck().Pick(14)})
+    dealer = constrained.Dealer(specs={1: constrained.HandSpec(hcp=38)})
+    self.assertRaises(constrained.NoDealFound, dealer.Deal, 100)
+
+
+if __name__ == '__main__':
+  unittest.main()
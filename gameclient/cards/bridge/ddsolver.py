@@ -0,0 +1,642 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Double-dummy analysis of bridge deals.
+
+A double-dummy solver determines how many tricks each side takes when all
+four hands are visible and every player plays perfectly. Tricks are won
+exactly as in rules.Rules.EvaluateTrick.
+
+Seats are offsets into Rules.players; seats 0 and 2 are partners, as are
+seats 1 and 3.
+"""
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+_LANE = cardlib.SUIT_BITS
+_LANE_MASK = (1 << _LANE) - 1
+_FULL = (1 << (4 * _LANE)) - 1
+_NOTRUMP = 4
+_POP = [bin(i).count('1') for i in xrange(1 << _LANE)]
+
+
+def _Compress(h, u):
+  """Packs the bits of h that lie within u into the low bits."""
+  c = 0
+  n = 0
+  for i in xrange(_LANE):
+    if u >> i & 1:
+      c |= (h >> i & 1) << n
+      n += 1
+  return c
+
+# _Compress of 13-bit lanes, split into a low half of 7 bits and a high
+# half of 6 bits so that the tables stay small.
+_LO = 7
+_LO_MASK = (1 << _LO) - 1
+_HI = _LANE - _LO
+_COMPRESS_LO = [_Compress(h, u) for u in xrange(1 << _LO)
+                for h in xrange(1 << _LO)]
+_COMPRESS_HI = [_Compress(h, u) for u in xrange(1 << _HI)
+                for h in xrange(1 << _HI)]
+# _TOP[r] is the mask of ranks r and above within a lane.
+_TOP = [(_LANE_MASK >> r) << r for r in xrange(_LANE + 1)]
+
+
+def _Signature(suits, ks):
+  """Encodes which seats hold the top ks[i] cards of each suit i.
+
+  Arguments:
+    suits: As returned by Solver._Position.
+    ks: A tuple of 4 counts of relevant cards.
+  """
+  sig = 0
+  for (n, a, b, c), k in zip(suits, ks):
+    if k:
+      low = n - k
+      sig = ((sig << _LANE | a >> low) << _LANE | b >> low) << _LANE | c >> low
+  return sig
+
+
+def _Groups(mine, others):
+  """Groups a player's cards in one suit into equivalence classes.
+
+  Two cards are equivalent if every card ranked between them is also held
+  by the player or has already been played to an earlier trick.
+
+  Arguments:
+    mine: A 13-bit lane; the player's cards in the suit.
+    others: A 13-bit lane; the suit's cards that are still live and not
+            held by the player (including cards in the current trick).
+
+  Returns:
+    A tuple with one rank bit per class, in ascending order of rank. Each
+    bit is the lowest card of its class.
+  """
+  reps = []
+  prev = None
+  for i in xrange(_LANE - 1, -1, -1):
+    if mine >> i & 1:
+      if prev is None or others & ((1 << prev) - (1 << (i + 1))):
+        reps.append(i)
+      else:
+        reps[-1] = i
+      prev = i
+  reps.reverse()
+  return tuple(reps)
+
+
+def _StrainIndex(strain):
+  if strain is None:
+    return _NOTRUMP
+  if not isinstance(strain, rules.Bid.Strain):
+    strain = rules.Bid.Strain.NewStrain(strain)
+  if strain.suit is None:
+    return _NOTRUMP
+  return strain.suit.index
+
+
+class Solver(object):
+  """Solves one deal double-dummy.
+
+  Transposition tables are kept per strain and shared between leaders and
+  between calls, so solving the same strain again is cheap.
+  """
+  def __init__(self, hands):
+    """Initialize a Solver.
+
+    Arguments:
+      hands: A sequence of 4 cardlib.CardSets (or sequences of
+             cardlib.Cards), indexed by seat. All hands must hold the same
+             number of cards.
+
+    Raises:
+      Error if the hands overlap or are of different lengths.
+    """
+    if len(hands) != 4:
+      raise Error('Expected 4 hands, got %d.' % len(hands))
+    self._hands = []
+    seen = 0
+    for hand in hands:
+      if not isinstance(hand, cardlib.CardSet):
+        hand = cardlib.CardSet(hand)
+      if seen & hand.bits:
+        raise Error('A card appears in more than one hand.')
+      seen |= hand.bits
+      self._hands.append(hand.bits)
+    lengths = set(bin(h).count('1') for h in self._hands)
+    if len(lengths) != 1:
+      raise Error('Hands must be of equal length, not %s.' % sorted(lengths))
+    self.tricks = lengths.pop()
+    self._gone = _FULL & ~seen
+    self._tables = {}
+    self._groups = {}
+    self._best = {}
+    self.nodes = 0
+
+  def Solve(self, strain, leader, guess=None):
+    """Count the tricks taken by the side on lead.
+
+    Arguments:
+      strain: A rules.Bid.Strain (or abbreviation such as 'S' or 'NT'), or
+              None for no trump.
+      leader: The seat on lead to the first trick.
+      guess: An optional estimate of the result, e.g. the result for
+             another leader. A close guess saves search.
+
+    Returns:
+      The number of tricks taken by leader and partner with best play.
+    """
+    if guess is not None and leader % 2:
+      guess = self.tricks - guess
+    ns = self._SolveNS(_StrainIndex(strain), leader, guess)
+    if leader % 2 == 0:
+      return ns
+    return self.tricks - ns
+
+  def DeclarerTricks(self, strain, declarer, guess=None):
+    """Count the tricks taken by declarer's side, with declarer's LHO on lead.
+
+    Arguments:
+      strain: As for Solve.
+      declarer: The seat of the declarer.
+      guess: An optional estimate of the result, as for Solve.
+    """
+    if guess is not None:
+      guess = self.tricks - guess
+    return self.tricks - self.Solve(strain, (declarer + 1) % 4, guess)
+
+  def SolveLead(self, strain, leader, card, guess=None):
+    """Count the tricks taken by the side on lead after leader leads card.
+
+    Arguments:
+      strain: As for Solve.
+      leader: The seat on lead to the first trick.
+      card: A cardlib.Card in leader's hand.
+      guess: An optional estimate of the result, as for Solve.
+
+    Raises:
+      Error if leader does not hold card.
+    """
+    if not self._hands[leader] >> card.index & 1:
+      raise Error('Seat %d does not hold %s.' % (leader, card))
+    if guess is not None and leader % 2:
+      guess = self.tricks - guess
+    ns = self._SolveNS(_StrainIndex(strain), leader, guess, card.index)
+    if leader % 2 == 0:
+      return ns
+    return self.tricks - ns
+
+  def _SolveNS(self, trump, leader, guess=None, lead=None):
+    self._trump = trump
+    self._tt = self._tables.setdefault(trump, {})
+    if lead is None:
+      probe = lambda target: self._Trick(leader, target, self.tricks)[0]
+    else:
+      probe = lambda target: self._LeadCard(leader, lead, target)
+    lo, hi = 0, self.tricks
+    if guess is not None and 0 < guess <= hi:
+      # Probe the guess and the trick above it before bisecting.
+      if probe(guess):
+        lo = guess
+        if guess < hi:
+          if probe(guess + 1):
+            lo = guess + 1
+          else:
+            hi = guess
+      else:
+        hi = guess - 1
+    while lo < hi:
+      target = (lo + hi + 1) // 2
+      if probe(target):
+        lo = target
+      else:
+        hi = target - 1
+    return lo
+
+  def _LeadCard(self, leader, bit, target):
+    """Like _Trick, with the lead fixed to the card with index bit."""
+    if target <= 0:
+      return True
+    hands = self._hands
+    hand = hands[leader]
+    card = 1 << bit
+    suit = bit // _LANE
+    rank = bit - suit * _LANE
+    if suit == self._trump:
+      rank += 2 * _LANE
+    hands[leader] = hand ^ card
+    try:
+      return self._Play((leader + 1) & 3, 1, suit, leader, rank, card,
+                        target, self.tricks)[0]
+    finally:
+      hands[leader] = hand
+
+  def _Position(self, leader):
+    """Describes the position at the start of a trick.
+
+    Returns:
+      A pair (shape, suits). shape is an integer encoding the leader and
+      the length of each hand in each suit. suits holds, for each suit, a
+      tuple (n, c0, c1, c2): the number of cards left in the suit and the
+      holdings of seats 0 to 2 in relative ranks (seat 3 holds the rest).
+    """
+    h0, h1, h2, h3 = self._hands
+    live = h0 | h1 | h2 | h3
+    shape = leader
+    suits = []
+    for shift in (0, _LANE, 2 * _LANE, 3 * _LANE):
+      u = live >> shift & _LANE_MASK
+      a = h0 >> shift & _LANE_MASK
+      b = h1 >> shift & _LANE_MASK
+      c = h2 >> shift & _LANE_MASK
+      shape = (shape << 16 | _POP[a] << 12 | _POP[b] << 8 | _POP[c] << 4
+               | _POP[h3 >> shift & _LANE_MASK])
+      if u != _LANE_MASK:
+        u_lo = (u & _LO_MASK) << _LO
+        u_hi = (u >> _LO) << _HI
+        n_lo = _POP[u & _LO_MASK]
+        a = (_COMPRESS_LO[u_lo | (a & _LO_MASK)]
+             | _COMPRESS_HI[u_hi | (a >> _LO)] << n_lo)
+        b = (_COMPRESS_LO[u_lo | (b & _LO_MASK)]
+             | _COMPRESS_HI[u_hi | (b >> _LO)] << n_lo)
+        c = (_COMPRESS_LO[u_lo | (c & _LO_MASK)]
+             | _COMPRESS_HI[u_hi | (c >> _LO)] << n_lo)
+      suits.append((_POP[u], a, b, c))
+    return shape, suits
+
+  def _Relevant(self, ks):
+    """Converts counts of relevant cards per suit to a relevance mask."""
+    h0, h1, h2, h3 = self._hands
+    live = h0 | h1 | h2 | h3
+    rel = 0
+    for suit, k in enumerate(ks):
+      if k:
+        shift = suit * _LANE
+        u = live >> shift & _LANE_MASK
+        for _ in xrange(_POP[u] - k):
+          u &= u - 1
+        rel |= _TOP[(u & -u).bit_length() - 1] << shift
+    return rel
+
+  def _QuickTricks(self, leader):
+    """A lower bound on the tricks leader's side can cash off the top.
+
+    Counts the leader's own top winners or, if the leader can reach
+    partner's hand with a top card, partner's top winners. In a suit
+    contract a side-suit winner only counts while every opponent who
+    holds trumps still has to follow suit.
+
+    Returns:
+      A pair (tricks, relevant), where relevant is the mask of ranks the
+      bound depends on.
+    """
+    hands = self._hands
+    mine = hands[leader]
+    partner = hands[(leader + 2) & 3]
+    lho = hands[(leader + 1) & 3]
+    rho = hands[(leader + 3) & 3]
+    opponents = lho | rho
+    trump = self._trump
+    lho_ruffs = rho_ruffs = False
+    if trump != _NOTRUMP:
+      shift = trump * _LANE
+      lho_ruffs = lho >> shift & _LANE_MASK
+      rho_ruffs = rho >> shift & _LANE_MASK
+    mine_total = 0
+    mine_rel = 0
+    partner_total = 0
+    partner_rel = 0
+    entry = False
+    for suit in xrange(4):
+      shift = suit * _LANE
+      m = mine >> shift & _LANE_MASK
+      p = partner >> shift & _LANE_MASK
+      o = opponents >> shift & _LANE_MASK
+      cap = _LANE
+      if suit != trump:
+        if lho_ruffs:
+          cap = _POP[lho >> shift & _LANE_MASK]
+        if rho_ruffs:
+          cap = min(cap, _POP[rho >> shift & _LANE_MASK])
+      top = (p | o).bit_length()
+      winners = _POP[m >> top]
+      if winners and cap:
+        mine_total += min(winners, cap)
+        mine_rel |= _TOP[top] << shift
+      top = (m | o).bit_length()
+      winners = _POP[p >> top]
+      if winners and cap:
+        partner_total += min(winners, cap)
+        partner_rel |= _TOP[top] << shift
+        if m:
+          entry = True
+    if entry and partner_total > mine_total:
+      return partner_total, partner_rel
+    return mine_total, mine_rel
+
+  def _TrumpTricks(self, side):
+    """A lower bound on the tricks side takes with top trumps.
+
+    A trump higher than all the opponents' trumps wins a trick whenever it
+    is played, but partner's top trumps may fall on the same trick.
+
+    Arguments:
+      side: 0 for seats 0 and 2, 1 for seats 1 and 3.
+
+    Returns:
+      A pair (tricks, relevant), as for _QuickTricks.
+    """
+    hands = self._hands
+    shift = self._trump * _LANE
+    top = ((hands[side ^ 1] | hands[side ^ 3]) >> shift
+           & _LANE_MASK).bit_length()
+    tricks = max(_POP[(hands[side] >> shift & _LANE_MASK) >> top],
+                 _POP[(hands[side ^ 2] >> shift & _LANE_MASK) >> top])
+    if tricks:
+      return tricks, _TOP[top] << shift
+    return 0, 0
+
+  def _Trick(self, leader, target, left):
+    """Can seats 0 and 2 take target of the left remaining tricks?
+
+    Returns:
+      A pair (result, relevant). relevant is a mask with, for each suit,
+      the ranks at and above the lowest rank that the result depends on.
+      The result holds in every position with the same hand lengths in
+      which the same seats hold the live cards of those ranks.
+    """
+    if target <= 0:
+      return True, 0
+    if target > left:
+      return False, 0
+    self.nodes += 1
+    if left == 1:
+      winner, rel = self._LastTrick(leader)
+      return winner & 1 == 0, rel
+    quick, rel = self._QuickTricks(leader)
+    if leader & 1 == 0:
+      if quick >= target:
+        return True, rel
+    elif left - quick < target:
+      return False, rel
+    if self._trump != _NOTRUMP:
+      sure, rel = self._TrumpTricks((leader + 1) & 1)
+      if leader & 1 == 0:
+        if left - sure < target:
+          return False, rel
+      elif sure >= target:
+        return True, rel
+    shape, suits = self._Position(leader)
+    buckets = self._tt.get(shape)
+    if buckets is None:
+      buckets = self._tt[shape] = {}
+    else:
+      for ks, entries in buckets.iteritems():
+        bounds = entries.get(_Signature(suits, ks))
+        if bounds is not None:
+          if bounds[0] >= target:
+            return True, self._Relevant(ks)
+          if bounds[1] < target:
+            return False, self._Relevant(ks)
+    result, rel = self._Lead(leader, shape, target, left)
+    h0, h1, h2, h3 = self._hands
+    live = (h0 | h1 | h2 | h3) & rel
+    ks = (_POP[live & _LANE_MASK], _POP[live >> _LANE & _LANE_MASK],
+          _POP[live >> 2 * _LANE & _LANE_MASK], _POP[live >> 3 * _LANE])
+    entries = buckets.get(ks)
+    if entries is None:
+      entries = buckets[ks] = {}
+    sig = _Signature(suits, ks)
+    lo, hi = entries.get(sig, (0, left))
+    if result:
+      entries[sig] = (max(lo, target), hi)
+    else:
+      entries[sig] = (lo, min(hi, target - 1))
+    return result, rel
+
+  def _LastTrick(self, leader):
+    """Plays out the last trick, when each hand has one card.
+
+    Returns:
+      A pair (winner, relevant) of the seat that wins and the relevance
+      mask, as for _Trick.
+    """
+    hands = self._hands
+    trump = self._trump
+    best = hands[leader].bit_length() - 1
+    led = best // _LANE
+    winner = leader
+    beaten = False
+    for seat in ((leader + 1) & 3, (leader + 2) & 3, (leader + 3) & 3):
+      bit = hands[seat].bit_length() - 1
+      suit = bit // _LANE
+      best_suit = best // _LANE
+      if suit == best_suit:
+        beaten = True
+        if bit > best:
+          winner, best = seat, bit
+      elif suit == trump:
+        winner, best = seat, bit
+        beaten = False
+    if beaten:
+      suit = best // _LANE
+      return winner, _TOP[best - suit * _LANE] << (suit * _LANE)
+    return winner, 0
+
+  def _Reps(self, lane, others):
+    pair = lane << _LANE | others
+    reps = self._groups.get(pair)
+    if reps is None:
+      reps = self._groups[pair] = _Groups(lane, others)
+    return reps
+
+  def _Leads(self, seat, hand, live):
+    """Returns the leads seat should try, best guesses first."""
+    hands = self._hands
+    partner = hands[(seat + 2) & 3]
+    opponents = hands[(seat + 1) & 3] | hands[(seat + 3) & 3]
+    trump = self._trump
+    partner_ruffs = (trump != _NOTRUMP
+                     and partner >> (trump * _LANE) & _LANE_MASK)
+    cashes = []
+    entries = []
+    lows = []
+    rest = []
+    for suit in xrange(4):
+      shift = suit * _LANE
+      lane = hand >> shift & _LANE_MASK
+      if not lane:
+        continue
+      reps = self._Reps(lane, live >> shift & _LANE_MASK)
+      p = partner >> shift & _LANE_MASK
+      o = opponents >> shift & _LANE_MASK
+      if lane.bit_length() > (p | o).bit_length():
+        # Cash a winner.
+        cashes.append(reps[-1] + shift)
+        rest.extend(r + shift for r in reversed(reps[:-1]))
+        continue
+      if p.bit_length() > o.bit_length() or (partner_ruffs and not p
+                                              and suit != trump):
+        # Lead low to partner's winner, or for partner to ruff.
+        entries.append(reps[0] + shift)
+      else:
+        lows.append(reps[0] + shift)
+      rest.extend(r + shift for r in reversed(reps[1:]))
+    return cashes + entries + lows + rest
+
+  def _Moves(self, seat, led, win_seat, win_val):
+    """Returns the cards seat should try to follow with, best guesses first.
+    """
+    hand = self._hands[seat]
+    live = _FULL & ~self._gone & ~hand
+    shift = led * _LANE
+    lane = hand >> shift & _LANE_MASK
+    if lane:
+      reps = self._Reps(lane, live >> shift & _LANE_MASK)
+      moves = [r + shift for r in reps]
+      if (win_seat ^ seat) & 1 and win_val < 2 * _LANE:
+        # Try to win as cheaply as possible before ducking.
+        for i, r in enumerate(reps):
+          if r > win_val:
+            if i:
+              moves.insert(0, moves.pop(i))
+            break
+      return moves
+    trump = self._trump
+    moves = []
+    ruffs = []
+    for suit in xrange(4):
+      shift = suit * _LANE
+      lane = hand >> shift & _LANE_MASK
+      if not lane:
+        continue
+      reps = self._Reps(lane, live >> shift & _LANE_MASK)
+      if suit == trump:
+        ruffs.extend(r + shift for r in reps)
+      else:
+        moves.extend(r + shift for r in reps)
+    moves.sort(key=lambda b: b % _LANE)
+    if ruffs:
+      if (win_seat ^ seat) & 1:
+        return ruffs + moves
+      return moves + ruffs
+    return moves
+
+  def _Lead(self, leader, shape, target, left):
+    """Like _Play for the opening card of a trick.
+
+    The lead that decided the last search from a position of the same
+    shape is tried first.
+    """
+    hands = self._hands
+    hand = hands[leader]
+    maximize = leader & 1 == 0
+    trump = self._trump
+    nxt = (leader + 1) & 3
+    moves = self._Leads(leader, hand, _FULL & ~self._gone & ~hand)
+    best = self._best.get(shape)
+    if best is not None and best in moves:
+      moves.remove(best)
+      moves.insert(0, best)
+    rel = 0
+    for bit in moves:
+      card = 1 << bit
+      suit = bit // _LANE
+      rank = bit - suit * _LANE
+      if suit == trump:
+        rank += 2 * _LANE
+      hands[leader] = hand ^ card
+      result, r = self._Play(nxt, 1, suit, leader, rank, card, target, left)
+      hands[leader] = hand
+      if result == maximize:
+        self._best[shape] = bit
+        return result, r
+      rel |= r
+    return not maximize, rel
+
+  def _Play(self, seat, count, led, win_seat, win_val, trick, target, left):
+    """Can seats 0 and 2 take target tricks, with seat to play?
+
+    Arguments:
+      seat: The seat to play.
+      count: The number of cards already played to this trick; at least 1.
+      led: The index of the suit led.
+      win_seat: The seat currently winning the trick.
+      win_val: The strength of the winning card: its rank bit, plus
+               2 * _LANE if it is a trump.
+      trick: The bits of the cards played to the trick so far.
+      target: The number of tricks seats 0 and 2 need from this trick on.
+      left: The number of tricks left, including this one.
+
+    Returns:
+      A pair (result, relevant), as for _Trick.
+    """
+    hands = self._hands
+    hand = hands[seat]
+    maximize = seat & 1 == 0
+    trump = self._trump
+    nxt = (seat + 1) & 3
+    rel = 0
+    for bit in self._Moves(seat, led, win_seat, win_val):
+      card = 1 << bit
+      suit = bit // _LANE
+      rank = bit - suit * _LANE
+      if suit == trump:
+        val = rank + 2 * _LANE
+      elif suit == led:
+        val = rank
+      else:
+        val = -1
+      if val > win_val:
+        ws, wv = seat, val
+      else:
+        ws, wv = win_seat, win_val
+      hands[seat] = hand ^ card
+      if count == 3:
+        gone = self._gone
+        cards = trick | card
+        self._gone = gone | cards
+        if ws & 1:
+          result, r = self._Trick(ws, target, left - 1)
+        else:
+          result, r = self._Trick(ws, target - 1, left - 1)
+        self._gone = gone
+        # The winning card's rank matters if it beat a card of its suit.
+        if wv >= 2 * _LANE:
+          shift = trump * _LANE
+          wv -= 2 * _LANE
+        else:
+          shift = led * _LANE
+        lane = cards >> shift & _LANE_MASK
+        if lane & (lane - 1):
+          r |= _TOP[wv] << shift
+      else:
+        result, r = self._Play(nxt, count + 1, led, ws, wv, trick | card,
+                               target, left)
+      hands[seat] = hand
+      if result == maximize:
+        return result, r
+      rel |= r
+    return not maximize, rel
+
+
+def Solve(hands, strain, leader):
+  """Count the tricks taken by the side on lead, double-dummy.
+
+  Arguments:
+    hands: A sequence of 4 cardlib.CardSets (or sequences of cardlib.Cards),
+           indexed by seat.
+    strain: A rules.Bid.Strain (or abbreviation), or None for no trump.
+    leader: The seat on lead to the first trick.
+
+  Returns:
+    The number of tricks taken by leader and partner with best play.
+  """
+  return Solver(hands).Solve(strain, leader)
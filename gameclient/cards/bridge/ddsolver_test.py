@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import ddsolver
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+def _BruteForce(game, hands, strain, leader):
+  """Tricks for leader's side, by plain minimax over Rules.EvaluateTrick."""
+  side = leader % 2
+
+  def Play(hands, trick, first, seat):
+    if len(trick) == 4:
+      winner = game.EvaluateTrick(trick, first, strain)
+      won = int(winner % 2 == side)
+      if not hands[winner]:
+        return won
+      return won + Play(hands, [], winner, winner)
+    results = []
+    for card in game.LegalPlays(hands[seat], trick):
+      rest = list(hands)
+      rest[seat] = hands[seat].Remove(card)
+      results.append(Play(rest, trick + [card], first, (seat + 1) % 4))
+    if seat % 2 == side:
+      return max(results)
+    return min(results)
+
+  return Play([cardlib.CardSet(h) for h in hands], [], leader, leader)
+
+
+class TestSolver(unittest.TestCase):
+  def setUp(self):
+    self.game = rules.Rules(players=['N', 'E', 'S', 'W'], dealer=0)
+    deck = cardlib.Deck()
+    deck.Shuffle(lambda x, r=None: list.sort(x, key=lambda c: c.index))
+    cards = deck.Pick(52)
+    # N holds the spades, E the hearts, S the diamonds and W the clubs.
+    self.solid = [cards[39:], cards[26:39], cards[13:26], cards[:13]]
+
+  def testSolidSuits(self):
+    solver = ddsolver.Solver(self.solid)
+    self.assertEqual(solver.Solve('NT', 0), 13)
+    self.assertEqual(solver.Solve('NT', 1), 13)
+    self.assertEqual(solver.Solve('S', 1), 0)
+    self.assertEqual(solver.Solve(rules.Bid.HEARTS, 0), 0)
+    self.assertEqual(solver.DeclarerTricks('S', 0), 13)
+    self.assertEqual(solver.DeclarerTricks('NT', 2), 0)
+    self.assertEqual(ddsolver.Solve(self.solid, None, 3), 13)
+
+  def testMatchesBruteForce(self):
+    rand = random.Random(3)
+    deck = list(cardlib.Deck().Pick(52))
+    for _ in xrange(40):
+      n = rand.randint(1, 3)
+      rand.shuffle(deck)
+      hands = [deck[i * n:(i + 1) * n] for i in xrange(4)]
+      strain = rand.choice(rules.Bid.STRAINS)
+      leader = rand.randrange(4)
+      self.assertEqual(ddsolver.Solve(hands, strain, leader),
+                       _BruteForce(self.game, hands, strain, leader))
+
+  def testSolveLead(self):
+    rand = random.Random(4)
+    deck = list(cardlib.Deck().Pick(52))
+    for _ in xrange(20):
+      n = rand.randint(1, 3)
+      rand.shuffle(deck)
+      hands = [cardlib.CardSet(deck[i * n:(i + 1) * n]) for i in xrange(4)]
+      strain = rand.choice(rules.Bid.STRAINS)
+      leader = rand.randrange(4)
+      solver = ddsolver.Solver(hands)
+      results = []
+      for card in hands[leader]:
+        rest = list(hands)
+        rest[leader] = hands[leader].Remove(card)
+        expected = self._AfterLead(rest, card, strain, leader)
+        results.append(solver.SolveLead(strain, leader, card))
+        self.assertEqual(results[-1], expected)
+      self.assertEqual(max(results), solver.Solve(strain, leader))
+    self.assertRaises(ddsolver.Error, solver.SolveLead, strain, leader,
+                      list(hands[(leader + 1) % 4])[0])
+
+  def _AfterLead(self, hands, card, strain, leader):
+    # Brute force over the rest of the first trick, then the other tricks.
+    side = leader % 2
+    def Follow(hands, trick, seat):
+      if len(trick) == 4:
+        winner = self.game.EvaluateTrick(trick, leader, strain)
+        won = int(winner % 2 == side)
+        if not hands[winner]:
+          return won
+        tricks = _BruteForce(self.game, hands, strain, winner)
+        if winner % 2 != side:
+          tricks = len(hands[0]) - tricks
+        return won + tricks
+      results = []
+      for c in self.game.LegalPlays(hands[seat], trick):
+        rest = list(hands)
+        rest[seat] = hands[seat].Remove(c)
+        results.append(Follow(rest, trick + [c], (seat + 1) % 4))
+      if seat % 2 == side:
+        return max(results)
+      return min(results)
+    return Follow(hands, [card], (leader + 1) % 4)
+
+  def testBadHands(self):
+    self.assertRaises(ddsolver.Error, ddsolver.Solver, self.solid[:3])
+    self.assertRaises(ddsolver.Error, ddsolver.Solver,
+                      [self.solid[0]] * 4)
+    self.assertRaises(ddsolver.Error, ddsolver.Solver,
+                      [self.solid[0][:2], self.solid[1][:2],
+                       self.solid[2][:2], self.solid[3][:3]])
+
+
+if __name__ == '__main__':
+  unittest.main()
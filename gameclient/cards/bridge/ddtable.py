@@ -0,0 +1,188 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Double-dummy tables and par scores.
+
+A DDTable holds the double-dummy trick count for every declarer and strain
+of a deal. All 20 entries are computed with a single ddsolver.Solver, so
+the transposition table for a strain is shared between the four
+declarers, and each result seeds the search for the next.
+
+Seats are offsets into Rules.players; seats 0 and 2 (side 0) are partners,
+as are seats 1 and 3 (side 1). Par scores are from side 0's point of view.
+"""
+
+import multiprocessing
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import ddsolver
+from gameclient.cards.bridge import rules
+from gameclient.cards.bridge import scoring
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+SEATS = 4
+_PASSED_OUT = (0, None)
+
+
+class DDTable(object):
+  """The double-dummy trick counts of a deal."""
+  def __init__(self, hands=None, tricks=None):
+    """Initialize a DDTable by solving hands, or from known trick counts.
+
+    Arguments:
+      hands: A sequence of 4 cardlib.CardSets (or sequences of
+             cardlib.Cards), indexed by seat.
+      tricks: Instead of hands, a list indexed by declarer of lists
+              indexed by Bid.Strain magnitude of declarer's tricks.
+    """
+    if (hands is None) == (tricks is None):
+      raise Error('Pass exactly one of hands and tricks.')
+    if hands is not None:
+      tricks = _Solve(hands)
+    if (len(tricks) != SEATS
+        or [len(t) for t in tricks] != [len(rules.Bid.STRAINS)] * SEATS):
+      raise Error('Expected a 4x5 table of tricks.')
+    if not all(0 <= n <= 13 for t in tricks for n in t):
+      raise Error('Bad number of tricks in %s.' % repr(tricks))
+    self.tricks = [list(t) for t in tricks]
+
+  def Tricks(self, declarer, strain):
+    """Returns declarer's tricks in strain (a Bid.Strain or abbreviation)."""
+    if not isinstance(strain, rules.Bid.Strain):
+      strain = rules.Bid.Strain.NewStrain(strain)
+    return self.tricks[declarer][strain.magnitude]
+
+  def Par(self, vulnerable, dealer):
+    """Compute the par result of the deal.
+
+    Par is the result when both sides bid to their best double-dummy
+    contract, bidding over each other as long as that pays, and every
+    contract that fails is doubled. Each side declares from whichever
+    partner takes more tricks.
+
+    Arguments:
+      vulnerable: A pair of bools, whether side 0 and side 1 are
+                  vulnerable.
+      dealer: The seat of the dealer; the dealer's side may bid first.
+
+    Returns:
+      A pair (score, contract): side 0's score and the par
+      rules.Contract, whose declarer is a seat. contract is None if the
+      deal should be passed out.
+    """
+    bids = rules.BIDS
+    # Each side's best final result if the bid at an index is the last one
+    # made and the other side passes: (side 0's score, (bid index, seat)).
+    finals = [[self._Final(side, bid, vulnerable[side]) for bid in bids]
+              for side in (0, 1)]
+    # best[side][i] is side's best result over opening the bidding at or
+    # above bids[i], given the other side may then bid over it.
+    best = [[None] * (len(bids) + 1) for _ in (0, 1)]
+    for i in reversed(xrange(len(bids))):
+      values = []
+      for side in (0, 1):
+        other = best[1 - side][i + 1]
+        value = finals[side][i]
+        if other is not None:
+          value = _Better(1 - side, value, other)
+        values.append(value)
+      for side in (0, 1):
+        value = values[side]
+        if best[side][i + 1] is not None:
+          value = _Better(side, value, best[side][i + 1])
+        best[side][i] = value
+    first = dealer % 2
+    second = 1 - first
+    # If the dealer's side passes, the other side may open; if it passes
+    # too, the dealer's side gets one more chance.
+    result = _Better(first, _Better(second, _Better(first, _PASSED_OUT,
+                                                    best[first][0]),
+                                    best[second][0]),
+                     best[first][0])
+    score, final = result
+    if final is None:
+      return (0, None)
+    index, declarer = final
+    tricks = self.tricks[declarer][bids[index].strain.magnitude]
+    made = tricks >= bids[index].level + scoring.BOOK
+    return (score, rules.Contract(bids[index], declarer, doubled=not made))
+
+  def _Final(self, side, bid, vulnerable):
+    strain = bid.strain.magnitude
+    declarer = max((side, side + 2),
+                   key=lambda seat: self.tricks[seat][strain])
+    tricks = self.tricks[declarer][strain]
+    made = tricks >= bid.level + scoring.BOOK
+    score = scoring.DuplicateScore(rules.Contract(bid, declarer,
+                                                  doubled=not made),
+                                   tricks, vulnerable)
+    if side:
+      score = -score
+    return (score, (bid.index - rules.BIDS[0].index, declarer))
+
+  def __repr__(self):
+    return 'DDTable(tricks=%s)' % repr(self.tricks)
+
+
+def _Better(side, preferred, other):
+  """Returns the result side prefers; preferred wins ties."""
+  if side == 0:
+    if preferred[0] >= other[0]:
+      return preferred
+  elif preferred[0] <= other[0]:
+    return preferred
+  return other
+
+
+def _Solve(hands):
+  """Returns the 4x5 list of tricks for hands, indexed [declarer][strain]."""
+  solver = ddsolver.Solver(hands)
+  tricks = [[None] * len(rules.Bid.STRAINS) for _ in xrange(SEATS)]
+  for strain in rules.Bid.STRAINS:
+    guess = None
+    # Partners are solved in turn so that each seeds the other's search.
+    for declarer in (0, 2, 1, 3):
+      if declarer == 1:
+        guess = solver.tricks - guess
+      t = solver.DeclarerTricks(strain, declarer, guess)
+      tricks[declarer][strain.magnitude] = guess = t
+  return tricks
+
+
+def _SolveBits(bits):
+  return _Solve([cardlib.CardSet.FromBits(b) for b in bits])
+
+
+def _Bits(hand):
+  if not isinstance(hand, cardlib.CardSet):
+    hand = cardlib.CardSet(hand)
+  return hand.bits
+
+
+def DDTables(deals, processes=None):
+  """Compute the DDTables of many deals, spread across a process pool.
+
+  Arguments:
+    deals: An iterable of deals, each a sequence of 4 hands as for DDTable.
+    processes: The number of worker processes; by default, the number of
+               CPUs. With 1, deals are solved in this process.
+
+  Returns:
+    A list of DDTables, one per deal, in order.
+  """
+  # Hands travel to the workers as plain integers.
+  bits = [[_Bits(h) for h in deal] for deal in deals]
+  if processes == 1:
+    tricks = map(_SolveBits, bits)
+  else:
+    pool = multiprocessing.Pool(processes)
+    try:
+      tricks = pool.map(_SolveBits, bits, chunksize=1)
+    finally:
+      pool.close()
+      pool.join()
+  return [DDTable(tricks=t) for t in tricks]
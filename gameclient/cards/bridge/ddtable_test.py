@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import ddtable
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import ddsolver
+from gameclient.cards.bridge import rules
+
+
+def _Table(spades, hearts):
+  """A table where side 0 plays spades and side 1 hearts; else 6 tricks."""
+  tricks = [[6] * 5 for _ in xrange(4)]
+  tricks[0][rules.Bid.SPADES.magnitude] = spades
+  tricks[2][rules.Bid.SPADES.magnitude] = spades - 1
+  tricks[1][rules.Bid.HEARTS.magnitude] = hearts
+  return ddtable.DDTable(tricks=tricks)
+
+
+class TestDDTable(unittest.TestCase):
+  def testMatchesSolver(self):
+    rand = random.Random(5)
+    deck = list(cardlib.Deck().Pick(52))
+    deals = []
+    for _ in xrange(3):
+      rand.shuffle(deck)
+      deals.append([deck[i * 3:(i + 1) * 3] for i in xrange(4)])
+    tables = ddtable.DDTables(deals, processes=1)
+    self.assertEqual([t.tricks for t in ddtable.DDTables(deals, processes=2)],
+                     [t.tricks for t in tables])
+    for deal, table in zip(deals, tables):
+      self.assertEqual(table.tricks, ddtable.DDTable(deal).tricks)
+      for strain in rules.Bid.STRAINS:
+        for declarer in xrange(4):
+          self.assertEqual(
+              table.Tricks(declarer, strain),
+              ddsolver.Solver(deal).DeclarerTricks(strain, declarer))
+
+  def testBadTables(self):
+    self.assertRaises(ddtable.Error, ddtable.DDTable)
+    self.assertRaises(ddtable.Error, ddtable.DDTable, tricks=[[6] * 5] * 3)
+    self.assertRaises(ddtable.Error, ddtable.DDTable, tricks=[[14] * 5] * 4)
+
+
+class TestPar(unittest.TestCase):
+  def testGame(self):
+    score, contract = _Table(10, 7).Par((False, False), 0)
+    self.assertEqual(score, 420)
+    self.assertEqual(str(contract), '4S')
+    self.assertEqual(contract.declarer, 0)
+    score, contract = _Table(10, 7).Par((True, True), 1)
+    self.assertEqual((score, str(contract)), (620, '4S'))
+
+  def testSacrifice(self):
+    score, contract = _Table(10, 9).Par((False, False), 0)
+    self.assertEqual((score, str(contract), contract.declarer),
+                     (300, '5HX', 1))
+    # Vulnerable, the sacrifice costs more than the game.
+    score, contract = _Table(10, 9).Par((False, True), 0)
+    self.assertEqual((score, str(contract)), (420, '4S'))
+
+  def testPartscore(self):
+    score, contract = _Table(8, 6).Par((False, False), 1)
+    self.assertEqual((score, str(contract)), (110, '1S'))
+
+  def testPassedOut(self):
+    table = ddtable.DDTable(tricks=[[6] * 5] * 4)
+    self.assertEqual(table.Par((False, False), 0), (0, None))
+
+
+if __name__ == '__main__':
+  unittest.main()
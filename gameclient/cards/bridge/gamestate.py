@@ -0,0 +1,332 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Immutable game states that share storage with their parents.
+
+A GameState is one position of a deal: the dealer, the auction so far and,
+once the auction is over, the hands, the current trick and the tricks won.
+Making a call or playing a card returns a new GameState that points at its
+parent and holds only the few fields that changed, so branching a position
+costs a small, constant amount of memory and time however long the
+history. The calls and cards made are recovered by walking back through
+the parents.
+
+GameStates are hashable. During the auction two states are equal when
+they have the same dealer, hands and calls. During the play they are equal
+when they have the same contract, remaining hands, current trick and
+tricks won, however the play got there, so that a search can use them as
+transposition keys.
+
+Seats are offsets into Rules.players, with the dealer given as a seat.
+"""
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+_PASS = rules.Pass.index
+_DOUBLE = rules.Double.index
+_REDOUBLE = rules.Redouble.index
+# _NO_FIRST_BIDS[partnership * 5 + strain.magnitude] is the offset into the
+# auction of the first bid of the strain by the partnership, where
+# partnership 0 is the dealer's.
+_NO_FIRST_BIDS = (None,) * (2 * len(rules.Bid.STRAINS))
+
+
+class GameState(object):
+  """A position in a deal; see the module docstring.
+
+  The attributes are read-only:
+    parent: The previous GameState, or None.
+    move: The Call or cardlib.Card that led here from parent, or None.
+    dealer: The dealer's seat.
+    hands: A tuple of the 4 hands' CardSet bits, indexed by seat, or None
+           if the hands are unknown.
+    contract: None during the auction, then a rules.Contract whose
+              declarer is a seat.
+    leader: The seat on lead to the current trick, or None.
+    trick: A tuple of the cards played to the current trick.
+    tricks: A pair, the tricks won by seats 0 and 2 and by seats 1 and 3.
+  """
+  __slots__ = ('parent', 'move', 'dealer', 'hands', 'contract', 'leader',
+               'trick', 'tricks', '_calls', '_last_bid', '_last_bid_at',
+               '_doubled', '_passes', '_first_bids', '_trump', '_best',
+               '_cards', '_hash')
+
+  def __init__(self, dealer, hands=None):
+    """Start a deal, before the first call.
+
+    Arguments:
+      dealer: The dealer's seat.
+      hands: A list of 4 cardlib.CardSets indexed by seat, or None if the
+             hands are unknown (the play then cannot start).
+    """
+    self.parent = None
+    self.move = None
+    self.dealer = dealer
+    if hands is not None:
+      hands = tuple(h.bits for h in hands)
+    self.hands = hands
+    self.contract = None
+    self.leader = None
+    self.trick = ()
+    self.tricks = (0, 0)
+    self._calls = 0
+    self._last_bid = None
+    self._last_bid_at = None
+    # 0, rules.Double.index or rules.Redouble.index.
+    self._doubled = 0
+    self._passes = 0
+    self._first_bids = _NO_FIRST_BIDS
+    self._trump = None
+    self._best = 0
+    self._cards = 0
+    self._hash = hash((dealer, hands))
+
+  def _Child(self, move):
+    child = object.__new__(GameState)
+    child.parent = self
+    child.move = move
+    child.dealer = self.dealer
+    child.hands = self.hands
+    child.contract = self.contract
+    child.leader = self.leader
+    child.trick = self.trick
+    child.tricks = self.tricks
+    child._calls = self._calls
+    child._last_bid = self._last_bid
+    child._last_bid_at = self._last_bid_at
+    child._doubled = self._doubled
+    child._passes = self._passes
+    child._first_bids = self._first_bids
+    child._trump = self._trump
+    child._best = self._best
+    child._cards = self._cards
+    return child
+
+  def IsAuctionOver(self):
+    """Returns True once the auction has ended."""
+    return self.contract is not None
+
+  def IsOver(self):
+    """Returns True if the deal was passed out or every card is played."""
+    if self.contract is None:
+      return False
+    if self.contract.level == 0:
+      return True
+    return self.hands is not None and not any(self.hands)
+
+  def ToAct(self):
+    """Returns the seat of the player to act, or None if the deal is over."""
+    if self.contract is None:
+      return (self.dealer + self._calls) % 4
+    if self.IsOver():
+      return None
+    return (self.leader + len(self.trick)) % 4
+
+  def Hand(self, seat):
+    """Returns the cards left in seat's hand as a cardlib.CardSet."""
+    if self.hands is None:
+      raise Error('The hands are unknown.')
+    return cardlib.CardSet.FromBits(self.hands[seat])
+
+  def Calls(self):
+    """Returns the list of calls made, in order."""
+    return [s.move for s in self._Path() if isinstance(s.move, rules.Call)]
+
+  def Cards(self):
+    """Returns the list of cards played, in order."""
+    return [s.move for s in self._Path()
+            if isinstance(s.move, cardlib.Card)]
+
+  def _Path(self):
+    path = []
+    state = self
+    while state.parent is not None:
+      path.append(state)
+      state = state.parent
+    path.reverse()
+    return path
+
+  # The auction.
+
+  def LegalCallMask(self):
+    """Returns the legal calls as a bit mask; see rules.Auction.LegalMask."""
+    if self.contract is not None:
+      return 0
+    last = self._last_bid
+    if last is None:
+      return rules.LegalCallMask(None, False, False, False)
+    if self._doubled:
+      by_opponents = self._passes != 1
+    else:
+      by_opponents = (self._calls - self._last_bid_at) % 2 == 1
+    return rules.LegalCallMask(last.index, self._doubled == _DOUBLE,
+                               self._doubled == _REDOUBLE, by_opponents)
+
+  def LegalCalls(self):
+    """Returns the tuple of legal calls, ordered by Call.index."""
+    return rules.CallsInMask(self.LegalCallMask())
+
+  def Call(self, call):
+    """Returns the state after the player to act makes call.
+
+    Raises:
+      rules.AuctionOver if the auction has ended.
+      rules.InsufficientBid or rules.IllegalDouble if call is not legal.
+    """
+    if self.contract is not None:
+      raise rules.AuctionOver('The auction has ended.')
+    if not self.LegalCallMask() >> call.index & 1:
+      if isinstance(call, rules.Bid):
+        raise rules.InsufficientBid('%s does not supersede %s.'
+                                    % (call, self._last_bid))
+      raise rules.IllegalDouble('%s is not legal now.' % call)
+    child = self._Child(call)
+    n = self._calls
+    child._calls = n + 1
+    child._hash = hash((self._hash, call.index))
+    index = call.index
+    if index == _PASS:
+      if self._passes >= 2 and n >= 3:
+        child._EndAuction()
+      child._passes = self._passes + 1
+    elif index == _DOUBLE or index == _REDOUBLE:
+      child._doubled = index
+      child._passes = 0
+    else:
+      child._last_bid = call
+      child._last_bid_at = n
+      child._doubled = 0
+      child._passes = 0
+      slot = n % 2 * len(rules.Bid.STRAINS) + call.strain.magnitude
+      if self._first_bids[slot] is None:
+        first = list(self._first_bids)
+        first[slot] = n
+        child._first_bids = tuple(first)
+    return child
+
+  def _EndAuction(self):
+    bid = self._last_bid
+    if bid is None:
+      self.contract = rules.Contract(None, None)
+      return
+    partnership = self._last_bid_at % 2
+    first = self._first_bids[partnership * len(rules.Bid.STRAINS)
+                             + bid.strain.magnitude]
+    declarer = (self.dealer + first) % 4
+    self.contract = rules.Contract(bid, declarer, self._doubled == _DOUBLE,
+                                   self._doubled == _REDOUBLE)
+    self.leader = (declarer + 1) % 4
+    self._trump = bid.strain.suit
+
+  # The play.
+
+  def LegalPlayMask(self):
+    """Returns the cards the player to act may play, as CardSet bits."""
+    if self.contract is None or self.IsOver():
+      return 0
+    if self.hands is None:
+      raise Error('The hands are unknown.')
+    hand = self.hands[(self.leader + len(self.trick)) % 4]
+    if self.trick:
+      return rules.TRICKS.LegalMask(hand, self.trick[0].suit, self._trump)
+    return hand
+
+  def LegalPlays(self):
+    """Returns the cards the player to act may play, as a CardSet."""
+    return cardlib.CardSet.FromBits(self.LegalPlayMask())
+
+  def Play(self, card):
+    """Returns the state after the player to act plays card.
+
+    Raises:
+      rules.IllegalPlay if card may not be played now.
+    """
+    bit = 1 << card.index
+    if not self.LegalPlayMask() & bit:
+      raise rules.IllegalPlay('%s may not be played.' % card)
+    child = self._Child(card)
+    trick = self.trick
+    n = len(trick)
+    seat = (self.leader + n) % 4
+    hands = list(self.hands)
+    hands[seat] ^= bit
+    child.hands = tuple(hands)
+    child._cards = self._cards + 1
+    best = 0
+    if n:
+      best = self._best
+      power = rules.TRICKS.Power(trick[0].suit, self._trump)
+      if power[card.index] > power[trick[best].index]:
+        best = n
+    if n == 3:
+      winner = (self.leader + best) % 4
+      tricks = list(self.tricks)
+      tricks[winner % 2] += 1
+      child.tricks = tuple(tricks)
+      child.leader = winner
+      child.trick = ()
+      child._best = 0
+    else:
+      child.trick = trick + (card,)
+      child._best = best
+    child._hash = hash((child.contract.level, child.contract.strain.magnitude,
+                        child.contract.declarer, child.hands, child.leader,
+                        child.trick, child.tricks))
+    return child
+
+  def Apply(self, move):
+    """Returns the state after move, a Call or a cardlib.Card."""
+    if isinstance(move, rules.Call):
+      return self.Call(move)
+    return self.Play(move)
+
+  def __hash__(self):
+    return self._hash
+
+  def __eq__(self, other):
+    if not isinstance(other, GameState):
+      return False
+    if self is other:
+      return True
+    if self._hash != other._hash or self.dealer != other.dealer:
+      return False
+    if self._cards or other._cards:
+      c, d = self.contract, other.contract
+      return bool(self._cards and other._cards and c.level == d.level
+              and c.strain is d.strain and c.declarer == d.declarer
+              and c.doubled == d.doubled and c.redoubled == d.redoubled
+              and self.hands == other.hands and self.leader == other.leader
+              and self.trick == other.trick and self.tricks == other.tricks)
+    a, b = self, other
+    while a is not b:
+      if a.parent is None or b.parent is None:
+        return (a.parent is None and b.parent is None
+                and a.hands == b.hands)
+      if a.move is not b.move:
+        return False
+      a, b = a.parent, b.parent
+    return True
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __repr__(self):
+    return '<GameState dealer=%d calls=%d cards=%d>' % (
+        self.dealer, self._calls, self._cards)
+
+
+def NewGame(game, hands=None):
+  """Start a GameState for a rules.Rules, dealt by game.dealer.
+
+  Arguments:
+    game: A rules.Rules object.
+    hands: A list of 4 cardlib.CardSets, one per player, starting with
+           game.players[0], or None.
+  """
+  return GameState(game.dealer, hands)
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import gamestate
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+def _RandomHands(rand):
+  deck = cardlib.Deck(rand.shuffle)
+  return [deck.PickSet(13) for _ in xrange(4)]
+
+
+class TestGameState(unittest.TestCase):
+  def setUp(self):
+    self.rand = random.Random(11)
+    self.hands = _RandomHands(self.rand)
+
+  def testAuctionMatchesRules(self):
+    for dealer in xrange(4):
+      for _ in xrange(20):
+        state = gamestate.GameState(dealer, self.hands)
+        auction = rules.Auction(range(4), dealer)
+        while not state.IsAuctionOver():
+          self.assertEqual(state.LegalCallMask(), auction.LegalMask())
+          self.assertEqual(state.ToAct(), (dealer + len(auction)) % 4)
+          legal = state.LegalCalls()
+          # Favour passes so that auctions end.
+          if self.rand.random() < 0.5:
+            call = rules.Pass()
+          else:
+            call = self.rand.choice(legal)
+          state = state.Call(call)
+          auction.Append(call)
+        self.assertEqual(str(state.contract), str(auction.contract))
+        self.assertEqual(getattr(state.contract, 'declarer', None),
+                         getattr(auction.contract, 'declarer', None))
+        self.assertEqual([c.index for c in state.Calls()],
+                         [c.index for c in auction.calls])
+
+  def testIllegalCalls(self):
+    state = gamestate.GameState(0).Call(rules.Bid(2, 'H'))
+    self.assertRaises(rules.InsufficientBid, state.Call, rules.Bid(1, 'S'))
+    self.assertRaises(rules.IllegalDouble, state.Call, rules.Redouble())
+    state = state.Call(rules.Pass())
+    self.assertRaises(rules.IllegalDouble, state.Call, rules.Double())
+    for _ in xrange(2):
+      state = state.Call(rules.Pass())
+    self.failUnless(state.IsAuctionOver())
+    self.assertRaises(rules.AuctionOver, state.Call, rules.Pass())
+    self.assertRaises(gamestate.Error, state.Hand, 0)
+
+  def testPlayMatchesRules(self):
+    state = gamestate.GameState(1, self.hands)
+    for text in ['1s', 'x', 'xx', 'p', 'p', 'p']:
+      state = state.Call(rules.NewCall(text))
+    self.assertEqual(state.contract.declarer, 1)
+    self.failUnless(state.contract.redoubled)
+    play = rules.Play(self.hands, 2, rules.Bid.SPADES)
+    while not state.IsOver():
+      self.assertEqual(state.LegalPlayMask(), play.LegalMask())
+      self.assertEqual(state.ToAct(), play.ToAct())
+      card = self.rand.choice(list(state.LegalPlays()))
+      state = state.Play(card)
+      play.PlayCard(card)
+      self.assertEqual(list(state.tricks), play.tricks)
+      self.assertEqual(state.leader, play.leader)
+    self.assertEqual(state.Cards(), play.History())
+    self.failUnless(state.ToAct() is None)
+    self.assertRaises(rules.IllegalPlay, state.Play, self.hands[0].Lowest(
+        cardlib.Card.CLUBS) or list(self.hands[0])[0])
+
+  def testSharing(self):
+    root = gamestate.GameState(0, self.hands)
+    one = root.Call(rules.Bid(1, 'C'))
+    two = one.Call(rules.Pass())
+    self.failUnless(two.parent is one and one.parent is root)
+    self.failUnless(two._first_bids is one._first_bids)
+    self.failUnless(two.hands is root.hands)
+    self.failIf(one.IsAuctionOver())
+    self.assertEqual(root.Calls(), [])
+
+  def testHashing(self):
+    root = gamestate.GameState(0, self.hands)
+    a = root.Call(rules.Bid(1, 'N')).Call(rules.Pass())
+    b = root.Call(rules.Bid(1, 'N')).Call(rules.Pass())
+    c = root.Call(rules.Pass()).Call(rules.Bid(1, 'N'))
+    self.assertEqual(a, b)
+    self.assertEqual(hash(a), hash(b))
+    self.assertNotEqual(a, c)
+    self.assertEqual(len(set([a, b, c])), 2)
+    self.assertNotEqual(a, gamestate.GameState(1, self.hands).Call(
+        rules.Bid(1, 'N')).Call(rules.Pass()))
+    # Two orders of play reaching the same position are equal.
+    C = cardlib.Card
+    hands = [cardlib.CardSet([C(C.SPADES, C.ACE), C(C.SPADES, C.KING)]),
+             cardlib.CardSet([C(C.SPADES, C.TWO), C(C.SPADES, C.THREE)]),
+             cardlib.CardSet([C(C.SPADES, C.FOUR), C(C.SPADES, C.FIVE)]),
+             cardlib.CardSet([C(C.SPADES, C.SIX), C(C.SPADES, C.SEVEN)])]
+    state = gamestate.GameState(3, hands)
+    for text in ['1n', 'p', 'p', 'p']:
+      state = state.Call(rules.NewCall(text))
+    self.assertEqual(state.leader, 0)
+    first = state
+    for card in ['AS', '2S', '4S', '6S']:
+      first = first.Play(C.NewCard(card))
+    second = state
+    for card in ['KS', '3S', '5S', '7S']:
+      second = second.Play(C.NewCard(card))
+    self.assertNotEqual(first, second)
+    for card in ['KS', '3S', '5S', '7S']:
+      first = first.Play(C.NewCard(card))
+    for card in ['AS', '2S', '4S', '6S']:
+      second = second.Play(C.NewCard(card))
+    self.assertEqual(first, second)
+    self.assertEqual(hash(first), hash(second))
+    self.assertEqual(first.tricks, (2, 0))
+    self.failUnless(first.IsOver())
+
+  def testNewGame(self):
+    game = rules.Rules(players=['N', 'E', 'S', 'W'], dealer=2)
+    state = gamestate.NewGame(game, self.hands)
+    self.assertEqual(state.ToAct(), 2)
+    self.assertEqual(state.Hand(3), self.hands[3])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,226 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Hand evaluation: points, shape, controls, losers and quick tricks.
+
+Every metric here is a sum over suits of a value that depends only on the
+suit's 13-bit lane of the hand (see cardlib.CardSet), so each is computed
+once for all 8192 possible lanes and looked up. The scalar functions take
+a hand as a cardlib.CardSet, its bits, or a sequence of cardlib.Cards. The
+batch functions take a NumPy array of hand masks of any shape, e.g. the
+(N, 4) arrays of dealer.HandMasks and boardfile.DealMasks, and return an
+array of the same shape (with a trailing axis of 4 for Lengths); they
+require NumPy.
+
+The metrics are:
+  Hcp          Ace 4, king 3, queen 2, jack 1.
+  Lengths      Suit lengths by Card.Suit.index, the lane order of CardSet
+               (clubs first).
+  ShapeClass   BALANCED (4333, 4432, 5332), SEMI_BALANCED (5422, 6322) or
+               UNBALANCED.
+  Controls     Ace 2, king 1.
+  Losers       The losing-trick count: in each suit, the missing ace, king
+               and queen among the top min(length, 3) cards.
+  QuickTricks  Per suit AK 2, AQ 1.5, A 1, KQ 1, Kx 0.5.
+"""
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+import itertools
+
+from gameclient.cards import cardlib
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+BALANCED = 0
+SEMI_BALANCED = 1
+UNBALANCED = 2
+
+_BALANCED = ('4333', '4432', '5332')
+_SEMI_BALANCED = ('5422', '6322')
+
+_LANE = cardlib.SUIT_BITS
+_LANE_MASK = cardlib.LANE_MASK
+_ACE, _KING, _QUEEN, _JACK = 1 << 12, 1 << 11, 1 << 10, 1 << 9
+
+
+def _LaneValues(lane):
+  """Returns (hcp, controls, losers, half quick tricks) of a lane."""
+  a, k, q = bool(lane & _ACE), bool(lane & _KING), bool(lane & _QUEEN)
+  hcp = 4 * a + 3 * k + 2 * q + bool(lane & _JACK)
+  length = cardlib.LANE_LENGTH[lane]
+  top = min(length, 3)
+  losers = top - (a + (k and top >= 2) + (q and top >= 3))
+  if a and k:
+    half_quick = 4
+  elif a and q:
+    half_quick = 3
+  elif a or (k and q):
+    half_quick = 2
+  elif k and length >= 2:
+    half_quick = 1
+  else:
+    half_quick = 0
+  return (hcp, 2 * a + k, losers, half_quick)
+
+_LANES = [_LaneValues(i) for i in xrange(1 << _LANE)]
+_LANE_HCP = [v[0] for v in _LANES]
+_LANE_LENGTH = cardlib.LANE_LENGTH
+_LANE_CONTROLS = [v[1] for v in _LANES]
+_LANE_LOSERS = [v[2] for v in _LANES]
+_LANE_QUICK = [v[3] / 2.0 for v in _LANES]
+del _LANES
+
+
+def _PatternClass(pattern):
+  if pattern in _BALANCED:
+    return BALANCED
+  if pattern in _SEMI_BALANCED:
+    return SEMI_BALANCED
+  return UNBALANCED
+
+
+def _Pattern(lengths):
+  return ''.join(str(n) for n in sorted(lengths, reverse=True))
+
+
+def _Bits(hand):
+  if isinstance(hand, (int, long)):
+    return hand
+  if isinstance(hand, cardlib.CardSet):
+    return hand.bits
+  bits = 0
+  for card in hand:
+    bits |= 1 << card.index
+  return bits
+
+
+def _Sum(table, bits):
+  return (table[bits & _LANE_MASK] + table[bits >> _LANE & _LANE_MASK]
+          + table[bits >> 2 * _LANE & _LANE_MASK] + table[bits >> 3 * _LANE])
+
+
+def Hcp(hand):
+  """Returns the high card points of a hand."""
+  return _Sum(_LANE_HCP, _Bits(hand))
+
+
+def Lengths(hand):
+  """Returns a hand's suit lengths as a (clubs, ..., spades) tuple."""
+  bits = _Bits(hand)
+  return (_LANE_LENGTH[bits & _LANE_MASK],
+          _LANE_LENGTH[bits >> _LANE & _LANE_MASK],
+          _LANE_LENGTH[bits >> 2 * _LANE & _LANE_MASK],
+          _LANE_LENGTH[bits >> 3 * _LANE])
+
+
+def Pattern(hand):
+  """Returns a hand's suit lengths, longest first, as a string like '5431'."""
+  return _Pattern(Lengths(hand))
+
+
+def ShapeClass(hand):
+  """Returns BALANCED, SEMI_BALANCED or UNBALANCED for a 13-card hand."""
+  return _PatternClass(Pattern(hand))
+
+
+def Controls(hand):
+  """Returns the controls of a hand."""
+  return _Sum(_LANE_CONTROLS, _Bits(hand))
+
+
+def Losers(hand):
+  """Returns the losing-trick count of a hand."""
+  return _Sum(_LANE_LOSERS, _Bits(hand))
+
+
+def QuickTricks(hand):
+  """Returns the quick tricks of a hand, a multiple of 0.5."""
+  return _Sum(_LANE_QUICK, _Bits(hand))
+
+
+# The batch API.
+
+if numpy is not None:
+  _HCP_ARRAY = numpy.array(_LANE_HCP, dtype=numpy.int8)
+  _LENGTH_ARRAY = numpy.array(_LANE_LENGTH, dtype=numpy.int8)
+  _CONTROLS_ARRAY = numpy.array(_LANE_CONTROLS, dtype=numpy.int8)
+  _LOSERS_ARRAY = numpy.array(_LANE_LOSERS, dtype=numpy.int8)
+  _QUICK_ARRAY = numpy.array(_LANE_QUICK, dtype=numpy.float32)
+  # _CLASS_ARRAY[c, d, h, s] is the ShapeClass of those suit lengths.
+  _CLASS_ARRAY = numpy.full((_LANE + 1,) * 4, UNBALANCED, dtype=numpy.int8)
+  for _pattern in _BALANCED + _SEMI_BALANCED:
+    for _lengths in set(itertools.permutations([int(n) for n in _pattern])):
+      _CLASS_ARRAY[_lengths] = _PatternClass(_pattern)
+  del _pattern, _lengths
+
+
+def _Lanes(masks):
+  """Returns the (..., 4) int array of the suit lanes of a mask array."""
+  if numpy is None:
+    raise Error('The batch functions require NumPy.')
+  masks = numpy.asarray(masks, dtype=numpy.uint64)
+  shifts = numpy.arange(4, dtype=numpy.uint64) * numpy.uint64(_LANE)
+  return ((masks[..., numpy.newaxis] >> shifts)
+          & numpy.uint64(_LANE_MASK)).astype(numpy.intp)
+
+
+def HcpBatch(masks):
+  """Returns the high card points of an array of hand masks."""
+  return _HCP_ARRAY[_Lanes(masks)].sum(axis=-1, dtype=numpy.int32)
+
+
+def LengthsBatch(masks):
+  """Returns the suit lengths of hand masks, with a trailing axis of 4."""
+  return _LENGTH_ARRAY[_Lanes(masks)]
+
+
+def _ShapeClass(lengths):
+  return _CLASS_ARRAY[lengths[..., 0], lengths[..., 1], lengths[..., 2],
+                      lengths[..., 3]]
+
+
+def ShapeClassBatch(masks):
+  """Returns the ShapeClass of each of an array of hand masks."""
+  return _ShapeClass(LengthsBatch(masks))
+
+
+def ControlsBatch(masks):
+  """Returns the controls of an array of hand masks."""
+  return _CONTROLS_ARRAY[_Lanes(masks)].sum(axis=-1, dtype=numpy.int32)
+
+
+def LosersBatch(masks):
+  """Returns the losing-trick counts of an array of hand masks."""
+  return _LOSERS_ARRAY[_Lanes(masks)].sum(axis=-1, dtype=numpy.int32)
+
+
+def QuickTricksBatch(masks):
+  """Returns the quick tricks of an array of hand masks."""
+  return _QUICK_ARRAY[_Lanes(masks)].sum(axis=-1)
+
+
+def EvaluateBatch(masks):
+  """Computes every metric of an array of hand masks at once.
+
+  The masks are split into suit lanes only once, so this is faster than
+  calling each batch function.
+
+  Returns:
+    A dict mapping 'hcp', 'lengths', 'shape_class', 'controls', 'losers'
+    and 'quick_tricks' to arrays as returned by the batch functions.
+  """
+  lanes = _Lanes(masks)
+  lengths = _LENGTH_ARRAY[lanes]
+  return {'hcp': _HCP_ARRAY[lanes].sum(axis=-1, dtype=numpy.int32),
+          'lengths': lengths,
+          'shape_class': _ShapeClass(lengths),
+          'controls': _CONTROLS_ARRAY[lanes].sum(axis=-1, dtype=numpy.int32),
+          'losers': _LOSERS_ARRAY[lanes].sum(axis=-1, dtype=numpy.int32),
+          'quick_tricks': _QUICK_ARRAY[lanes].sum(axis=-1)}
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import handeval
+
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards import dealer
+
+
+def _Hand(text):
+  """A hand from 'spades.hearts.diamonds.clubs', e.g. 'AKQ2.J3.T98.765'."""
+  cards = []
+  for ranks, suit in zip(text.split('.'), 'SHDC'):
+    cards.extend(cardlib.Card.NewCard(r + suit) for r in ranks)
+  return cards
+
+
+class TestHandEval(unittest.TestCase):
+  def testScalar(self):
+    hand = _Hand('AKQ2.J3.T98.7654')
+    self.assertEqual(handeval.Hcp(hand), 10)
+    self.assertEqual(handeval.Lengths(hand), (4, 3, 2, 4))
+    self.assertEqual(handeval.Pattern(hand), '4432')
+    self.assertEqual(handeval.ShapeClass(hand), handeval.BALANCED)
+    self.assertEqual(handeval.Controls(hand), 3)
+    # Spades 0, hearts 2, diamonds 3, clubs 3.
+    self.assertEqual(handeval.Losers(hand), 8)
+    self.assertEqual(handeval.QuickTricks(hand), 2.0)
+    # A CardSet and its bits are hands too.
+    cards = cardlib.CardSet(hand)
+    self.assertEqual(handeval.Hcp(cards), 10)
+    self.assertEqual(handeval.Losers(cards.bits), 8)
+
+  def testSuits(self):
+    for text, losers, quick in (('A.K.Q.JT98765432', 5, 1.0),
+                                ('AK.KQ.K2.T987654', 5, 3.5),
+                                ('AQ.Q2.AKQJ.T9876', 6, 3.5)):
+      hand = _Hand(text)
+      self.assertEqual(handeval.Losers(hand), losers, text)
+      self.assertEqual(handeval.QuickTricks(hand), quick, text)
+    self.assertEqual(handeval.ShapeClass(_Hand('AKQ32.J432.T9.76')),
+                     handeval.SEMI_BALANCED)
+    self.assertEqual(handeval.ShapeClass(_Hand('AKQ32.J32.T98.7')),
+                     handeval.UNBALANCED)
+
+  @unittest.skipIf(handeval.numpy is None, 'NumPy is not installed.')
+  def testBatch(self):
+    masks = dealer.DealBatch(300, 3).Masks()
+    metrics = handeval.EvaluateBatch(masks)
+    self.assertEqual(metrics['hcp'].shape, (300, 4))
+    self.assertEqual(metrics['lengths'].shape, (300, 4, 4))
+    self.failUnless((metrics['hcp'].sum(axis=1) == 40).all())
+    self.failUnless((metrics['controls'].sum(axis=1) == 12).all())
+    self.failUnless((handeval.HcpBatch(masks) == metrics['hcp']).all())
+    for d in xrange(0, 300, 37):
+      for seat in xrange(4):
+        bits = int(masks[d, seat])
+        self.assertEqual(metrics['hcp'][d, seat], handeval.Hcp(bits))
+        self.assertEqual(tuple(metrics['lengths'][d, seat]),
+                         handeval.Lengths(bits))
+        self.assertEqual(metrics['shape_class'][d, seat],
+                         handeval.ShapeClass(bits))
+        self.assertEqual(metrics['controls'][d, seat],
+                         handeval.Controls(bits))
+        self.assertEqual(metrics['losers'][d, seat], handeval.Losers(bits))
+        self.assertEqual(metrics['quick_tricks'][d, seat],
+                         handeval.QuickTricks(bits))
+    self.assertEqual(handeval.LosersBatch(masks[0, 0]).shape, ())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,275 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Reading and writing boards in the LIN format of Bridge Base Online.
+
+A LIN file is a sequence of key|value| pairs. Once the board being read
+has its deal (an md pair), the next qx or md pair starts a new board.
+Read parses lazily, yielding one board.Board at a time; ReadFile
+memory-maps the file. Calls and cards in the results are the interned
+rules.Call and cardlib.Card objects.
+
+The pairs interpreted are md (deal), sv (vulnerability), ah (board
+number), mb (calls), pc (cards played) and mc (claims). Player names (pn)
+are kept in Board.tags as 'Players'; everything else is skipped.
+"""
+
+import mmap
+import os
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class ParseError(Error):
+  """The input is not valid LIN."""
+
+
+# Calls keyed by their upper-case LIN tokens.
+_CALLS = {'P': rules.Pass(), 'D': rules.Double(), 'R': rules.Redouble()}
+for _bid in rules.BIDS:
+  if _bid.strain == rules.Bid.NOTRUMP:
+    _CALLS['%dN' % _bid.level] = _bid
+  else:
+    _CALLS['%d%s' % (_bid.level, _bid.strain.suit.abbrev)] = _bid
+del _bid
+_CALL_TOKENS = dict((c, t) for t, c in _CALLS.iteritems())
+
+# LIN lists hands from South; its dealer digits 1 to 4 are S, W, N, E.
+_LIN_SEATS = (2, 3, 0, 1)
+
+_VULNERABLE = {'O': (False, False), '0': (False, False),
+               '-': (False, False), 'N': (True, False),
+               'E': (False, True), 'B': (True, True)}
+_VULNERABLE_NAMES = {(False, False): 'o', (True, False): 'n',
+                     (False, True): 'e', (True, True): 'b'}
+
+_LIN_SUITS = dict((s.abbrev, s) for s in board.SUITS_DOWN)
+
+DEFAULT_BUFFER_BOARDS = 1000
+
+
+def ParseDeal(value):
+  """Parse an md value like '3SAKQHJT9D876C5432,...'.
+
+  Returns:
+    A pair (dealer, hands): the dealer's seat, or None if not given, and a
+    list of 4 cardlib.CardSets indexed by seat. A missing fourth hand is
+    given the remaining cards.
+  """
+  dealer = None
+  if value[:1].isdigit():
+    if not '1' <= value[0] <= '4':
+      raise ParseError('Bad dealer in "%s"' % value)
+    dealer = _LIN_SEATS[int(value[0]) - 1]
+    value = value[1:]
+  hands = value.split(',')
+  if not 3 <= len(hands) <= 4:
+    raise ParseError('Bad deal: "%s"' % value)
+  result = [None] * 4
+  for i, hand in enumerate(hands):
+    if not hand:
+      continue
+    bits = 0
+    suit = None
+    for c in hand.upper():
+      if c in _LIN_SUITS:
+        suit = _LIN_SUITS[c]
+      elif suit is None:
+        raise ParseError('Bad hand: "%s"' % hand)
+      else:
+        try:
+          bits |= board.SuitBits(c, suit)
+        except board.Error, e:
+          raise ParseError('Bad hand: "%s" (%s)' % (hand, e))
+    result[_LIN_SEATS[i]] = cardlib.CardSet.FromBits(bits)
+  missing = [s for s, h in enumerate(result) if h is None]
+  if len(missing) == 1:
+    rest = 0
+    for h in result:
+      if h is not None:
+        rest |= h.bits
+    result[missing[0]] = cardlib.CardSet.FromBits(
+        ((1 << (4 * cardlib.SUIT_BITS)) - 1) & ~rest)
+  return (dealer, result)
+
+
+def FormatDeal(hands, dealer=None):
+  """Format hands (indexed by seat) as an md value."""
+  out = []
+  for seat in _LIN_SEATS:
+    out.append(''.join(s.abbrev + board.SuitRanks(hands[seat], s)
+                       for s in board.SUITS_DOWN))
+  if dealer is None:
+    return ','.join(out)
+  return '%d%s' % (_LIN_SEATS.index(dealer) + 1, ','.join(out))
+
+
+class _Builder(object):
+  """Collects the pairs of one board."""
+  def __init__(self):
+    self.board = board.Board(auction=[], play=[])
+    self.dealt = False
+    self.claim = None
+
+  def Add(self, key, value):
+    b = self.board
+    if key == 'md':
+      b.dealer, b.hands = ParseDeal(value)
+      self.dealt = True
+    elif key == 'sv':
+      try:
+        b.vulnerable = _VULNERABLE[value.upper()[:1] or 'O']
+      except KeyError:
+        raise ParseError('Bad vulnerability: "%s"' % value)
+    elif key == 'ah':
+      digits = ''.join(c for c in value if c.isdigit())
+      if digits:
+        b.number = int(digits)
+    elif key == 'mb':
+      try:
+        b.auction.append(_CALLS[value.upper().rstrip('!')])
+      except KeyError:
+        raise ParseError('"%s" is not a call.' % value)
+    elif key == 'pc':
+      if len(value) != 2:
+        raise ParseError('"%s" is not a card.' % value)
+      try:
+        b.play.append(board.LookupCard(value[0], value[1]))
+      except board.Error, e:
+        raise ParseError(str(e))
+    elif key == 'mc':
+      try:
+        self.claim = int(value)
+      except ValueError:
+        raise ParseError('Bad claim: "%s"' % value)
+    elif key == 'pn':
+      b.tags.append(('Players', value))
+
+  def Board(self):
+    b = self.board
+    if b.dealer is not None:
+      b.contract = board.AuctionContract(b.dealer, b.auction)
+    if b.contract is not None and b.contract.level:
+      if len(b.play) == 52:
+        side = b.contract.declarer % 2
+        trump = b.Trump()
+        b.result = len([1 for leader, cards in b.Tricks()
+                        if board.TrickWinner(cards, leader, trump) % 2
+                        == side])
+      elif self.claim is not None:
+        b.result = self.claim
+    if not b.play:
+      b.play = None
+    return b
+
+
+def _Pairs(lines):
+  """Yields the (key, value) pairs of a stream of LIN lines."""
+  pending = None
+  for line in lines:
+    line = line.strip()
+    if not line:
+      continue
+    fields = line.split('|')
+    if line.endswith('|'):
+      fields.pop()
+    for field in fields:
+      if pending is None:
+        pending = field.strip().lower()
+      else:
+        yield (pending, field)
+        pending = None
+
+
+def Read(lines):
+  """Parse LIN, one board at a time.
+
+  Arguments:
+    lines: An iterable of lines, e.g. a file object.
+
+  Yields:
+    A board.Board for each board in the input.
+
+  Raises:
+    ParseError on malformed input.
+  """
+  builder = None
+  for key, value in _Pairs(lines):
+    if (key == 'qx' or key == 'md') and builder is not None and builder.dealt:
+      yield builder.Board()
+      builder = None
+    if builder is None:
+      builder = _Builder()
+    builder.Add(key, value)
+  if builder is not None and builder.dealt:
+    yield builder.Board()
+
+
+def ReadFile(path, use_mmap=True):
+  """Parse a LIN file, one board at a time; see Read.
+
+  Arguments:
+    path: The name of the file.
+    use_mmap: Whether to memory-map the file rather than read it.
+  """
+  f = open(path, 'rb')
+  try:
+    if use_mmap and os.fstat(f.fileno()).st_size:
+      m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        for b in Read(iter(m.readline, '')):
+          yield b
+      finally:
+        m.close()
+    else:
+      for b in Read(f):
+        yield b
+  finally:
+    f.close()
+
+
+def FormatBoard(b):
+  """Returns the LIN line for a board.Board."""
+  out = []
+  if b.number is not None:
+    out.append('qx|o%d|' % b.number)
+  for name, value in b.tags:
+    if name == 'Players':
+      out.append('pn|%s|' % value)
+  if b.hands is not None:
+    out.append('md|%s|' % FormatDeal(b.hands, b.dealer))
+  if b.number is not None:
+    out.append('ah|Board %d|' % b.number)
+  out.append('sv|%s|' % _VULNERABLE_NAMES[tuple(b.vulnerable)])
+  for call in b.auction or ():
+    out.append('mb|%s|' % _CALL_TOKENS[call].lower())
+  for card in b.play or ():
+    out.append('pc|%s|' % ''.join(board.CardName(card)))
+  if b.result is not None and len(b.play or ()) < 52:
+    out.append('mc|%d|' % b.result)
+  out.append('\n')
+  return ''.join(out)
+
+
+def Write(boards, out, buffer_boards=DEFAULT_BUFFER_BOARDS):
+  """Write boards as LIN, one per line.
+
+  Arguments:
+    boards: An iterable of board.Boards.
+    out: A file-like object.
+    buffer_boards: The number of boards formatted between writes.
+  """
+  buf = []
+  for b in boards:
+    buf.append(FormatBoard(b))
+    if len(buf) >= buffer_boards:
+      out.write(''.join(buf))
+      buf = []
+  if buf:
+    out.write(''.join(buf))
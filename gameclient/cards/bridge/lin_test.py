@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import lin
+
+import random
+import StringIO
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import pbn_test
+from gameclient.cards.bridge import rules
+
+_SAMPLE = ('pn|Ann,Bob,Cat,Dan|st||md|1SAKQJHAKQDAKQCAKQ,S2H5432D5432C5432,'
+           'ST987HJT9DJT9CJT9,|rh||ah|Board 7|sv|n|mb|7N!|an|Grand|mb|p|'
+           'mb|p|mb|p|pc|S2|pc|S7|pc|S3|pc|SA|mc|13|pg||\n'
+           'qx|o8|md|1SAKQJHAKQDAKQCAKQ,S2H5432D5432C5432,'
+           'ST987HJT9DJT9CJT9,S6543H876D876C876|sv|o|mb|p|mb|p|mb|p|mb|p|\n')
+
+
+class TestLin(unittest.TestCase):
+  def testRead(self):
+    boards = list(lin.Read(StringIO.StringIO(_SAMPLE)))
+    self.assertEqual(len(boards), 2)
+    first, second = boards
+    self.assertEqual(first.number, 7)
+    self.assertEqual(first.dealer, 2)
+    self.assertEqual(first.vulnerable, (True, False))
+    self.assertEqual(first.tags, [('Players', 'Ann,Bob,Cat,Dan')])
+    self.assertEqual(len(first.hands[1]), 13)
+    self.assertEqual(first.hands[0].SuitLength(cardlib.Card.SPADES), 4)
+    self.assertEqual(str(first.contract), '7NT')
+    self.assertEqual(first.contract.declarer, 2)
+    self.assertEqual([str(c) for c in first.play], ['2S', '7S', '3S', 'AS'])
+    self.assertEqual(first.result, 13)
+    self.assertEqual(second.dealer, 2)
+    self.assertEqual(second.contract.level, 0)
+    self.assertEqual(second.hands, first.hands)
+    self.failUnless(second.auction[0] is rules.Pass())
+
+  def testRoundTrip(self):
+    rand = random.Random(9)
+    boards = [pbn_test._RandomBoard(rand, i + 1) for i in xrange(30)]
+    for b in boards:
+      if b.play is not None and len(b.play) == 52:
+        b.result = None
+    out = StringIO.StringIO()
+    lin.Write(boards, out, buffer_boards=4)
+    read = list(lin.Read(StringIO.StringIO(out.getvalue())))
+    for b in boards:
+      if b.play is not None and len(b.play) == 52:
+        b.result = read[b.number - 1].result
+    self.assertEqual(read, boards)
+
+  def testErrors(self):
+    for text in ['md|3SAK|\n', 'md|3SAKX,,,|\n', 'md|3,,,|mb|9C|\n',
+                 'md|3,,,|pc|S|\n', 'md|9,,,|\n',
+                 'md|0,,,|\n']:
+      self.assertRaises(lin.ParseError, list,
+                        lin.Read(StringIO.StringIO(text)))
+
+
+if __name__ == '__main__':
+  unittest.main()
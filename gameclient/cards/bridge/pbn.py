@@ -0,0 +1,395 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Reading and writing boards in Portable Bridge Notation (PBN).
+
+Read parses a stream of lines lazily, yielding one board.Board at a time,
+so memory use does not grow with the size of the file. ReadFile memory-maps
+the file. Calls and cards in the results are the interned rules.Call and
+cardlib.Card objects.
+
+Only what a board.Board holds is interpreted: the Board, Dealer,
+Vulnerable, Deal, Declarer, Contract and Result tags and the Auction and
+Play sections. Other tags are kept as strings in Board.tags; notes,
+commentary and supplemental sections are skipped.
+"""
+
+import mmap
+import os
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class ParseError(Error):
+  """The input is not valid PBN."""
+
+
+# Calls keyed by their upper-case PBN tokens.
+_CALLS = {'PASS': rules.Pass(), 'P': rules.Pass(), 'X': rules.Double(),
+          'XX': rules.Redouble()}
+for _bid in rules.BIDS:
+  _CALLS['%d%s' % (_bid.level, _bid.strain.abbrevs[0])] = _bid
+  if _bid.strain == rules.Bid.NOTRUMP:
+    _CALLS['%dN' % _bid.level] = _bid
+del _bid
+
+_VULNERABLE = {'NONE': (False, False), 'LOVE': (False, False),
+               '-': (False, False), 'NS': (True, False),
+               'EW': (False, True), 'ALL': (True, True),
+               'BOTH': (True, True)}
+_VULNERABLE_NAMES = {(False, False): 'None', (True, False): 'NS',
+                     (False, True): 'EW', (True, True): 'All'}
+
+# Tags written before the ones Board interprets, and after, in the order
+# of the PBN standard's mandatory tag set.
+_TAGS_BEFORE = ('Event', 'Site', 'Date')
+_TAGS_PLAYERS = ('West', 'North', 'East', 'South')
+_TAGS_AFTER = ('Scoring',)
+_INTERPRETED = frozenset(['Board', 'Dealer', 'Vulnerable', 'Deal',
+                          'Declarer', 'Contract', 'Result', 'Auction',
+                          'Play'])
+
+DEFAULT_BUFFER_BOARDS = 1000
+
+
+def _Seat(value):
+  try:
+    return board.SEAT_INDEX[value.upper()]
+  except KeyError:
+    raise ParseError('"%s" is not a seat.' % value)
+
+
+def ParseDeal(value):
+  """Parse a Deal tag value like 'N:AKQ.JT9.876.5432 ...'.
+
+  Returns:
+    A list of 4 cardlib.CardSets indexed by seat; unknown hands ('-') are
+    None.
+  """
+  try:
+    first, hands = value.split(':', 1)
+  except ValueError:
+    raise ParseError('Bad deal: "%s"' % value)
+  first = _Seat(first)
+  hands = hands.split()
+  if len(hands) != 4:
+    raise ParseError('Bad deal: "%s"' % value)
+  result = [None] * 4
+  for i, hand in enumerate(hands):
+    if hand == '-':
+      continue
+    suits = hand.split('.')
+    if len(suits) != 4:
+      raise ParseError('Bad hand: "%s"' % hand)
+    bits = 0
+    try:
+      for suit, ranks in zip(board.SUITS_DOWN, suits):
+        bits |= board.SuitBits(ranks.upper(), suit)
+    except board.Error, e:
+      raise ParseError('Bad hand: "%s" (%s)' % (hand, e))
+    result[(first + i) % 4] = cardlib.CardSet.FromBits(bits)
+  return result
+
+
+def FormatDeal(hands, first=0):
+  """Format hands as a Deal tag value, starting with seat first."""
+  out = []
+  for i in xrange(4):
+    hand = hands[(first + i) % 4]
+    if hand is None:
+      out.append('-')
+    else:
+      out.append('.'.join(board.SuitRanks(hand, s) for s in board.SUITS_DOWN))
+  return '%s:%s' % (board.SEATS[first], ' '.join(out))
+
+
+def ParseContract(value, declarer):
+  """Parse a Contract tag value like '4SX' or 'Pass'.
+
+  Returns:
+    A rules.Contract whose declarer is the seat declarer.
+  """
+  value = value.upper()
+  if value == 'PASS':
+    return rules.Contract(None, None)
+  redoubled = value.endswith('XX')
+  doubled = not redoubled and value.endswith('X')
+  bid = _CALLS.get(value.rstrip('X'))
+  if not isinstance(bid, rules.Bid):
+    raise ParseError('Bad contract: "%s"' % value)
+  return rules.Contract(bid, declarer, doubled, redoubled)
+
+
+def _Auction(dealer, tokens):
+  calls = []
+  for token in tokens:
+    token = token.upper().rstrip('!?')
+    if not token or token[0] in '=$*+':
+      continue
+    if token == 'AP':
+      auction = rules.Auction(range(4), dealer, calls)
+      while not auction.IsOver():
+        auction.Append(rules.Pass())
+      calls = auction.calls
+      continue
+    if token == '-':
+      continue
+    try:
+      calls.append(_CALLS[token])
+    except KeyError:
+      raise ParseError('"%s" is not a call.' % token)
+  return calls
+
+
+def _Play(first, trump, tokens):
+  """Reorders PBN play, listed by seat from first, into the order played."""
+  tokens = [t for t in tokens if t and t[0] not in '=$*+']
+  play = []
+  leader = first
+  for i in xrange(0, len(tokens), 4):
+    row = tokens[i:i + 4]
+    trick = []
+    for k in xrange(4):
+      column = (leader - first + k) % 4
+      if column >= len(row) or row[column] == '-':
+        break
+      token = row[column].rstrip('!?')
+      if len(token) != 2:
+        raise ParseError('"%s" is not a card.' % token)
+      try:
+        trick.append(board.LookupCard(token[0], token[1]))
+      except board.Error, e:
+        raise ParseError(str(e))
+    play.extend(trick)
+    if len(trick) < 4:
+      break
+    leader = board.TrickWinner(trick, leader, trump)
+  return play
+
+
+def _Board(tags, sections):
+  """Build a board.Board from a game's tags and section tokens."""
+  b = board.Board()
+  values = dict(tags)
+  for name, value in tags:
+    if name not in _INTERPRETED:
+      b.tags.append((name, value))
+  try:
+    if values.get('Board'):
+      b.number = int(values['Board'])
+    if values.get('Result'):
+      b.result = int(values['Result'])
+  except ValueError, e:
+    raise ParseError(str(e))
+  if values.get('Dealer'):
+    b.dealer = _Seat(values['Dealer'])
+  if 'Vulnerable' in values:
+    try:
+      b.vulnerable = _VULNERABLE[values['Vulnerable'].upper()]
+    except KeyError:
+      raise ParseError('Bad vulnerability: "%s"' % values['Vulnerable'])
+  if values.get('Deal'):
+    b.hands = ParseDeal(values['Deal'])
+  if values.get('Contract'):
+    declarer = None
+    if values.get('Declarer'):
+      declarer = _Seat(values['Declarer'].lstrip('^'))
+    b.contract = ParseContract(values['Contract'], declarer)
+    if b.contract.level != 0 and declarer is None:
+      raise ParseError('Contract "%s" has no declarer' % values['Contract'])
+  if 'Auction' in sections:
+    b.auction = _Auction(_Seat(values['Auction']), sections['Auction'])
+  if 'Play' in sections and values.get('Play') and b.contract is not None:
+    b.play = _Play(_Seat(values['Play']), b.Trump(), sections['Play'])
+  return b
+
+
+def _Lines(lines):
+  """Strips comments and escaped lines, yielding what remains."""
+  in_comment = False
+  for line in lines:
+    line = line.rstrip('\r\n')
+    if in_comment:
+      end = line.find('}')
+      if end < 0:
+        continue
+      line = line[end + 1:]
+      in_comment = False
+    if line.startswith('%'):
+      continue
+    if '{' in line or ';' in line:
+      out = []
+      i = 0
+      quoted = False
+      while i < len(line):
+        c = line[i]
+        if c == '"':
+          quoted = not quoted
+        elif not quoted and c == ';':
+          break
+        elif not quoted and c == '{':
+          end = line.find('}', i)
+          if end < 0:
+            in_comment = True
+            break
+          i = end + 1
+          continue
+        out.append(c)
+        i += 1
+      line = ''.join(out)
+    yield line
+
+
+def Read(lines):
+  """Parse PBN, one board at a time.
+
+  Arguments:
+    lines: An iterable of lines, e.g. a file object.
+
+  Yields:
+    A board.Board for each game in the input.
+
+  Raises:
+    ParseError on malformed input.
+  """
+  tags = []
+  sections = {}
+  section = None
+  previous = {}
+  for line in _Lines(lines):
+    stripped = line.strip()
+    if not stripped:
+      if tags:
+        yield _Board(tags, sections)
+        previous.update(tags)
+        tags = []
+        sections = {}
+      section = None
+      continue
+    if stripped.startswith('['):
+      end = stripped.rfind(']')
+      try:
+        name, value = stripped[1:end].split(None, 1)
+      except ValueError:
+        raise ParseError('Bad tag: %s' % stripped)
+      value = value.strip()
+      if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        raise ParseError('Bad tag: %s' % stripped)
+      value = value[1:-1]
+      if value == '#':
+        value = previous.get(name, '')
+      tags.append((name, value))
+      section = name
+      sections.pop(name, None)
+      continue
+    if section is None:
+      raise ParseError('Data outside a section: %s' % stripped)
+    sections.setdefault(section, []).extend(stripped.split())
+  if tags:
+    yield _Board(tags, sections)
+
+
+def ReadFile(path, use_mmap=True):
+  """Parse a PBN file, one board at a time; see Read.
+
+  Arguments:
+    path: The name of the file.
+    use_mmap: Whether to memory-map the file rather than read it.
+  """
+  f = open(path, 'rb')
+  try:
+    if use_mmap and os.fstat(f.fileno()).st_size:
+      m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        for b in Read(iter(m.readline, '')):
+          yield b
+      finally:
+        m.close()
+    else:
+      for b in Read(f):
+        yield b
+  finally:
+    f.close()
+
+
+def _Tag(name, value):
+  return '[%s "%s"]\n' % (name, value)
+
+
+def FormatBoard(b):
+  """Returns the PBN text for a board.Board, ending with a blank line."""
+  extra = dict(b.tags)
+  out = []
+  for name in _TAGS_BEFORE:
+    if name in extra:
+      out.append(_Tag(name, extra[name]))
+  if b.number is not None:
+    out.append(_Tag('Board', b.number))
+  for name in _TAGS_PLAYERS:
+    if name in extra:
+      out.append(_Tag(name, extra[name]))
+  if b.dealer is not None:
+    out.append(_Tag('Dealer', board.SEATS[b.dealer]))
+  out.append(_Tag('Vulnerable', _VULNERABLE_NAMES[tuple(b.vulnerable)]))
+  if b.hands is not None:
+    out.append(_Tag('Deal', FormatDeal(b.hands, b.dealer or 0)))
+  for name in _TAGS_AFTER:
+    if name in extra:
+      out.append(_Tag(name, extra[name]))
+  if b.contract is not None:
+    if b.contract.level:
+      out.append(_Tag('Declarer', board.SEATS[b.contract.declarer]))
+      out.append(_Tag('Contract', str(b.contract)))
+    else:
+      out.append(_Tag('Contract', 'Pass'))
+  if b.result is not None:
+    out.append(_Tag('Result', b.result))
+  skip = set(_TAGS_BEFORE + _TAGS_PLAYERS + _TAGS_AFTER)
+  for name, value in b.tags:
+    if name not in skip:
+      out.append(_Tag(name, value))
+  if b.auction is not None:
+    out.append(_Tag('Auction', board.SEATS[b.dealer or 0]))
+    for i in xrange(0, len(b.auction), 4):
+      out.append(' '.join(_CallToken(c) for c in b.auction[i:i + 4]) + '\n')
+  if b.play:
+    first = b.OpeningLeader()
+    out.append(_Tag('Play', board.SEATS[first]))
+    for leader, cards in b.Tricks():
+      row = ['-'] * 4
+      for k, card in enumerate(cards):
+        row[(leader - first + k) % 4] = ''.join(board.CardName(card))
+      out.append(' '.join(row) + '\n')
+    out.append('*\n')
+  out.append('\n')
+  return ''.join(out)
+
+
+def _CallToken(call):
+  if isinstance(call, rules.Pass):
+    return 'Pass'
+  return str(call)
+
+
+def Write(boards, out, buffer_boards=DEFAULT_BUFFER_BOARDS):
+  """Write boards as PBN.
+
+  Arguments:
+    boards: An iterable of board.Boards.
+    out: A file-like object.
+    buffer_boards: The number of boards formatted between writes.
+  """
+  buf = []
+  for b in boards:
+    buf.append(FormatBoard(b))
+    if len(buf) >= buffer_boards:
+      out.write(''.join(buf))
+      buf = []
+  if buf:
+    out.write(''.join(buf))
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import pbn
+
+import os
+import random
+import StringIO
+import tempfile
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import rules
+
+_SAMPLE = '''% A comment line.
+[Event "Club game"]
+[Board "1"]
+[Dealer "N"]
+[Vulnerable "None"]
+[Deal "N:AKQJ.AKQ.AKQ.AKQ T987.JT9.JT9.JT9 6543.876.876.876 2.5432.5432.5432"]
+[Declarer "N"]
+[Contract "7NT"]
+[Result "13"]
+[Auction "N"]
+7NT Pass Pass Pass
+[Play "E"]
+S7 S3 S2 SA
+{The rest is claimed.} *
+
+[Event "#"]
+[Board "2"]
+[Dealer "E"]
+[Vulnerable "Both"]
+[Deal "E:- - - -"]
+[Auction "E"]
+1C! =1= X AP
+'''
+
+
+def _RandomBoard(rand, number):
+  deck = cardlib.Deck(rand.shuffle)
+  hands = [deck.PickSet(13) for _ in xrange(4)]
+  dealer = rand.randrange(4)
+  auction = rules.Auction(range(4), dealer)
+  while not auction.IsOver():
+    legal = auction.LegalCalls()
+    if rand.random() < 0.6:
+      auction.Append(rules.Pass())
+    else:
+      auction.Append(rand.choice(legal))
+  b = board.Board(number=number, dealer=dealer,
+                  vulnerable=(rand.random() < 0.5, rand.random() < 0.5),
+                  hands=hands, auction=auction.calls,
+                  contract=auction.contract)
+  if auction.contract.level:
+    b.play = []
+    remaining = list(hands)
+    leader = b.OpeningLeader()
+    for _ in xrange(rand.randrange(14)):
+      trick = []
+      for k in xrange(4):
+        seat = (leader + k) % 4
+        legal = list(rules.Rules(range(4), 0).LegalPlays(remaining[seat],
+                                                         trick))
+        card = rand.choice(legal)
+        remaining[seat] = remaining[seat].Remove(card)
+        trick.append(card)
+      b.play.extend(trick)
+      leader = board.TrickWinner(trick, leader, b.Trump())
+    b.play = b.play or None
+    b.result = rand.randrange(14)
+  return b
+
+
+class TestPbn(unittest.TestCase):
+  def testRead(self):
+    boards = list(pbn.Read(StringIO.StringIO(_SAMPLE)))
+    self.assertEqual(len(boards), 2)
+    first, second = boards
+    self.assertEqual(first.number, 1)
+    self.assertEqual(first.dealer, 0)
+    self.assertEqual(first.tags, [('Event', 'Club game')])
+    self.assertEqual(str(first.contract), '7NT')
+    self.assertEqual(first.contract.declarer, 0)
+    self.assertEqual(first.result, 13)
+    self.assertEqual(first.hands[0].SuitLength(cardlib.Card.SPADES), 4)
+    self.assertEqual(len(first.hands[3]), 13)
+    self.assertEqual([str(c) for c in first.auction], ['7NT', 'P', 'P', 'P'])
+    self.failUnless(first.auction[0] is rules.Bid(7, 'NT'))
+    # E leads; the cards are listed E, S, W, N.
+    self.assertEqual([str(c) for c in first.play], ['7S', '3S', '2S', 'AS'])
+    self.failUnless(first.play[3] is cardlib.Card(cardlib.Card.SPADES,
+                                                  cardlib.Card.ACEHI))
+    self.assertEqual(second.tags, [('Event', 'Club game')])
+    self.assertEqual(second.vulnerable, (True, True))
+    self.assertEqual(second.hands, [None] * 4)
+    self.assertEqual([str(c) for c in second.auction],
+                     ['1C', 'X', 'P', 'P', 'P'])
+
+  def testRoundTrip(self):
+    rand = random.Random(4)
+    boards = [_RandomBoard(rand, i + 1) for i in xrange(30)]
+    out = StringIO.StringIO()
+    pbn.Write(boards, out, buffer_boards=7)
+    self.assertEqual(list(pbn.Read(StringIO.StringIO(out.getvalue()))),
+                     boards)
+
+  def testReadFile(self):
+    fd, path = tempfile.mkstemp(suffix='.pbn')
+    try:
+      os.write(fd, _SAMPLE)
+      os.close(fd)
+      self.assertEqual(list(pbn.ReadFile(path)),
+                       list(pbn.Read(StringIO.StringIO(_SAMPLE))))
+      self.assertEqual(list(pbn.ReadFile(path, use_mmap=False)),
+                       list(pbn.ReadFile(path)))
+    finally:
+      os.remove(path)
+
+  def testErrors(self):
+    for text in ['[Board "x"]\n', '[Dealer "Q"]\n', 'Pass\n',
+                 '[Deal "N:AKQ"]\n', '[Auction "N"]\n1Z\n',
+                 '[Deal "N:AKQZ... - - -"]\n', '[Contract "3NT"]\n']:
+      self.assertRaises(pbn.ParseError, list,
+                        pbn.Read(StringIO.StringIO(text)))
+
+
+if __name__ == '__main__':
+  unittest.main()
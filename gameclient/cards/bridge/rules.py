@@ -1,13 +1,12 @@
 #!/usr/bin/python
 # Copyright 2009 Matt Rudary (matt@rudary.com)
 
+from gameclient import instrument
 from gameclient.cards import cardlib
 
 import random
 import re
 
-from gameclient import util
-
 
 class Error(Exception):
   """Base exception class for this module."""
@@ -18,20 +17,60 @@ class CallException(Error):
 
 
 class Call(object):
-  """Base class for calls (e.g. bids, pass, etc)"""
-  pass
+  """Base class for calls (e.g. bids, pass, etc)
+
+  Pass, Double, Redouble and the 35 Bids are interned: constructing one
+  returns the same object every time. Each has an index into ALL_CALLS.
+  """
+  index = None
 
 
 class Pass(Call):
-  pass
+  index = 0
+
+  def __new__(cls):
+    return _PASS
+
+  def __reduce__(self):
+    return (Pass, ())
+
+  def __str__(self):
+    return 'P'
+
+  def __repr__(self):
+    return 'Pass()'
 
 
 class Double(Call):
-  pass
+  index = 1
+
+  def __new__(cls):
+    return _DOUBLE
+
+  def __reduce__(self):
+    return (Double, ())
+
+  def __str__(self):
+    return 'X'
+
+  def __repr__(self):
+    return 'Double()'
 
 
 class Redouble(Call):
-  pass
+  index = 2
+
+  def __new__(cls):
+    return _REDOUBLE
+
+  def __reduce__(self):
+    return (Redouble, ())
+
+  def __str__(self):
+    return 'XX'
+
+  def __repr__(self):
+    return 'Redouble()'
 
 
 class Bid(Call):
@@ -59,6 +98,9 @@ class Bid(Call):
     def NewStrain(abbrev):
       return Bid.STRAIN_MAP[abbrev]
 
+    def __reduce__(self):
+      return (_NewStrain, (self.abbrevs[0],))
+
     def __str__(self):
       return self.name
 
@@ -92,8 +134,8 @@ class Bid(Call):
   STRAIN_MAP = dict([(a, s) for s in STRAINS for a in s.abbrevs]
                     + [(s.name, s) for s in STRAINS])
 
-  def __init__(self, level, strain):
-    """Initialize the bid.
+  def __new__(cls, level, strain):
+    """Look up the bid.
 
     Arguments:
       level: An integer between 1 and 7.
@@ -101,21 +143,20 @@ class Bid(Call):
     """
     if not isinstance(level, int) or level < 1 or 7 < level:
       raise CallException(repr(level) + ' is an invalid level')
-    self.level = level
-    if isinstance(strain, Bid.Strain):
-      self.strain = strain
-    elif strain in Bid.STRAIN_MAP:
-      self.strain = Bid.STRAIN_MAP[strain]
-    else:
-      raise CallException('%s is an invalid strain' % repr(strain))
+    if not isinstance(strain, Bid.Strain):
+      if strain not in Bid.STRAIN_MAP:
+        raise CallException('%s is an invalid strain' % repr(strain))
+      strain = Bid.STRAIN_MAP[strain]
+    return ALL_CALLS[_FIRST_BID_INDEX + (level - 1) * len(Bid.STRAINS)
+                     + strain.magnitude]
+
+  def __reduce__(self):
+    return (Bid, (self.level, self.strain.abbrevs[0]))
 
   def __cmp__(self, other):
     if not isinstance(other, Bid):
       raise TypeError('Cannot compare a Bid to a %s' % str(type(other)))
-    if self.level == other.level:
-      return cmp(self.strain, other.strain)
-    else:
-      return cmp(self.level, other.level)
+    return cmp(self.index, other.index)
 
   def __str__(self):
     return '%d%s' % (self.level, self.strain.abbrevs[0])
@@ -124,6 +165,71 @@ class Bid(Call):
     return 'Bid(%d, "%s")' % (self.level, self.strain.abbrevs[0])
 
 
+def _NewStrain(abbrev):
+  return Bid.Strain.NewStrain(abbrev)
+
+
+def _MakeCalls():
+  calls = [object.__new__(Pass), object.__new__(Double),
+           object.__new__(Redouble)]
+  for level in xrange(1, 8):
+    for strain in Bid.STRAINS:
+      bid = object.__new__(Bid)
+      bid.level = level
+      bid.strain = strain
+      bid.index = len(calls)
+      calls.append(bid)
+  return tuple(calls)
+
+_FIRST_BID_INDEX = 3
+# Every possible call, ordered by Call.index: Pass, Double, Redouble and
+# then the bids from 1C to 7NT.
+ALL_CALLS = _MakeCalls()
+_PASS, _DOUBLE, _REDOUBLE = ALL_CALLS[:_FIRST_BID_INDEX]
+BIDS = ALL_CALLS[_FIRST_BID_INDEX:]
+
+# _BIDS_ABOVE[i] is the mask of the bids that supersede ALL_CALLS[i].
+_ALL_BIDS_MASK = ((1 << len(BIDS)) - 1) << _FIRST_BID_INDEX
+_BIDS_ABOVE = [_ALL_BIDS_MASK & ~((2 << i) - 1)
+               for i in xrange(len(ALL_CALLS))]
+_LEGAL_CALLS = {}
+
+
+def LegalCallMask(last_bid_index, doubled, redoubled, by_opponents):
+  """Returns the legal next calls of an unfinished auction as a bit mask.
+
+  This is the rule shared by Auction.LegalMask and gamestate.State.
+
+  Arguments:
+    last_bid_index: The Call.index of the last bid, or None if there is
+                    none.
+    doubled, redoubled: Whether the last bid has been doubled or redoubled.
+    by_opponents: Whether the last bid, double or redouble was made by an
+                  opponent of the player to call.
+
+  Returns:
+    A mask whose bit i is set if ALL_CALLS[i] is legal.
+  """
+  if last_bid_index is None:
+    return 1 << Pass.index | _ALL_BIDS_MASK
+  mask = 1 << Pass.index | _BIDS_ABOVE[last_bid_index]
+  if by_opponents:
+    if doubled:
+      mask |= 1 << Redouble.index
+    elif not redoubled:
+      mask |= 1 << Double.index
+  return mask
+
+
+def CallsInMask(mask):
+  """Returns the tuple of calls whose bits are set in mask, by index."""
+  calls = _LEGAL_CALLS.get(mask)
+  if calls is None:
+    calls = tuple(c for c in ALL_CALLS if mask >> c.index & 1)
+    _LEGAL_CALLS[mask] = calls
+  return calls
+
+
 def NewCall(S):
   """Build a Call from S.
 
@@ -140,18 +246,69 @@ def NewCall(S):
   Returns:
     A Call object.
   """
-  s = S.lower()
-  if s in ['pass', 'p', '-']:
-    return Pass()
-  if s == 'x':
-    return Double()
-  if s == 'xx':
-    return Redouble()
+  call = _CALL_TOKENS.get(S.lower())
+  if call is None:
+    raise CallException('"%s" did not compute as a call.' % S)
+  return call
+
+
+def _MakeCallTokens():
+  tokens = {'pass': _PASS, 'p': _PASS, '-': _PASS, 'x': _DOUBLE,
+            'xx': _REDOUBLE}
+  for bid in BIDS:
+    for abbrev in bid.strain.abbrevs:
+      tokens['%d%s' % (bid.level, abbrev.lower())] = bid
+  return tokens
+
+# The interned Call for each lower-case string that NewCall accepts.
+_CALL_TOKENS = _MakeCallTokens()
+# Calls in an auction string are separated by dashes, commas or white space;
+# a dash between separators is a pass.
+_AUCTION_TOKEN = re.compile(r'(?:^|(?<=[\s,]))-(?=[\s,]|$)|[^-\s,]+')
+
+
+def ParseCalls(text):
+  """Parse a string of calls, e.g. '1H-X-2S-P-P-P' or '1h x 2s p p p'.
+
+  The calls are not checked for legality; see ParseAuction.
+
+  Returns:
+    A list of the interned Call objects, in order.
+
+  Raises:
+    CallException if a token is not a call.
+  """
+  tokens = _CALL_TOKENS
+  calls = []
+  for token in _AUCTION_TOKEN.findall(text.lower()):
+    call = tokens.get(token)
+    if call is None:
+      raise CallException('"%s" did not compute as a call.' % token)
+    calls.append(call)
+  return calls
+
 
-  m = re.match('([1-7])([nshdc]|nt)$', s)
-  if m is not None:
-    return Bid(int(m.group(1)), m.group(2))
-  raise CallException('"%s" did not compute as a call.' % S)
+def ParseAuction(text, players=None, dealer=0):
+  """Parse a string of calls into an Auction, checking each call in turn.
+
+  Arguments:
+    text: The calls, as for ParseCalls.
+    players: An array of 4 players; by default the seats 0 to 3.
+    dealer: An index in [0, 3]; the offset into players of the dealer.
+
+  Returns:
+    An Auction holding the calls.
+
+  Raises:
+    CallException if a token is not a call.
+    The exceptions raised by Auction.Append if a call is not legal.
+  """
+  if players is None:
+    players = range(4)
+  auction = Auction(players, dealer)
+  for call in ParseCalls(text):
+    auction.Append(call)
+  return auction
 
 
 class Contract(object):
@@ -225,20 +382,357 @@ class IllegalDouble(RulesException):
   """Exception indicating a double or redouble bid is not legal."""
 
 
+class AuctionOver(RulesException):
+  """Exception indicating a call was made after the auction ended."""
+
+
+class IllegalPlay(RulesException):
+  """Exception indicating a card may not be played."""
+
+
+class Auction(object):
+  """The calls made in an auction so far.
+
+  The state needed to judge the next call (the last bid, whether it has
+  been doubled or redoubled, the number of trailing passes and the first
+  bidder of each strain in each partnership) is kept up to date as calls
+  are appended, so evaluating or appending a call takes constant time.
+  """
+  def __init__(self, players, dealer, calls=()):
+    """Initialize an Auction.
+
+    Arguments:
+      players: An array of 4 players.
+      dealer: An index in [0, 3]; the offset into players of the dealer.
+      calls: A sequence of Call objects already made; assumed to be a legal
+             sequence of calls.
+    """
+    self.players = players
+    self.dealer = dealer
+    self.calls = []
+    self.last_bid = None
+    self.last_bid_index = None
+    self.doubled = False
+    self.redoubled = False
+    self.passes = 0
+    self.contract = None
+    # _first_bid[partnership][strain.magnitude] is the index of the first
+    # bid of that strain by that partnership, where partnership 0 is the
+    # dealer's.
+    self._first_bid = [[None] * len(Bid.STRAINS),
+                       [None] * len(Bid.STRAINS)]
+    for call in calls:
+      self._Record(call)
+
+  def __len__(self):
+    return len(self.calls)
+
+  def __iter__(self):
+    return iter(self.calls)
+
+  def IsOver(self):
+    """Returns True if the auction has ended."""
+    return self.contract is not None
+
+  def _Contract(self):
+    if self.last_bid is None:
+      return Contract(None, None)
+    partnership = self.last_bid_index % 2
+    first = self._first_bid[partnership][self.last_bid.strain.magnitude]
+    declarer = self.players[(first + self.dealer) % 4]
+    return Contract(self.last_bid, declarer, self.doubled, self.redoubled)
+
+  def _Record(self, call):
+    n = len(self.calls)
+    if isinstance(call, Pass):
+      if 2 <= self.passes and 3 <= n:
+        self.contract = self._Contract()
+      self.passes += 1
+    elif isinstance(call, Double):
+      self.doubled = True
+      self.passes = 0
+    elif isinstance(call, Redouble):
+      self.doubled = False
+      self.redoubled = True
+      self.passes = 0
+    else:
+      self.last_bid = call
+      self.last_bid_index = n
+      self.doubled = False
+      self.redoubled = False
+      self.passes = 0
+      first = self._first_bid[n % 2]
+      if first[call.strain.magnitude] is None:
+        first[call.strain.magnitude] = n
+    self.calls.append(call)
+
+  def _EvaluatePass(self):
+    if 2 <= self.passes and 3 <= len(self.calls):  # The auction is ended
+      return self._Contract()
+    return None  # pass is always legal
+
+  def _EvaluateDouble(self):
+    if self.last_bid is None:
+      raise IllegalDouble('There must be a bid before you can double.')
+    if (len(self.calls) - self.last_bid_index) % 2 == 0:
+      raise IllegalDouble('You may not double your partner\'s bid.')
+    if self.doubled or self.redoubled:
+      raise IllegalDouble('There may be no intervening non-Pass calls.')
+    return None
+
+  def _EvaluateRedouble(self):
+    if self.last_bid is None:
+      raise IllegalDouble('There must be a bid and a double before you'
+                          ' may redouble.')
+    if self.doubled and self.passes != 1:
+      return None
+    raise IllegalDouble('You may only redouble your opponent\'s double.')
+
+  def _EvaluateBid(self, candidate):
+    if self.last_bid is None or candidate.index > self.last_bid.index:
+      return None
+    raise InsufficientBid('%s does not supersede %s.'
+                          % (str(candidate), str(self.last_bid)))
+
+  def LegalMask(self):
+    """Returns the legal next calls as a bit mask.
+
+    Bit i of the result is set if ALL_CALLS[i] is legal. The mask is 0 once
+    the auction has ended.
+    """
+    if self.contract is not None:
+      return 0
+    if self.last_bid is None:
+      return LegalCallMask(None, False, False, False)
+    if self.doubled or self.redoubled:
+      # The double or redouble is followed by passes only.
+      by_opponents = self.passes != 1
+    else:
+      by_opponents = (len(self.calls) - self.last_bid_index) % 2 == 1
+    return LegalCallMask(self.last_bid.index, self.doubled, self.redoubled,
+                         by_opponents)
+
+  def LegalCalls(self):
+    """Returns the tuple of legal next calls, ordered by Call.index."""
+    return CallsInMask(self.LegalMask())
+
+  def IsLegal(self, candidate):
+    """Returns True if candidate is a legal next call. Never raises."""
+    if not isinstance(candidate, Call) or candidate.index is None:
+      return False
+    return bool(self.LegalMask() >> candidate.index & 1)
+
+  def Evaluate(self, candidate):
+    """Determine whether candidate is a legal next call.
+
+    Arguments:
+      candidate: A Call object.
+
+    Returns:
+      None if the candidate is legal but does not end the auction.
+      A Contract if the candidate is legal and ends the auction.
+
+    Raises:
+      InsufficientBid for insufficient bids.
+      IllegalDouble if a double or redouble is not legal.
+      AuctionOver if the auction has already ended.
+    """
+    if self.contract is not None:
+      raise AuctionOver('The auction has ended.')
+    if isinstance(candidate, Pass):
+      return self._EvaluatePass()
+    elif isinstance(candidate, Double):
+      return self._EvaluateDouble()
+    elif isinstance(candidate, Redouble):
+      return self._EvaluateRedouble()
+    elif isinstance(candidate, Bid):
+      return self._EvaluateBid(candidate)
+    raise TypeError('candidate should be a Bid, Double, Redouble, or Pass, '
+                    'not a %s.' % type(candidate))
+
+  def Append(self, candidate):
+    """Make a call, after checking that it is legal.
+
+    Arguments:
+      candidate: A Call object.
+
+    Returns:
+      None if the auction continues, or the resulting Contract if candidate
+      ended it.
+
+    Raises:
+      The exceptions raised by Evaluate; the auction is unchanged if an
+      exception is raised.
+    """
+    result = self.Evaluate(candidate)
+    self._Record(candidate)
+    if result is not None:
+      self.contract = result
+    return result
+
+
+_METRICS = instrument.METRICS
+
+# Bridge ranks the ace high. The trump suit is set by the contract.
+ORDER = cardlib.ACE_HIGH
+TRICKS = cardlib.TrickGame(ORDER)
+
+
+def _TrumpSuit(strain):
+  """Returns the trump Card.Suit of a Strain, or None."""
+  if strain is None:
+    return None
+  return strain.suit
+
+
+class Play(object):
+  """The play of the cards, from the opening lead to the last trick.
+
+  Hands are kept as CardSet bits and changed in place, and the cards played
+  are kept on a stack, so PlayCard and Undo take constant time and copy
+  nothing. The same Play can be stepped forward and back by a search.
+  Seats are offsets into the players, as for Rules.EvaluateTrick.
+  """
+  def __init__(self, hands, leader, trump):
+    """Initialize a Play.
+
+    Arguments:
+      hands: A list of 4 cardlib.CardSets, indexed by seat.
+      leader: The seat on lead to the first trick.
+      trump: The Strain of the contract, or None at no trump.
+    """
+    self.hands = [h.bits for h in hands]
+    self.leader = leader
+    self._trump = _TrumpSuit(trump)
+    # tricks[side] is the number of tricks won by seats side and side + 2.
+    self.tricks = [0, 0]
+    self._played = []
+    # _best[i] is the position in its trick of the card winning the trick
+    # after _played[i].
+    self._best = []
+    self._leaders = []
+
+  def __len__(self):
+    """Returns the number of cards played."""
+    return len(self._played)
+
+  def ToAct(self):
+    """Returns the seat of the player to act."""
+    return (self.leader + len(self._played) % 4) % 4
+
+  def IsOver(self):
+    """Returns True once every card has been played."""
+    return not (self.hands[0] | self.hands[1] | self.hands[2]
+                | self.hands[3])
+
+  def Hand(self, seat):
+    """Returns the cards left in seat's hand as a cardlib.CardSet."""
+    return cardlib.CardSet.FromBits(self.hands[seat])
+
+  def Trick(self):
+    """Returns the cards played to the current trick, from the lead."""
+    n = len(self._played) % 4
+    if not n:
+      return []
+    return self._played[-n:]
+
+  def TricksPlayed(self):
+    """Returns the number of complete tricks."""
+    return len(self._leaders)
+
+  def History(self):
+    """Returns the cards played so far, in order."""
+    return list(self._played)
+
+  def LegalMask(self):
+    """Returns the cards the player to act may play, as CardSet bits."""
+    played = self._played
+    n = len(played) % 4
+    hand = self.hands[(self.leader + n) % 4]
+    if n:
+      return TRICKS.LegalMask(hand, played[-n].suit, self._trump)
+    return hand
+
+  def LegalPlays(self):
+    """Returns the cards the player to act may play, as a CardSet."""
+    return cardlib.CardSet.FromBits(self.LegalMask())
+
+  def PlayCard(self, card):
+    """Play a card for the player to act.
+
+    Arguments:
+      card: A cardlib.Card.
+
+    Returns:
+      The seat that won the trick if card completed it, and None otherwise.
+
+    Raises:
+      IllegalPlay if the card is not in LegalPlays; the play is unchanged.
+    """
+    bit = 1 << card.index
+    if not self.LegalMask() & bit:
+      raise IllegalPlay('%s may not be played.' % card)
+    played = self._played
+    n = len(played) % 4
+    self.hands[(self.leader + n) % 4] ^= bit
+    if n:
+      best = self._best[-1]
+      power = TRICKS.Power(played[-n].suit, self._trump)
+      if power[card.index] > power[played[best - n].index]:
+        best = n
+    else:
+      best = 0
+    played.append(card)
+    self._best.append(best)
+    if n < 3:
+      return None
+    winner = (self.leader + best) % 4
+    self._leaders.append(self.leader)
+    self.tricks[winner % 2] += 1
+    self.leader = winner
+    return winner
+
+  def Undo(self):
+    """Take back the last card played.
+
+    Returns:
+      The cardlib.Card taken back.
+
+    Raises:
+      IllegalPlay if no card has been played.
+    """
+    if not self._played:
+      raise IllegalPlay('No card has been played.')
+    card = self._played.pop()
+    self._best.pop()
+    n = len(self._played) % 4
+    if n == 3:
+      self.tricks[self.leader % 2] -= 1
+      self.leader = self._leaders.pop()
+    self.hands[(self.leader + n) % 4] |= 1 << card.index
+    return card
+
+
 class Rules(object):
-  """Run a bridge game. Dreadfully incomplete."""
-  def __init__(self, players, dealer=None):
+  """Run a bridge game: the auction (see Auction) and the play (see Play)."""
+  def __init__(self, players, dealer=None, pool=None):
     """Inialize a game of bridge.
 
+    Nothing is shuffled until a deal is needed, so a Rules used only to
+    evaluate auctions or tricks never builds a deck.
+
     Arguments:
       players: An array of 4 players.
-      dealer: An index in [0, 3].
+      dealer: An index in [0, 3]; chosen at random by default.
+      pool: An optional cardlib.DeckPool to deal from. By default, Deal
+            uses self.deck.
 
     Raises:
       RulesException: when there's a problem with the arguments.
     """
-    cardlib.Card.ACE = cardlib.Card.ACEHI
-    self.deck = cardlib.Deck()
+    self.order = ORDER
+    self._deck = None
+    self.pool = pool
     self.players = players
     if len(players) != 4:
       raise RulesException('%d is the wrong number of players.' % len(players))
@@ -249,62 +743,78 @@ class Rules(object):
     if self.dealer < 0 or 4 < self.dealer:
       raise RulesException('Illegal initial dealer ' + repr(self.dealer))
 
+  def _GetDeck(self):
+    if self._deck is None:
+      self._deck = cardlib.Deck(order=ORDER)
+    return self._deck
+  def _SetDeck(self, deck):
+    self._deck = deck
+  # The cardlib.Deck that Deal uses without a pool, built when first used.
+  deck = property(_GetDeck, _SetDeck)
+
   def SelectDealer(self):
     """Returns the index of the dealer."""
     return random.randint(0, 3)
 
-  def _EvaluatePass(self, auction):
-    if (3 <= len(auction) and isinstance(auction[-1], Pass)
-        and isinstance(auction[-2], Pass)):  # The auction is ended
-      idx, last_bid = LastBid(auction)
-      if last_bid is None:
-        return Contract(None, None)
-      partnership = idx % 2
-      relevant_bids = [i for i, b in enumerate(auction)
-                       if (i % 2 == partnership and isinstance(b, Bid)
-                           and b.strain == last_bid.strain)]
-      declarer = self.players[(relevant_bids[0] + self.dealer) % 4]
-      redoubled = util.ContainsInstance(auction[idx + 1:], Redouble)
-      doubled = (not redoubled
-                 and util.ContainsInstance(auction[idx + 1:], Double))
-      return Contract(last_bid, declarer, doubled, redoubled)
-    else:
-      return None  # pass is always legal
+  def Deal(self):
+    """Deal the whole deck.
 
-  def _EvaluateDouble(self, auction):
-    idx, last_bid = LastBid(auction)
-    if last_bid is None:
-      raise IllegalDouble('There must be a bid before you can double.')
-    if idx % 2 == len(auction) % 2:
-      raise IllegalDouble('You may not double your partner\'s bid.')
-    if not reduce(lambda x, y: x and y,
-                  map(lambda z: isinstance(z, Pass), auction[idx+1:]),
-                  True):
-      raise IllegalDouble('There may be no intervening non-Pass calls.')
-    return None
+    Returns:
+      A list of 4 cardlib.CardSet objects, one per player, starting with
+      self.players[0].
+    """
+    if self.pool is not None:
+      return self.pool.Deal()
+    deck = self.deck
+    return [deck.PickSet(13) for _ in xrange(4)]
 
-  def _EvaluateRedouble(self, auction):
-    idx, last_bid = LastBid(auction)
-    if last_bid is None:
-      raise IllegalDouble('There must be a bid and a double before you'
-                          ' may redouble.')
-    if (isinstance(auction[-1], Double)
-        or (idx < len(auction) - 3 and isinstance(auction[-3], Double)
-            and isinstance(auction[-2], Pass)
-            and isinstance(auction[-1], Pass))):
-      return None
-    raise IllegalDouble('You may only redouble your opponent\'s double.')
+  def LegalPlays(self, hand, trick):
+    """Determine which cards may be played to a trick.
 
-  def _EvaluateBid(self, auction, candidate):
-    idx, last_bid = LastBid(auction)
-    if last_bid is None or candidate > last_bid:
-      return None
-    raise InsufficientBid('%s does not supersede %s.'
-                          % (str(candidate), str(last_bid)))
+    Arguments:
+      hand: A cardlib.CardSet (or a sequence of cardlib.Card objects)
+            holding the cards of the player to act.
+      trick: A list of cardlib.Card objects already played to the trick,
+             starting with the card led.
+
+    Returns:
+      A cardlib.CardSet of the cards in hand that may be played.
+    """
+    return TRICKS.LegalPlays(hand, trick, None)
+
+  def NewAuction(self, calls=()):
+    """Start an Auction, dealt by self.dealer.
+
+    Arguments:
+      calls: A sequence of Call objects already made; assumed to be a legal
+             sequence of calls.
+    """
+    return Auction(self.players, self.dealer, calls)
+
+  def NewPlay(self, hands, leader, trump):
+    """Start the play of a hand; see Play.
+
+    Arguments:
+      hands: A list of 4 cardlib.CardSets, one per player, starting with
+             self.players[0].
+      leader: The offset into self.players of the opening leader.
+      trump: The Strain of the contract, or None at no trump.
+    """
+    return Play(hands, leader, trump)
+
+  def ParseAuction(self, text):
+    """Parse a string of calls into an Auction dealt by self.dealer.
+
+    See the module's ParseAuction.
+    """
+    return ParseAuction(text, self.players, self.dealer)
 
   def EvaluateCall(self, auction, candidate):
     """Determine whether candidate is a legal call, given the auction so far.
 
+    This replays auction on every call; use an Auction (see NewAuction) to
+    evaluate a whole auction in linear time.
+
     Arguments:
       auction: A sequence of Call objects; assumed to be a legal sequence of
                calls.
@@ -317,17 +827,34 @@ class Rules(object):
     Raises:
       InsufficientBid for insufficient bids.
       IllegalDouble if a double or redouble is not legal.
+      AuctionOver if the auction has already ended.
     """
-    if isinstance(candidate, Pass):
-      return self._EvaluatePass(auction)
-    elif isinstance(candidate, Double):
-      return self._EvaluateDouble(auction)
-    elif isinstance(candidate, Redouble):
-      return self._EvaluateRedouble(auction)
-    elif isinstance(candidate, Bid):
-      return self._EvaluateBid(auction, candidate)
-    raise TypeError('candidate should be a Bid, Double, Redouble, or Pass, '
-                    'not a %s.' % type(candidate))
+    if _METRICS.enabled:
+      return _METRICS.Call(
+          'rules_evaluate_call', (('call', type(candidate).__name__.lower()),),
+          lambda: self.NewAuction(auction).Evaluate(candidate))
+    return self.NewAuction(auction).Evaluate(candidate)
+
+  def LegalCalls(self, auction):
+    """Returns the tuple of legal calls after auction, ordered by index.
+
+    Arguments:
+      auction: A sequence of Call objects; assumed to be a legal sequence of
+               calls.
+    """
+    return self.NewAuction(auction).LegalCalls()
+
+  def IsLegal(self, auction, candidate):
+    """Returns True if candidate is a legal call after auction.
+
+    Unlike EvaluateCall, this never raises.
+
+    Arguments:
+      auction: A sequence of Call objects; assumed to be a legal sequence of
+               calls.
+      candidate: A Call object.
+    """
+    return self.NewAuction(auction).IsLegal(candidate)
 
   def EvaluateTrick(self, cards, leader, trump):
     """Determine the winner of a trick.
@@ -340,13 +867,7 @@ class Rules(object):
     Returns:
       The offset into self.players of the player who won the trick.
     """
-    def winner_from_candidates(s):
-      return (max(s, key=lambda x: x[1].rank)[0] + leader) % 4
-    if trump is None:
-      trumps = []
-    else:
-      trumps = [(p, c) for p,c in enumerate(cards) if c.suit == trump.suit]
-    if trumps:
-      return winner_from_candidates(trumps)
-    return winner_from_candidates([(p, c) for p,c in enumerate(cards)
-                                   if c.suit == cards[0].suit])
+    if _METRICS.enabled:
+      return _METRICS.Call('rules_evaluate_trick', (), TRICKS.Winner, cards,
+                           leader, _TrumpSuit(trump))
+    return TRICKS.Winner(cards, leader, _TrumpSuit(trump))
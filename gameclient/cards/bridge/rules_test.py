@@ -3,6 +3,8 @@
 
 from gameclient.cards.bridge import rules
 
+import pickle
+import random
 import unittest
 
 from gameclient.cards import cardlib
@@ -32,6 +34,44 @@ class TestCall(unittest.TestCase):
     self.assertRaises(rules.Error, rules.NewCall, '2X')
     self.assertRaises(rules.Error, rules.NewCall, '3f')
 
+  def testInterning(self):
+    self.failUnless(rules.Pass() is rules.NewCall('p'))
+    self.failUnless(rules.Redouble() is rules.NewCall('XX'))
+    self.failUnless(rules.Bid(3, 'N') is rules.NewCall('3nt'))
+    self.failUnless(rules.Bid(3, rules.Bid.NOTRUMP) is rules.Bid(3, 'NT'))
+    self.assertEqual(len(rules.ALL_CALLS), 38)
+    for i, call in enumerate(rules.ALL_CALLS):
+      self.assertEqual(call.index, i)
+    self.assertEqual(str(rules.ALL_CALLS[3]), '1C')
+    self.assertEqual(str(rules.ALL_CALLS[-1]), '7NT')
+    self.failUnless(pickle.loads(pickle.dumps(rules.Bid(4, 'S')))
+                    is rules.Bid(4, 'S'))
+
+  def testParseCalls(self):
+    expected = [rules.Bid(1, 'H'), rules.Double(), rules.Bid(2, 'S'),
+                rules.Pass(), rules.Pass(), rules.Pass()]
+    for text in ['1H-X-2S-P-P-P', '1h x 2s p p p', '1H, X, 2S, Pass, -, p',
+                 '  1h\tx\n2s p-p -  ']:
+      calls = rules.ParseCalls(text)
+      self.assertEqual(len(calls), len(expected))
+      for call, want in zip(calls, expected):
+        self.failUnless(call is want)
+    self.assertEqual(rules.ParseCalls(''), [])
+    self.failUnless(rules.ParseCalls('3nt')[0] is rules.Bid(3, 'N'))
+    self.assertRaises(rules.CallException, rules.ParseCalls, '1H 8S')
+
+  def testParseAuction(self):
+    auction = rules.ParseAuction('1H-X-2S-P-P-P', players='NESW', dealer=1)
+    self.failUnless(auction.IsOver())
+    self.assertEqual(str(auction.contract), '2S')
+    self.assertEqual(auction.contract.declarer, 'W')
+    self.failIf(rules.ParseAuction('1c p').IsOver())
+    self.assertRaises(rules.InsufficientBid, rules.ParseAuction, '2H 1S')
+    self.assertRaises(rules.IllegalDouble, rules.ParseAuction, '1H p x')
+    self.assertRaises(rules.AuctionOver, rules.ParseAuction, 'p p p p 1c')
+    game = rules.Rules(players=['N', 'E', 'S', 'W'], dealer=2)
+    self.assertEqual(game.ParseAuction('1n p p p').contract.declarer, 'S')
+
   def testBidOrdering(self):
     self.failUnless(rules.Bid(7, 'H') > rules.Bid(6, 'H'))
     self.failUnless(rules.Bid(2, 'S') < rules.Bid(2, 'NT'))
@@ -152,6 +192,78 @@ class TestRules(unittest.TestCase):
     self.assertRaises(rules.IllegalDouble,
                       self.rules.EvaluateCall, auction4, rules.NewCall('X'))
 
+  def testAuction(self):
+    auction = self.rules.NewAuction()
+    for call in ['-', '1H', '-', '1S', '-', '2N', 'X', '-', '-', '3C', '-',
+                 '3N', 'X', '-', '-', 'XX', '-', '-']:
+      self.failUnless(auction.Append(rules.NewCall(call)) is None)
+    self.failIf(auction.IsOver())
+    self.assertRaises(rules.IllegalDouble, auction.Append, rules.NewCall('X'))
+    self.assertRaises(rules.InsufficientBid,
+                      auction.Append, rules.NewCall('3N'))
+    self.assertEqual(len(auction), 18)
+    con = auction.Append(rules.NewCall('-'))
+    self.failUnless(auction.IsOver())
+    self.failUnless(auction.contract is con)
+    self.assertEqual(str(con), '3NTXX')
+    self.assertEqual(con.declarer, self.players[1])
+    self.assertRaises(rules.AuctionOver, auction.Append, rules.NewCall('-'))
+
+  def testAuctionDeclarer(self):
+    auction = rules.Rules(players=self.players, dealer=2).NewAuction()
+    for call in ['1S', '2H', '2S', '3H', '4S', '-', '-']:
+      self.failUnless(auction.Append(rules.NewCall(call)) is None)
+    con = auction.Append(rules.NewCall('-'))
+    self.assertEqual(str(con), '4S')
+    self.assertEqual(con.declarer, 'S')
+
+  def testLegalCalls(self):
+    auction = self.rules.NewAuction()
+    self.assertEqual(len(auction.LegalCalls()), 36)
+    self.failIf(auction.IsLegal(rules.Double()))
+    self.failIf(auction.IsLegal(rules.Call()))
+    # Cards have an index too, but are never calls.
+    self.failIf(auction.IsLegal(cardlib.Card.NewCard('2C')))
+    self.failIf(auction.IsLegal(None))
+    auction.Append(rules.NewCall('7S'))
+    self.assertEqual(auction.LegalCalls(),
+                     (rules.Pass(), rules.Double(), rules.Bid(7, 'NT')))
+    auction.Append(rules.NewCall('X'))
+    self.failUnless(auction.IsLegal(rules.Redouble()))
+    self.failIf(auction.IsLegal(rules.Double()))
+    self.assertEqual(self.rules.LegalCalls(map(rules.NewCall,
+                                               ['1C', 'X', '-'])),
+                     (rules.Pass(),) + rules.BIDS[1:])
+    self.failUnless(self.rules.IsLegal([rules.Bid(1, 'C')], rules.Double()))
+    self.failIf(self.rules.IsLegal([rules.Bid(1, 'C')], rules.Bid(1, 'C')))
+    seven_nt = rules.Bid(7, 'NT').index
+    self.assertEqual(rules.CallsInMask(rules.LegalCallMask(seven_nt, False,
+                                                           False, True)),
+                     (rules.Pass(), rules.Double()))
+    self.assertEqual(rules.CallsInMask(rules.LegalCallMask(seven_nt, True,
+                                                           False, False)),
+                     (rules.Pass(),))
+
+  def testLegalMaskMatchesEvaluate(self):
+    rand = random.Random(17)
+    for _ in xrange(200):
+      auction = self.rules.NewAuction()
+      while not auction.IsOver():
+        legal = []
+        for call in rules.ALL_CALLS:
+          try:
+            auction.Evaluate(call)
+            legal.append(call)
+          except rules.RulesException:
+            pass
+        self.assertEqual(tuple(legal), auction.LegalCalls())
+        # Favour passes so that auctions end.
+        if rand.random() < 0.5:
+          auction.Append(rules.Pass())
+        else:
+          auction.Append(rand.choice(legal))
+      self.assertEqual(auction.LegalMask(), 0)
+
   def testEvaluateTrick(self):
     def _EvalTrick(cards, leader, strain):
       c = map(lambda x: cardlib.Card(cardlib.Card.Suit.NewSuit(x[1]),
@@ -168,7 +280,100 @@ class TestRules(unittest.TestCase):
     self.assertEqual(_EvalTrick(['2H', '3C', '4H', '5C'], 0, 'C'), 3)
     self.assertEqual(_EvalTrick(['2C', '3H', '4H', '5H'], 0, 'N'), 0)
     self.assertEqual(_EvalTrick(['AH', '3C', '4H', '5H'], 0, 'N'), 0)
+
+  def testDeal(self):
+    hands = self.rules.Deal()
+    self.assertEqual(len(hands), 4)
+    self.assertEqual(map(len, hands), [13, 13, 13, 13])
+    self.assertEqual(len(reduce(lambda x, y: x | y, hands)), 52)
+
+  def testLazyDeck(self):
+    game = rules.Rules(players=self.players, dealer=1)
+    self.failUnless(game._deck is None)
+    game.NewAuction().Append(rules.Bid(1, 'C'))
+    game.EvaluateTrick([cardlib.Card.NewCard('2C')] * 4, 0, None)
+    self.failUnless(game._deck is None)
+    self.assertEqual(len(game.Deal()), 4)
+    self.failIf(game._deck is None)
+    pool = cardlib.DeckPool(3)
+    game = rules.Rules(players=self.players, dealer=1, pool=pool)
+    for _ in xrange(3):
+      hands = game.Deal()
+      self.assertEqual(len(hands[0] | hands[1] | hands[2] | hands[3]), 52)
+    self.failUnless(game._deck is None)
+
+  def testLegalPlays(self):
+    C = cardlib.Card
+    hand = cardlib.CardSet([C(C.SPADES, C.ACE), C(C.SPADES, C.TEN),
+                            C(C.HEARTS, C.KING)])
+    self.assertEqual(self.rules.LegalPlays(hand, []), hand)
+    self.assertEqual(self.rules.LegalPlays(hand, [C(C.SPADES, C.TWO)]),
+                     hand.Suit(C.SPADES))
+    self.assertEqual(self.rules.LegalPlays(list(hand), [C(C.CLUBS, C.TWO)]),
+                     hand)
     
 
+class TestPlay(unittest.TestCase):
+  def setUp(self):
+    self.rules = rules.Rules(players=['N', 'E', 'S', 'W'], dealer=0)
+    self.rules.deck = cardlib.Deck(random.Random(7).shuffle)
+    self.hands = self.rules.Deal()
+
+  def testLegalPlays(self):
+    C = cardlib.Card
+    hands = [cardlib.CardSet([C(C.SPADES, C.ACE), C(C.HEARTS, C.TWO)]),
+             cardlib.CardSet([C(C.SPADES, C.TWO), C(C.CLUBS, C.ACE)]),
+             cardlib.CardSet([C(C.HEARTS, C.ACE), C(C.HEARTS, C.THREE)]),
+             cardlib.CardSet([C(C.CLUBS, C.TWO), C(C.CLUBS, C.THREE)])]
+    play = self.rules.NewPlay(hands, 0, rules.Bid.CLUBS)
+    self.assertEqual(play.LegalPlays(), hands[0])
+    play.PlayCard(C(C.SPADES, C.ACE))
+    self.assertEqual(play.LegalPlays(),
+                     cardlib.CardSet([C(C.SPADES, C.TWO)]))
+    self.assertRaises(rules.IllegalPlay, play.PlayCard, C(C.CLUBS, C.ACE))
+    self.assertRaises(rules.IllegalPlay, play.PlayCard, C(C.HEARTS, C.ACE))
+    play.PlayCard(C(C.SPADES, C.TWO))
+    self.assertEqual(play.LegalPlays(), hands[2])
+    self.failUnless(play.PlayCard(C(C.HEARTS, C.THREE)) is None)
+    self.assertEqual(play.PlayCard(C(C.CLUBS, C.TWO)), 3)
+    self.assertEqual(play.tricks, [0, 1])
+    self.assertEqual(play.ToAct(), 3)
+    self.assertEqual(play.Trick(), [])
+
+  def testPlayMatchesEvaluateTrick(self):
+    rand = random.Random(3)
+    for trump in rules.Bid.STRAINS:
+      play = self.rules.NewPlay(self.hands, 1, trump)
+      tricks = [0, 0]
+      while not play.IsOver():
+        leader = play.leader
+        for _ in xrange(4):
+          card = rand.choice(list(play.LegalPlays()))
+          winner = play.PlayCard(card)
+        trick = play.History()[-4:]
+        expected = self.rules.EvaluateTrick(trick, leader, trump)
+        self.assertEqual(winner, expected)
+        self.assertEqual(play.leader, expected)
+        tricks[expected % 2] += 1
+      self.assertEqual(play.tricks, tricks)
+      self.assertEqual(play.TricksPlayed(), 13)
+
+  def testUndo(self):
+    rand = random.Random(5)
+    play = self.rules.NewPlay(self.hands, 3, rules.Bid.HEARTS)
+    self.assertRaises(rules.IllegalPlay, play.Undo)
+    states = []
+    while not play.IsOver():
+      states.append((list(play.hands), play.leader, list(play.tricks),
+                     play.Trick(), play.LegalMask()))
+      play.PlayCard(rand.choice(list(play.LegalPlays())))
+    while states:
+      play.Undo()
+      self.assertEqual((list(play.hands), play.leader, list(play.tricks),
+                        play.Trick(), play.LegalMask()), states.pop())
+    self.assertEqual(len(play), 0)
+    self.assertEqual([play.Hand(i) for i in xrange(4)], self.hands)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,304 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Scoring bridge contracts.
+
+Duplicate scores are looked up in a table indexed by level, strain,
+doubled state, vulnerability and tricks taken, built once at import time.
+Scores are from the declaring side's point of view: positive if the
+contract made, negative if it was set.
+
+The batch functions take NumPy arrays (or anything numpy.asarray accepts)
+and require NumPy; everything else is pure Python.
+"""
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+import bisect
+
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+UNDOUBLED = 0
+DOUBLED = 1
+REDOUBLED = 2
+
+LEVELS = 7
+STRAINS = len(rules.Bid.STRAINS)
+TRICKS = 14
+BOOK = 6
+
+GAME = 100
+RUBBER_GAMES = 2
+
+_NOTRUMP = rules.Bid.NOTRUMP.magnitude
+
+
+def DoubledState(contract):
+  """Returns UNDOUBLED, DOUBLED or REDOUBLED for a rules.Contract."""
+  if contract.redoubled:
+    return REDOUBLED
+  if contract.doubled:
+    return DOUBLED
+  return UNDOUBLED
+
+
+def _TrickValue(strain, dbl):
+  """Returns the value of the first and of each later odd trick."""
+  if strain == _NOTRUMP:
+    first, later = 40, 30
+  elif strain >= rules.Bid.HEARTS.magnitude:
+    first, later = 30, 30
+  else:
+    first, later = 20, 20
+  return (first << dbl, later << dbl)
+
+
+def _ContractPoints(level, strain, dbl):
+  first, later = _TrickValue(strain, dbl)
+  return first + (level - 1) * later
+
+
+def _Overtricks(strain, dbl, vul, overtricks):
+  if dbl == UNDOUBLED:
+    return overtricks * _TrickValue(strain, UNDOUBLED)[1]
+  return overtricks * (100 << (dbl - 1)) * (2 if vul else 1)
+
+
+def _Undertricks(dbl, vul, undertricks):
+  """Returns the (positive) penalty for going down undertricks."""
+  if dbl == UNDOUBLED:
+    return undertricks * (100 if vul else 50)
+  if vul:
+    penalty = 200 + 300 * (undertricks - 1)
+  else:
+    penalty = (100 + 200 * min(undertricks - 1, 2)
+               + 300 * max(undertricks - 3, 0))
+  return penalty << (dbl - 1)
+
+
+def _SlamBonus(level, vul):
+  if level == 6:
+    return 750 if vul else 500
+  if level == 7:
+    return 1500 if vul else 1000
+  return 0
+
+
+def _Insult(dbl):
+  return 50 * dbl
+
+
+def _DuplicateScore(level, strain, dbl, vul, tricks):
+  needed = level + BOOK
+  if tricks < needed:
+    return -_Undertricks(dbl, vul, needed - tricks)
+  points = _ContractPoints(level, strain, dbl)
+  if points >= GAME:
+    bonus = 500 if vul else 300
+  else:
+    bonus = 50
+  return (points + bonus + _SlamBonus(level, vul) + _Insult(dbl)
+          + _Overtricks(strain, dbl, vul, tricks - needed))
+
+
+def _Index(level, strain, dbl, vul, tricks):
+  return (((((level - 1) * STRAINS + strain) * 3 + dbl) * 2 + vul) * TRICKS
+          + tricks)
+
+_DUPLICATE = [_DuplicateScore(level, strain, dbl, vul, tricks)
+              for level in xrange(1, LEVELS + 1)
+              for strain in xrange(STRAINS)
+              for dbl in xrange(3)
+              for vul in xrange(2)
+              for tricks in xrange(TRICKS)]
+
+if numpy is not None:
+  _DUPLICATE_ARRAY = numpy.array(_DUPLICATE, dtype=numpy.int32).reshape(
+      LEVELS, STRAINS, 3, 2, TRICKS)
+
+
+def DuplicateScore(contract, tricks, vulnerable):
+  """Score a contract at duplicate.
+
+  Arguments:
+    contract: A rules.Contract.
+    tricks: The number of tricks declarer took, from 0 to 13.
+    vulnerable: True if the declaring side is vulnerable.
+
+  Returns:
+    The declaring side's score; 0 if the hand was passed out.
+  """
+  if contract.level == 0:
+    return 0
+  if not 0 <= tricks < TRICKS:
+    raise Error('Bad number of tricks: %s' % repr(tricks))
+  return _DUPLICATE[_Index(contract.level, contract.strain.magnitude,
+                           DoubledState(contract), int(bool(vulnerable)),
+                           tricks)]
+
+
+def ScoreBatch(levels, strains, doubled, vulnerable, tricks):
+  """Score many results at duplicate at once.
+
+  All arguments are integer arrays of the same shape (or broadcastable to
+  it). Passed-out hands cannot be represented.
+
+  Arguments:
+    levels: Contract levels, from 1 to 7.
+    strains: Bid.Strain magnitudes, from 0 (clubs) to 4 (no trump).
+    doubled: UNDOUBLED, DOUBLED or REDOUBLED.
+    vulnerable: 1 where the declaring side is vulnerable, else 0.
+    tricks: Tricks taken by declarer, from 0 to 13.
+
+  Returns:
+    An int32 array of the declaring side's scores.
+
+  Raises:
+    Error if a value is out of its range.
+  """
+  if numpy is None:
+    raise Error('ScoreBatch requires NumPy.')
+  levels = _Checked('level', levels, 1, LEVELS)
+  strains = _Checked('strain', strains, 0, STRAINS - 1)
+  doubled = _Checked('doubled state', doubled, UNDOUBLED, REDOUBLED)
+  vulnerable = _Checked('vulnerability', vulnerable, 0, 1)
+  tricks = _Checked('number of tricks', tricks, 0, TRICKS - 1)
+  return _DUPLICATE_ARRAY[levels - 1, strains, doubled, vulnerable, tricks]
+
+
+def _Checked(what, values, low, high):
+  """Returns values as an integer array, checking that low <= values <= high.
+
+  Negative indices would silently wrap around, so they must be caught here.
+  """
+  values = numpy.asarray(values)
+  if values.dtype == numpy.bool_:
+    values = values.astype(numpy.int8)
+  if values.dtype.kind not in 'iu':
+    raise Error('Bad %s: not integers' % what)
+  if values.size and (values.min() < low or values.max() > high):
+    raise Error('Bad %s: must be from %d to %d' % (what, low, high))
+  return values
+
+
+def RubberScore(contract, tricks, vulnerable, honors=0):
+  """Score a contract at rubber bridge.
+
+  Arguments:
+    contract: A rules.Contract.
+    tricks: The number of tricks declarer took, from 0 to 13.
+    vulnerable: True if the declaring side is vulnerable.
+    honors: Honor bonus points claimed by the declaring side.
+
+  Returns:
+    A (below, above) pair of points for the declaring side if the contract
+    made. If it was set, below is 0 and above is the negated penalty,
+    which is scored by the defenders.
+  """
+  if contract.level == 0:
+    return (0, 0)
+  if not 0 <= tricks < TRICKS:
+    raise Error('Bad number of tricks: %s' % repr(tricks))
+  level = contract.level
+  strain = contract.strain.magnitude
+  dbl = DoubledState(contract)
+  needed = level + BOOK
+  if tricks < needed:
+    return (0, honors - _Undertricks(dbl, vulnerable, needed - tricks))
+  return (_ContractPoints(level, strain, dbl),
+          honors + _SlamBonus(level, vulnerable) + _Insult(dbl)
+          + _Overtricks(strain, dbl, vulnerable, tricks - needed))
+
+
+class Rubber(object):
+  """Keeps the score of a rubber.
+
+  Sides are 0 (seats 0 and 2) and 1 (seats 1 and 3).
+  """
+  def __init__(self):
+    self.games = [0, 0]
+    # Points below the line in the current game.
+    self.partscores = [0, 0]
+    self.below = [0, 0]
+    self.above = [0, 0]
+
+  def IsVulnerable(self, side):
+    return self.games[side] > 0
+
+  def IsOver(self):
+    return max(self.games) >= RUBBER_GAMES
+
+  def Record(self, contract, side, tricks, honors=0):
+    """Score one hand.
+
+    Arguments:
+      contract: A rules.Contract.
+      side: The declaring side, 0 or 1.
+      tricks: The number of tricks declarer took.
+      honors: Honor bonus points claimed by the declaring side.
+    """
+    if self.IsOver():
+      raise Error('The rubber is over.')
+    below, above = RubberScore(contract, tricks, self.IsVulnerable(side))
+    self.above[side] += honors
+    if above < 0:
+      self.above[1 - side] -= above
+      return
+    self.above[side] += above
+    self.below[side] += below
+    self.partscores[side] += below
+    if self.partscores[side] >= GAME:
+      self.games[side] += 1
+      self.partscores = [0, 0]
+      if self.IsOver():
+        self.above[side] += 700 if self.games[1 - side] == 0 else 500
+
+  def Total(self, side):
+    return self.below[side] + self.above[side]
+
+
+# The smallest score difference worth each number of IMPs.
+IMP_THRESHOLDS = (20, 50, 90, 130, 170, 220, 270, 320, 370, 430, 500, 600,
+                  750, 900, 1100, 1300, 1500, 1750, 2000, 2250, 2500, 3000,
+                  3500, 4000)
+
+
+def Imps(difference):
+  """Convert a score difference to IMPs."""
+  imps = bisect.bisect_right(IMP_THRESHOLDS, abs(difference))
+  if difference < 0:
+    return -imps
+  return imps
+
+
+def ImpsBatch(differences):
+  """Convert an integer array of score differences to IMPs."""
+  if numpy is None:
+    raise Error('ImpsBatch requires NumPy.')
+  differences = numpy.asarray(differences)
+  return (numpy.sign(differences)
+          * numpy.searchsorted(IMP_THRESHOLDS, numpy.abs(differences),
+                               side='right'))
+
+
+def Matchpoints(scores):
+  """Matchpoint one board.
+
+  Arguments:
+    scores: A sequence of scores for the same side of the same board.
+
+  Returns:
+    A list with each score's matchpoints: 2 for every score it beats and
+    1 for every other score it ties.
+  """
+  ranked = sorted(scores)
+  return [bisect.bisect_left(ranked, s) + bisect.bisect_right(ranked, s)
+          - 1 for s in scores]
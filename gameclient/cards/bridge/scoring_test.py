@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import scoring
+
+import unittest
+
+from gameclient.cards.bridge import rules
+
+
+def _Contract(s, declarer='N'):
+  dbl = s.endswith('X') and not s.endswith('XX')
+  rdbl = s.endswith('XX')
+  return rules.Contract(rules.NewCall(s.rstrip('X')), declarer, dbl, rdbl)
+
+
+class TestDuplicate(unittest.TestCase):
+  def testScores(self):
+    for contract, tricks, vul, score in [
+        ('1C', 7, False, 70), ('1C', 8, False, 90), ('2S', 8, True, 110),
+        ('3N', 9, False, 400), ('3N', 10, True, 630), ('4H', 10, False, 420),
+        ('5D', 11, True, 600), ('6S', 12, False, 980), ('7N', 13, True, 2220),
+        ('1NX', 7, False, 180), ('1NX', 8, True, 380), ('2HX', 8, False, 470),
+        ('1CXX', 7, False, 230), ('1CXX', 8, True, 630),
+        ('4S', 9, False, -50), ('4S', 7, True, -300),
+        ('4SX', 9, False, -100), ('4SX', 8, False, -300),
+        ('4SX', 7, False, -500), ('4SX', 6, False, -800),
+        ('4SX', 9, True, -200), ('4SX', 7, True, -800),
+        ('4SXX', 7, False, -1000), ('7NXX', 0, True, -7600)]:
+      self.assertEqual(
+          scoring.DuplicateScore(_Contract(contract), tricks, vul), score,
+          '%s %d %s' % (contract, tricks, vul))
+    self.assertEqual(scoring.DuplicateScore(rules.Contract(None, None), 0,
+                                            True), 0)
+    self.assertRaises(scoring.Error, scoring.DuplicateScore,
+                      _Contract('1C'), 14, False)
+
+  @unittest.skipIf(scoring.numpy is None, 'NumPy is not installed.')
+  def testBatch(self):
+    numpy = scoring.numpy
+    contracts = ['1C', '3N', '4SX', '6HXX', '7N']
+    tricks = numpy.array([7, 10, 7, 13, 12])
+    vul = numpy.array([0, 1, 0, 1, 1])
+    parsed = [_Contract(c) for c in contracts]
+    scores = scoring.ScoreBatch([c.level for c in parsed],
+                                [c.strain.magnitude for c in parsed],
+                                [scoring.DoubledState(c) for c in parsed],
+                                vul, tricks)
+    self.assertEqual(list(scores),
+                     [scoring.DuplicateScore(c, t, v)
+                      for c, t, v in zip(parsed, tricks, vul)])
+    # Out-of-range values must not wrap around to other rows of the table.
+    for bad in ((0, 4, 0, 0, 7), (1, 5, 0, 0, 7), (1, -1, 0, 0, 7),
+                (1, 4, 3, 0, 7), (1, 4, 0, 2, 7), (1, 4, 0, 0, 14),
+                (1, 4, 0, 0, -1), ([1, 8], 4, 0, 0, 7)):
+      self.assertRaises(scoring.Error, scoring.ScoreBatch, *bad)
+
+
+class TestRubber(unittest.TestCase):
+  def testRubberScore(self):
+    self.assertEqual(scoring.RubberScore(_Contract('2S'), 9, False), (60, 30))
+    self.assertEqual(scoring.RubberScore(_Contract('6HX'), 12, True, 100),
+                     (360, 900))
+    self.assertEqual(scoring.RubberScore(_Contract('3N'), 7, True), (0, -200))
+
+  def testRubber(self):
+    rubber = scoring.Rubber()
+    rubber.Record(_Contract('2S'), 0, 8)
+    self.assertEqual(rubber.partscores, [60, 0])
+    self.failIf(rubber.IsVulnerable(0))
+    rubber.Record(_Contract('3N'), 1, 9)
+    self.assertEqual(rubber.games, [0, 1])
+    self.assertEqual(rubber.partscores, [0, 0])
+    rubber.Record(_Contract('4H'), 1, 9)
+    self.assertEqual(rubber.above, [100, 0])
+    rubber.Record(_Contract('4S'), 0, 10)
+    rubber.Record(_Contract('2C'), 1, 8)
+    self.failIf(rubber.IsOver())
+    rubber.Record(_Contract('2N'), 1, 8)
+    self.failUnless(rubber.IsOver())
+    self.assertEqual(rubber.games, [1, 2])
+    self.assertEqual(rubber.Total(1), 100 + 40 + 70 + 500)
+    self.assertEqual(rubber.Total(0), 60 + 100 + 120)
+    self.assertRaises(scoring.Error, rubber.Record, _Contract('1C'), 0, 7)
+
+
+class TestComparison(unittest.TestCase):
+  def testImps(self):
+    self.assertEqual([scoring.Imps(d) for d in (0, 10, 20, -50, 420, 4000,
+                                                9999)],
+                     [0, 0, 1, -2, 9, 24, 24])
+    if scoring.numpy is not None:
+      self.assertEqual(list(scoring.ImpsBatch([0, 10, 20, -50, 420, 4000])),
+                       [0, 0, 1, -2, 9, 24])
+
+  def testMatchpoints(self):
+    self.assertEqual(scoring.Matchpoints([420, 450, 420, -50]), [3, 6, 3, 0])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,215 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""A TCP front end for a table.Lobby.
+
+The server runs in one thread on asyncore: each connection is an
+asynchat.async_chat, and every table is a table.Table state machine, so a
+server holds thousands of tables without a thread per table. The protocol
+is line based. A client sends commands:
+
+  JOIN table seat name    Sit at a table; seat is N, E, S or W.
+  CALL call               Make a call, e.g. 1H, 3NT, P, X or XX.
+  PLAY card               Play a card, e.g. AS or TH; declarer also plays
+                          dummy's cards.
+  LEAVE                   Leave the table.
+
+and receives the table's events, one per line, as formatted by
+FormatEvent, with ERROR lines for commands that failed.
+"""
+
+import asynchat
+import asyncore
+import socket
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import rules
+from gameclient.cards.bridge import table
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class CommandError(Error):
+  """A client sent a command that cannot be carried out."""
+
+
+SEAT_NAMES = 'NESW'
+DEFAULT_PORT = 7325
+
+
+def FormatHand(hand):
+  """Formats a CardSet as spades.hearts.diamonds.clubs, e.g. 'AK2..QJT.'."""
+  return '.'.join(board.SuitRanks(hand, s) for s in board.SUITS_DOWN)
+
+
+def FormatEvent(event):
+  """Returns the protocol line, without its newline, for a table event."""
+  kind = event[0]
+  if kind == 'sit':
+    return 'SIT %s %s' % (SEAT_NAMES[event[1]], event[2])
+  if kind == 'leave':
+    return 'LEAVE %s' % SEAT_NAMES[event[1]]
+  if kind == 'deal':
+    _, number, dealer, vulnerable, hand = event
+    return 'DEAL %d %s %s %s' % (number, SEAT_NAMES[dealer],
+                                 '-NEB'[vulnerable[0] + 2 * vulnerable[1]],
+                                 FormatHand(hand))
+  if kind == 'turn':
+    return 'TURN %s %s' % (SEAT_NAMES[event[1]], event[2].upper())
+  if kind == 'call':
+    return 'CALL %s %s' % (SEAT_NAMES[event[1]], event[2])
+  if kind == 'contract':
+    contract = event[1]
+    if contract.level == 0:
+      return 'CONTRACT PASSED'
+    return 'CONTRACT %s %s' % (contract, SEAT_NAMES[contract.declarer])
+  if kind == 'dummy':
+    return 'DUMMY %s %s' % (SEAT_NAMES[event[1]], FormatHand(event[2]))
+  if kind == 'play':
+    return 'PLAY %s %s' % (SEAT_NAMES[event[1]], event[2])
+  if kind == 'trick':
+    return 'TRICK %s' % SEAT_NAMES[event[1]]
+  if kind == 'result':
+    return 'RESULT %d %d %d' % (event[1], event[3], event[4])
+  raise Error('Unknown event %r.' % (event,))
+
+
+def _ParseSeat(name):
+  seat = SEAT_NAMES.find(name.upper()[:1])
+  if seat < 0 or len(name) != 1:
+    raise CommandError('"%s" is not a seat.' % name)
+  return seat
+
+
+def _ParseCall(text):
+  try:
+    calls = rules.ParseCalls(text)
+  except rules.Error, e:
+    raise CommandError(str(e))
+  if len(calls) != 1:
+    raise CommandError('"%s" is not a call.' % text)
+  return calls[0]
+
+
+def _ParseCard(text):
+  try:
+    return cardlib.Card.NewCard(text, rules.ORDER)
+  except cardlib.Error, e:
+    raise CommandError(str(e))
+
+
+class Connection(asynchat.async_chat):
+  """One client's connection to the server."""
+  def __init__(self, sock, server):
+    asynchat.async_chat.__init__(self, sock, map=server.map)
+    self.set_terminator('\n')
+    self.server = server
+    self.lobby = server.lobby
+    self.table_id = None
+    self.seat = None
+    self._buffer = []
+
+  def collect_incoming_data(self, data):
+    self._buffer.append(data)
+
+  def found_terminator(self):
+    line = ''.join(self._buffer).strip()
+    self._buffer = []
+    if not line:
+      return
+    try:
+      self.Command(line)
+    except (Error, table.Error, rules.Error), e:
+      self.push('ERROR %s\n' % e)
+    self.lobby.Pump()
+
+  def Command(self, line):
+    """Carry out one command line.
+
+    Raises:
+      CommandError, table.Error or rules.Error if the command fails.
+    """
+    words = line.split()
+    verb = words[0].upper()
+    args = words[1:]
+    if verb == 'JOIN':
+      if self.seat is not None:
+        raise CommandError('Already seated.')
+      if len(args) < 2:
+        raise CommandError('Usage: JOIN table seat [name]')
+      seat = _ParseSeat(args[1])
+      name = ' '.join(args[2:]) or '%s:%d' % self.addr[:2]
+      self.lobby.Join(self, args[0], seat, name)
+      self.table_id, self.seat = args[0], seat
+      return
+    if self.seat is None:
+      raise CommandError('Not seated.')
+    if verb == 'LEAVE':
+      self.Leave()
+    elif verb == 'CALL' and len(args) == 1:
+      self.lobby.Call(self.table_id, self.seat, _ParseCall(args[0]))
+    elif verb == 'PLAY' and len(args) == 1:
+      self.lobby.Play(self.table_id, self.seat, _ParseCard(args[0]))
+    else:
+      raise CommandError('Bad command "%s".' % line)
+
+  def Leave(self):
+    if self.seat is not None:
+      self.lobby.Leave(self.table_id, self.seat)
+      self.table_id = self.seat = None
+
+  def Send(self, event):
+    """Sends a table event to the client."""
+    self.push(FormatEvent(event) + '\n')
+
+  def handle_close(self):
+    self.Leave()
+    self.lobby.Pump()
+    self.close()
+
+
+class Server(asyncore.dispatcher):
+  """Accepts connections and serves a table.Lobby."""
+  def __init__(self, host='', port=DEFAULT_PORT, lobby=None, map=None):
+    """Initialize a Server and start listening.
+
+    Arguments:
+      host: The address to listen on.
+      port: The port to listen on; 0 picks a free one (see address).
+      lobby: The table.Lobby to serve; by default, a new one.
+      map: The asyncore socket map; by default, a new one.
+    """
+    if map is None:
+      map = {}
+    self.map = map
+    asyncore.dispatcher.__init__(self, map=map)
+    self.lobby = lobby or table.Lobby()
+    self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.set_reuse_addr()
+    self.bind((host, port))
+    self.listen(64)
+    self.address = self.socket.getsockname()
+
+  def handle_accept(self):
+    pair = self.accept()
+    if pair is not None:
+      Connection(pair[0], self)
+
+  def Serve(self, timeout=1.0, count=None):
+    """Run the event loop; see asyncore.loop."""
+    asyncore.loop(timeout=timeout, map=self.map, count=count)
+
+
+def main(argv):
+  port = DEFAULT_PORT
+  if len(argv) > 1:
+    port = int(argv[1])
+  Server(port=port).Serve()
+
+
+if __name__ == '__main__':
+  import sys
+  main(sys.argv)
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import server
+
+import socket
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+from gameclient.cards.bridge import table
+
+
+class TestServer(unittest.TestCase):
+  def setUp(self):
+    self.lobby = table.Lobby(seed=3)
+    self.server = server.Server('127.0.0.1', 0, self.lobby)
+    self.sock = socket.create_connection(self.server.address)
+    self.sock.settimeout(5)
+    self._pending = ''
+
+  def tearDown(self):
+    self.sock.close()
+    self.server.Serve(timeout=0.01, count=5)
+    self.server.close()
+
+  def _Send(self, line):
+    self.sock.sendall(line + '\n')
+
+  def _Line(self):
+    while '\n' not in self._pending:
+      self.server.Serve(timeout=0.01, count=1)
+      try:
+        self.sock.setblocking(0)
+        self._pending += self.sock.recv(4096)
+      except socket.error:
+        pass
+      finally:
+        self.sock.setblocking(1)
+    line, self._pending = self._pending.split('\n', 1)
+    return line
+
+  def testFormatEvent(self):
+    hand = cardlib.CardSet([cardlib.Card.NewCard(s)
+                            for s in 'AS KS 0D 2C'.split()])
+    self.assertEqual(server.FormatEvent(('deal', 5, 0, (True, False), hand)),
+                     'DEAL 5 N N AK..T.2')
+    call = rules.ParseCalls('3N')[0]
+    self.assertEqual(server.FormatEvent(('call', 3, call)), 'CALL W 3NT')
+    self.assertEqual(server.FormatEvent(('turn', 2, 'play')), 'TURN S PLAY')
+    self.assertRaises(server.Error, server.FormatEvent, ('bogus',))
+
+  def testSession(self):
+    self._Send('CALL P')
+    self.failUnless(self._Line().startswith('ERROR'))
+    self._Send('JOIN t1 N alice')
+    self.assertEqual(self._Line(), 'SIT N alice')
+    for seat in xrange(1, 4):
+      table.LocalClient(self.lobby, 't1', seat).Join()
+    self.lobby.Pump()
+    lines = [self._Line() for _ in xrange(4)]
+    self.assertEqual(lines[:3], ['SIT E t1-1', 'SIT S t1-2', 'SIT W t1-3'])
+    self.failUnless(lines[3].startswith('DEAL 1 N - '))
+    self.assertEqual(self._Line(), 'TURN N CALL')
+    self._Send('CALL 8H')
+    self.failUnless(self._Line().startswith('ERROR'))
+    self._Send('CALL 1S')
+    self.assertEqual(self._Line(), 'CALL N 1S')
+    # The bots answer at once; the next line is East's call.
+    self.failUnless(self._Line().startswith('CALL E '))
+    self._Send('LEAVE')
+    self._Send('JOIN t1 E bob')
+    line = self._Line()
+    while not line.startswith('ERROR'):
+      self.failIf(line.startswith('SIT'))
+      line = self._Line()
+    self._Send('JOIN t1 N bob')
+    self.assertEqual(self._Line(), 'SIT N bob')
+
+
+if __name__ == '__main__':
+  unittest.main()
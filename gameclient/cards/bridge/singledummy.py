@@ -0,0 +1,284 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Single-dummy analysis by sampling deals and solving them double-dummy.
+
+From one seat's point of view only some of the cards are known: the seat's
+own hand, dummy's hand once it is exposed, and the cards already played.
+Sampler deals the unknown cards at random, subject to constrained.HandSpecs
+for what the auction has shown. Analyze solves every sample double-dummy
+with ddsolver.Solver and averages the tricks and scores of each candidate
+action, e.g. each possible opening lead (LeadProblem) or each contract
+under consideration (ContractProblem).
+
+Sample i is dealt from simulation.BoardRandom(seed, i), so a result
+depends only on the seed and the number of samples, not on the number of
+processes. Sampling stops early once the confidence interval of the best
+candidate is clear of every other candidate's.
+
+Seats are offsets into Rules.players; hands are indexed by seat.
+"""
+
+import math
+
+from gameclient.cards import cardlib
+from gameclient.cards import simulation
+from gameclient.cards.bridge import constrained
+from gameclient.cards.bridge import ddsolver
+from gameclient.cards.bridge import scoring
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+SEATS = 4
+DEFAULT_SAMPLES = 200
+DEFAULT_CHECK_EVERY = 10
+DEFAULT_MIN_SAMPLES = 20
+# The normal quantile for a two-sided 95% confidence interval.
+DEFAULT_Z = 1.96
+
+
+def _Bits(cards):
+  if isinstance(cards, cardlib.CardSet):
+    return cards.bits
+  return cardlib.CardSet(cards).bits
+
+
+class Sampler(object):
+  """Deals the unknown cards of a position."""
+  def __init__(self, known=None, played=None, specs=None):
+    """Initialize a Sampler.
+
+    Arguments:
+      known: A dict mapping seats to a cardlib.CardSet (or a sequence of
+             Cards) of the cards that seat is known to hold now.
+      played: A dict mapping seats to the cards that seat has played.
+      specs: A dict mapping seats to constrained.HandSpecs that the seat's
+             original 13 cards, played ones included, must satisfy.
+
+    Raises:
+      constrained.Error if a card is known twice or a seat holds too many.
+    """
+    self.known = dict((seat, _Bits(cards))
+                      for seat, cards in (known or {}).iteritems())
+    self.played = dict((seat, _Bits(cards))
+                       for seat, cards in (played or {}).iteritems())
+    self.specs = dict(specs or {})
+    self._predeal = {}
+    for seat in set(self.known) | set(self.played):
+      self._predeal[seat] = cardlib.CardSet.FromBits(
+          self.known.get(seat, 0) | self.played.get(seat, 0))
+    self._gone = 0
+    for bits in self.played.itervalues():
+      self._gone |= bits
+    # Check the predeal now rather than in each worker.
+    constrained.Dealer(self._predeal, self.specs)
+
+  def Sample(self, rand, max_tries=constrained.DEFAULT_MAX_TRIES):
+    """Deal one position consistent with what is known.
+
+    Arguments:
+      rand: A random.Random.
+      max_tries: As for constrained.Dealer.DealBits.
+
+    Returns:
+      A list of 4 cardlib.CardSets: the cards each seat holds now.
+
+    Raises:
+      constrained.NoDealFound if the specs are too hard to satisfy.
+    """
+    dealer = constrained.Dealer(self._predeal, self.specs, rand)
+    gone = ~self._gone
+    return [cardlib.CardSet.FromBits(h & gone)
+            for h in dealer.DealBits(max_tries)]
+
+
+class LeadProblem(object):
+  """Which card should the opening leader lead against a contract?
+
+  Tricks and scores are the defenders'.
+  """
+  def __init__(self, contract, vulnerable, cards):
+    """Initialize a LeadProblem.
+
+    Arguments:
+      contract: A rules.Contract whose declarer is a seat.
+      vulnerable: Whether declarer's side is vulnerable.
+      cards: The candidate leads, cardlib.Cards held by declarer's LHO.
+    """
+    self.contract = contract
+    self.vulnerable = vulnerable
+    self.leader = (contract.declarer + 1) % SEATS
+    self.candidates = list(cards)
+
+  def Tricks(self, solver):
+    """Returns the defenders' tricks after each candidate lead."""
+    strain = self.contract.strain
+    tricks = []
+    for card in self.candidates:
+      guess = tricks and tricks[-1] or None
+      tricks.append(solver.SolveLead(strain, self.leader, card, guess))
+    return tricks
+
+  def Score(self, i, tricks):
+    """Returns the defenders' score when they take tricks after lead i."""
+    return -scoring.DuplicateScore(self.contract,
+                                   cardlib.HAND_SIZE - tricks,
+                                   self.vulnerable)
+
+
+class ContractProblem(object):
+  """Which of some contracts should a side play?
+
+  Tricks and scores are each contract's declarer's.
+  """
+  def __init__(self, contracts, vulnerable):
+    """Initialize a ContractProblem.
+
+    Arguments:
+      contracts: A list of rules.Contracts whose declarers are seats.
+      vulnerable: A pair of bools, whether seats 0 and 2 and whether seats
+                  1 and 3 are vulnerable.
+    """
+    self.candidates = list(contracts)
+    self.vulnerable = vulnerable
+
+  def Tricks(self, solver):
+    """Returns declarer's tricks in each candidate contract."""
+    tricks = []
+    solved = {}
+    for contract in self.candidates:
+      key = (contract.strain.magnitude, contract.declarer)
+      if key not in solved:
+        solved[key] = solver.DeclarerTricks(contract.strain,
+                                            contract.declarer)
+      tricks.append(solved[key])
+    return tricks
+
+  def Score(self, i, tricks):
+    """Returns declarer's score in contract i when taking tricks."""
+    contract = self.candidates[i]
+    return scoring.DuplicateScore(contract, tricks,
+                                  self.vulnerable[contract.declarer % 2])
+
+
+class Estimate(object):
+  """Running mean and variance of one candidate's tricks and score."""
+  def __init__(self, candidate):
+    self.candidate = candidate
+    self.n = 0
+    self.tricks = 0.0
+    self.score = 0.0
+    self._m2 = {'tricks': 0.0, 'score': 0.0}
+
+  def Add(self, tricks, score):
+    """Record one sample (Welford's update)."""
+    self.n += 1
+    for name, value in (('tricks', tricks), ('score', score)):
+      mean = getattr(self, name)
+      delta = value - mean
+      mean += delta / self.n
+      setattr(self, name, mean)
+      self._m2[name] += delta * (value - mean)
+
+  def StdErr(self, by='score'):
+    """Returns the standard error of the mean of by, 'tricks' or 'score'."""
+    if self.n < 2:
+      return float('inf')
+    return math.sqrt(self._m2[by] / (self.n - 1) / self.n)
+
+  def Interval(self, by='score', z=DEFAULT_Z):
+    """Returns the (low, high) confidence interval of the mean of by."""
+    mean = getattr(self, by)
+    half = z * self.StdErr(by)
+    return (mean - half, mean + half)
+
+  def __repr__(self):
+    return '<Estimate %s: n=%d tricks=%.2f score=%.1f>' % (
+        self.candidate, self.n, self.tricks, self.score)
+
+
+class Result(object):
+  """The estimates of an Analyze run.
+
+  Attributes:
+    estimates: An Estimate per candidate, in the problem's order.
+    samples: The number of samples solved.
+    stopped_early: Whether the intervals separated before all the samples
+                   were solved.
+  """
+  def __init__(self, estimates, samples, stopped_early, by):
+    self.estimates = estimates
+    self.samples = samples
+    self.stopped_early = stopped_early
+    self.by = by
+
+  def Best(self):
+    """Returns the Estimate with the highest mean."""
+    return max(self.estimates, key=lambda e: getattr(e, self.by))
+
+
+def Separated(estimates, by='score', z=DEFAULT_Z):
+  """Returns True if the best estimate's interval is above all the others."""
+  if len(estimates) < 2:
+    return True
+  best = max(estimates, key=lambda e: getattr(e, by))
+  low = best.Interval(by, z)[0]
+  return all(e.Interval(by, z)[1] < low for e in estimates if e is not best)
+
+
+class _Task(object):
+  """Solves one sample; a picklable task for simulation.Run."""
+  def __init__(self, sampler, problem):
+    self.sampler = sampler
+    self.problem = problem
+
+  def __call__(self, board, rand):
+    hands = self.sampler.Sample(rand)
+    return self.problem.Tricks(ddsolver.Solver(hands))
+
+
+def Analyze(problem, sampler, samples=DEFAULT_SAMPLES, seed=0,
+            processes=1, by='score', z=DEFAULT_Z,
+            min_samples=DEFAULT_MIN_SAMPLES,
+            check_every=DEFAULT_CHECK_EVERY):
+  """Estimate each of a problem's candidates over sampled deals.
+
+  Arguments:
+    problem: A LeadProblem, ContractProblem or any object with candidates,
+             Tricks(solver) and Score(i, tricks); it must be picklable to
+             run in more than one process.
+    sampler: A Sampler for the position.
+    samples: The largest number of samples to solve.
+    seed: The seed for simulation.Run.
+    processes: The number of processes; None for one per CPU.
+    by: 'score' or 'tricks', the mean to compare candidates by.
+    z: The normal quantile of the confidence intervals, or None to never
+       stop early.
+    min_samples: The number of samples to solve before stopping early.
+    check_every: The number of samples between checks for stopping.
+
+  Returns:
+    A Result.
+  """
+  if by not in ('score', 'tricks'):
+    raise Error('Cannot compare candidates by %r.' % by)
+  estimates = [Estimate(c) for c in problem.candidates]
+  results = simulation.Run(_Task(sampler, problem), samples, seed,
+                           processes=processes)
+  n = 0
+  stopped = False
+  try:
+    for tricks in results:
+      for i, t in enumerate(tricks):
+        estimates[i].Add(t, problem.Score(i, t))
+      n += 1
+      if (z is not None and n >= min_samples and n % check_every == 0
+          and n < samples and Separated(estimates, by, z)):
+        stopped = True
+        break
+  finally:
+    results.close()
+  return Result(estimates, n, stopped, by)
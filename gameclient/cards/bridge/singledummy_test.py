@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import singledummy
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards import simulation
+from gameclient.cards.bridge import constrained
+from gameclient.cards.bridge import ddsolver
+from gameclient.cards.bridge import rules
+
+
+class TestSingleDummy(unittest.TestCase):
+  def setUp(self):
+    deck = cardlib.Deck(random.Random(2).shuffle)
+    self.hands = [deck.PickSet(13) for _ in xrange(4)]
+    # Four-card endings solve quickly: each seat has played 9 cards.
+    self.played = dict((seat, list(hand)[:9])
+                       for seat, hand in enumerate(self.hands))
+    self.ending = [cardlib.CardSet(list(hand)[9:]) for hand in self.hands]
+    self.sampler = singledummy.Sampler(
+        known={0: self.ending[0], 2: self.ending[2]}, played=self.played)
+
+  def testSample(self):
+    rand = random.Random(1)
+    unknown = self.ending[1] | self.ending[3]
+    for _ in xrange(20):
+      hands = self.sampler.Sample(rand)
+      self.assertEqual(hands[0], self.ending[0])
+      self.assertEqual(hands[2], self.ending[2])
+      self.assertEqual([len(h) for h in hands], [4] * 4)
+      self.assertEqual(hands[1] | hands[3], unknown)
+
+  def testSampleSpecs(self):
+    sampler = singledummy.Sampler(
+        known={0: self.hands[0]},
+        specs={1: constrained.HandSpec(hcp=(15, 17),
+                                       shapes=constrained.BALANCED)})
+    rand = random.Random(3)
+    for _ in xrange(10):
+      hands = sampler.Sample(rand)
+      self.assertEqual(hands[0], self.hands[0])
+      self.failUnless(15 <= constrained.Hcp(hands[1].bits) <= 17)
+    self.assertRaises(constrained.Error, singledummy.Sampler,
+                      known={0: self.hands[0], 1: self.hands[0]})
+
+  def testContractProblem(self):
+    contracts = [rules.Contract(rules.Bid(1, s), 0)
+                 for s in rules.Bid.STRAINS]
+    problem = singledummy.ContractProblem(contracts, (False, False))
+    result = singledummy.Analyze(problem, self.sampler, samples=15,
+                                 seed='x', z=None)
+    self.assertEqual(result.samples, 15)
+    self.failIf(result.stopped_early)
+    # The estimates are the means over the same samples solved directly.
+    for i, contract in enumerate(contracts):
+      total = 0
+      for board in xrange(15):
+        hands = self.sampler.Sample(simulation.BoardRandom('x', board))
+        total += ddsolver.Solver(hands).DeclarerTricks(contract.strain, 0)
+      self.assertAlmostEqual(result.estimates[i].tricks, total / 15.0)
+    best = result.Best()
+    self.failUnless(all(best.score >= e.score for e in result.estimates))
+
+  def testEarlyStopping(self):
+    contracts = [rules.Contract(rules.Bid(1, 'N'), 0),
+                 rules.Contract(rules.Bid(7, 'N'), 0,  doubled=True)]
+    problem = singledummy.ContractProblem(contracts, (True, False))
+    result = singledummy.Analyze(problem, self.sampler, samples=100,
+                                 min_samples=10, check_every=5)
+    self.failUnless(result.stopped_early)
+    self.failUnless(result.samples < 100)
+    self.failUnless(result.Best().candidate is contracts[0])
+    low, high = result.estimates[0].Interval()
+    self.failUnless(low <= result.estimates[0].score <= high)
+
+  def testLeadProblem(self):
+    contract = rules.Contract(rules.Bid(3, 'N'), 3)
+    sampler = singledummy.Sampler(known={0: self.ending[0]},
+                                  played=self.played)
+    problem = singledummy.LeadProblem(contract, False, self.ending[0])
+    result = singledummy.Analyze(problem, sampler, samples=10, z=None)
+    rand = simulation.BoardRandom(0, 0)
+    hands = sampler.Sample(rand)
+    solver = ddsolver.Solver(hands)
+    self.assertEqual(max(problem.Tricks(solver)), solver.Solve('N', 0))
+    self.assertEqual(len(result.estimates), 4)
+    self.assertRaises(singledummy.Error, singledummy.Analyze, problem,
+                      sampler, by='imps')
+
+  def testProcesses(self):
+    problem = singledummy.ContractProblem(
+        [rules.Contract(rules.Bid(2, 'S'), 2)], (False, True))
+    one = singledummy.Analyze(problem, self.sampler, samples=12, z=None)
+    two = singledummy.Analyze(problem, self.sampler, samples=12, z=None,
+                              processes=2)
+    self.assertEqual(one.estimates[0].tricks, two.estimates[0].tricks)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,395 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Bridge tables, the lobby that hosts them, and in-process bot clients.
+
+A Table is a state machine that does no I/O: its methods take a player's
+action, check it with rules.Rules, and return the events that result as
+a list of (seat, event) pairs, where seat None means everyone at the
+table. A Lobby hosts any number of tables and routes events to clients
+through one queue, so thousands of tables run in one thread with no
+thread per table. server.Server puts a Lobby on the network;
+LocalClient and RandomBot connect to a Lobby in process, so the whole
+system can be load-tested on one machine (see RunLoopback).
+
+Events are tuples whose first element names them:
+  ('sit', seat, name)           A player took a seat.
+  ('leave', seat)               A player left; any board in play ends.
+  ('deal', number, dealer, vulnerable, hand)
+                                A new board; hand is the seat's own.
+  ('turn', seat, kind)          seat is to make a 'call' or 'play'; sent
+                                to the player who acts for seat.
+  ('call', seat, call)          A call was made.
+  ('contract', contract)        The auction ended in contract.
+  ('dummy', seat, hand)         Dummy's hand, after the opening lead.
+  ('play', seat, card)          A card was played.
+  ('trick', winner)             A trick was completed.
+  ('result', number, contract, tricks, score)
+                                The board is over: declarer's tricks and
+                                North-South's score.
+
+Seats are offsets into Rules.players, with 0 for North.
+"""
+
+import collections
+import random
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import board
+from gameclient.cards.bridge import rules
+from gameclient.cards.bridge import scoring
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class TableError(Error):
+  """An action is not allowed at the table now."""
+
+
+SEATS = 4
+ALL = None
+
+# Table states.
+WAITING = 'waiting'
+AUCTION = 'auction'
+PLAY = 'play'
+FINISHED = 'finished'
+
+
+class Table(object):
+  """One bridge table; see the module docstring."""
+  def __init__(self, table_id, boards=None, pool=None):
+    """Initialize a Table.
+
+    Arguments:
+      table_id: A name for the table.
+      boards: The number of boards to play, or None for no limit.
+      pool: A cardlib.DeckPool to deal from; by default, a new one.
+    """
+    self.table_id = table_id
+    self.boards = boards
+    self.pool = pool or cardlib.DeckPool()
+    self.players = [None] * SEATS
+    self.state = WAITING
+    self.number = 0
+    self.results = []
+    self.hands = None
+    self.auction = None
+    self.contract = None
+    self.play = None
+    self._dummy_shown = False
+
+  def Sit(self, seat, name):
+    """Seat a player; the first board starts when all four are seated."""
+    if not 0 <= seat < SEATS:
+      raise TableError('There is no seat %r.' % seat)
+    if self.players[seat] is not None:
+      raise TableError('Seat %d is taken.' % seat)
+    if self.state == FINISHED:
+      raise TableError('The table has finished.')
+    self.players[seat] = name
+    events = [(ALL, ('sit', seat, name))]
+    if None not in self.players:
+      events.extend(self._NextBoard())
+    return events
+
+  def Leave(self, seat):
+    """Free a seat; a board in progress is abandoned."""
+    if not 0 <= seat < SEATS:
+      raise TableError('There is no seat %r.' % seat)
+    if self.players[seat] is None:
+      raise TableError('Seat %d is empty.' % seat)
+    self.players[seat] = None
+    if self.state != FINISHED:
+      self.state = WAITING
+      if self.auction is not None or self.play is not None:
+        self.number -= 1
+    self.auction = self.play = self.contract = None
+    return [(ALL, ('leave', seat))]
+
+  def ToAct(self):
+    """Returns the seat to act, or None."""
+    if self.state == AUCTION:
+      return (self.auction.dealer + len(self.auction)) % SEATS
+    if self.state == PLAY:
+      return self.play.ToAct()
+    return None
+
+  def Actor(self, seat):
+    """Returns the seat of the player who acts for seat: dummy's declarer."""
+    if (self.state == PLAY
+        and seat == (self.contract.declarer + 2) % SEATS):
+      return self.contract.declarer
+    return seat
+
+  def _Turn(self):
+    seat = self.ToAct()
+    kind = self.state == AUCTION and 'call' or 'play'
+    return (self.Actor(seat), ('turn', seat, kind))
+
+  def _NextBoard(self):
+    if self.boards is not None and self.number >= self.boards:
+      self.state = FINISHED
+      return []
+    self.number += 1
+    dealer = board.BoardDealer(self.number)
+    game = rules.Rules(range(SEATS), dealer, self.pool)
+    self.hands = game.Deal()
+    self.auction = game.NewAuction()
+    self.contract = None
+    self.play = None
+    self._dummy_shown = False
+    self.state = AUCTION
+    vulnerable = board.BoardVulnerability(self.number)
+    events = [(seat, ('deal', self.number, dealer, vulnerable,
+                      self.hands[seat]))
+              for seat in xrange(SEATS)]
+    events.append(self._Turn())
+    return events
+
+  def Call(self, seat, call):
+    """Make a call for seat.
+
+    Raises:
+      TableError if it is not seat's turn to call.
+      rules.RulesException if the call is not legal.
+    """
+    if self.state != AUCTION or seat != self.ToAct():
+      raise TableError('It is not seat %d\'s turn to call.' % seat)
+    contract = self.auction.Append(call)
+    events = [(ALL, ('call', seat, call))]
+    if contract is None:
+      events.append(self._Turn())
+      return events
+    self.contract = contract
+    events.append((ALL, ('contract', contract)))
+    if contract.level == 0:
+      return events + self._EndBoard(0)
+    self.play = rules.Play(self.hands, (contract.declarer + 1) % SEATS,
+                           contract.strain)
+    self.state = PLAY
+    events.append(self._Turn())
+    return events
+
+  def Play(self, seat, card):
+    """Play a card, for seat or, if seat is declarer, for dummy.
+
+    Raises:
+      TableError if seat may not play now.
+      rules.IllegalPlay if the card may not be played.
+    """
+    if self.state != PLAY:
+      raise TableError('No cards are being played.')
+    to_act = self.play.ToAct()
+    if seat != self.Actor(to_act):
+      raise TableError('It is not seat %d\'s turn to play.' % seat)
+    winner = self.play.PlayCard(card)
+    events = [(ALL, ('play', to_act, card))]
+    if not self._dummy_shown:
+      self._dummy_shown = True
+      dummy = (self.contract.declarer + 2) % SEATS
+      events.append((ALL, ('dummy', dummy, self.play.Hand(dummy))))
+    if winner is not None:
+      events.append((ALL, ('trick', winner)))
+      if self.play.IsOver():
+        tricks = self.play.tricks[self.contract.declarer % 2]
+        return events + self._EndBoard(tricks)
+    events.append(self._Turn())
+    return events
+
+  def _EndBoard(self, tricks):
+    contract = self.contract
+    score = 0
+    if contract.level:
+      vulnerable = board.BoardVulnerability(self.number)
+      side = contract.declarer % 2
+      score = scoring.DuplicateScore(contract, tricks, vulnerable[side])
+      if side:
+        score = -score
+    self.results.append((self.number, contract, tricks, score))
+    events = [(ALL, ('result', self.number, contract, tricks, score))]
+    return events + self._NextBoard()
+
+
+class Lobby(object):
+  """Hosts tables and routes their events to clients.
+
+  A client is any object with a Send(event) method. Events are queued and
+  handed out by Pump, so a client may act from within Send without
+  recursion.
+  """
+  def __init__(self, boards=None, seed=None):
+    """Initialize a Lobby.
+
+    Arguments:
+      boards: The number of boards each new table plays, or None.
+      seed: A seed for the tables' deals, or None.
+    """
+    self.boards = boards
+    self.tables = {}
+    self._rand = random.Random(seed)
+    # _clients[table_id][seat] is the client in that seat, or None.
+    self._clients = {}
+    self._queue = collections.deque()
+
+  def Table(self, table_id):
+    """Returns the table with that id, creating it if need be."""
+    table = self.tables.get(table_id)
+    if table is None:
+      pool = cardlib.DeckPool(self._rand.getrandbits(64))
+      table = self.tables[table_id] = Table(table_id, self.boards, pool)
+      self._clients[table_id] = [None] * SEATS
+    return table
+
+  def _Route(self, table_id, events):
+    clients = self._clients[table_id]
+    for seat, event in events:
+      if seat is ALL:
+        for client in clients:
+          if client is not None:
+            self._queue.append((client, event))
+      elif clients[seat] is not None:
+        self._queue.append((clients[seat], event))
+
+  def Join(self, client, table_id, seat, name):
+    """Seat client at a table.
+
+    Raises:
+      TableError if the seat is taken.
+    """
+    table = self.Table(table_id)
+    events = table.Sit(seat, name)
+    self._clients[table_id][seat] = client
+    self._Route(table_id, events)
+
+  def Leave(self, table_id, seat):
+    """Remove the client in a seat; it is not sent the 'leave' event."""
+    events = self.tables[table_id].Leave(seat)
+    self._clients[table_id][seat] = None
+    self._Route(table_id, events)
+
+  def Call(self, table_id, seat, call):
+    """Make a call; raises as Table.Call."""
+    self._Route(table_id, self.tables[table_id].Call(seat, call))
+
+  def Play(self, table_id, seat, card):
+    """Play a card; raises as Table.Play."""
+    self._Route(table_id, self.tables[table_id].Play(seat, card))
+
+  def Pump(self, limit=None):
+    """Deliver queued events until the queue is empty.
+
+    Arguments:
+      limit: The largest number of events to deliver, or None.
+
+    Returns:
+      The number of events delivered.
+    """
+    queue = self._queue
+    n = 0
+    while queue and (limit is None or n < limit):
+      client, event = queue.popleft()
+      client.Send(event)
+      n += 1
+    return n
+
+
+class RandomBot(object):
+  """Makes random legal calls and plays; the brains of a LocalClient."""
+  def __init__(self, rand=None, pass_rate=0.6):
+    """Initialize a RandomBot.
+
+    Arguments:
+      rand: A random.Random, or a seed for one.
+      pass_rate: How often to pass when passing is legal.
+    """
+    if rand is None or not isinstance(rand, random.Random):
+      rand = random.Random(rand)
+    self.rand = rand
+    self.pass_rate = pass_rate
+
+  def ChooseCall(self, auction):
+    """Returns a call for the next turn of a rules.Auction."""
+    if self.rand.random() < self.pass_rate:
+      return rules.Pass()
+    return self.rand.choice(auction.LegalCalls())
+
+  def ChoosePlay(self, legal):
+    """Returns a card from the CardSet of legal plays."""
+    return self.rand.choice(list(legal))
+
+
+class LocalClient(object):
+  """An in-process client that follows its table and lets a bot act.
+
+  The client keeps its own view of the board from the events it is sent:
+  the auction, its hand, dummy's hand and the current trick.
+  """
+  def __init__(self, lobby, table_id, seat, name=None, bot=None):
+    self.lobby = lobby
+    self.table_id = table_id
+    self.seat = seat
+    self.name = name or '%s-%d' % (table_id, seat)
+    self.bot = bot or RandomBot()
+    self.hands = [None] * SEATS
+    self.auction = None
+    self.trick = []
+    self.results = []
+
+  def Join(self):
+    self.lobby.Join(self, self.table_id, self.seat, self.name)
+
+  def Send(self, event):
+    kind = event[0]
+    if kind == 'deal':
+      _, number, dealer, vulnerable, hand = event
+      self.hands = [None] * SEATS
+      self.hands[self.seat] = hand
+      self.auction = rules.Auction(range(SEATS), dealer)
+      self.trick = []
+    elif kind == 'call':
+      self.auction.Append(event[2])
+    elif kind == 'dummy':
+      self.hands[event[1]] = event[2]
+    elif kind == 'play':
+      seat, card = event[1:]
+      if self.hands[seat] is not None:
+        self.hands[seat] = self.hands[seat].Remove(card)
+      self.trick.append(card)
+    elif kind == 'trick':
+      self.trick = []
+    elif kind == 'result':
+      self.results.append(event[1:])
+    elif kind == 'turn':
+      seat, what = event[1:]
+      if what == 'call':
+        self.lobby.Call(self.table_id, self.seat,
+                        self.bot.ChooseCall(self.auction))
+      else:
+        legal = rules.TRICKS.LegalPlays(self.hands[seat], self.trick, None)
+        self.lobby.Play(self.table_id, self.seat, self.bot.ChoosePlay(legal))
+
+
+def RunLoopback(tables, boards, seed=0):
+  """Play boards at many tables in process, with RandomBots in every seat.
+
+  Arguments:
+    tables: The number of tables.
+    boards: The number of boards per table.
+    seed: A seed for the deals and the bots.
+
+  Returns:
+    The Lobby, whose tables hold the results.
+  """
+  lobby = Lobby(boards=boards, seed=seed)
+  rand = random.Random(seed)
+  for t in xrange(tables):
+    for seat in xrange(SEATS):
+      client = LocalClient(lobby, t, seat,
+                           bot=RandomBot(rand.getrandbits(64)))
+      client.Join()
+  # Every table is now dealt; their events interleave in the one queue.
+  lobby.Pump()
+  return lobby
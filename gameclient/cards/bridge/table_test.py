@@ -0,0 +1,149 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import table
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+def _Events(events, kind):
+  return [(seat, e) for seat, e in events if e[0] == kind]
+
+
+class TestTable(unittest.TestCase):
+  def setUp(self):
+    self.table = table.Table('t', pool=cardlib.DeckPool(random.Random(4)))
+    for seat in xrange(3):
+      self.assertEqual(self.table.Sit(seat, 'p%d' % seat),
+                       [(None, ('sit', seat, 'p%d' % seat))])
+    self.events = self.table.Sit(3, 'p3')
+
+  def _Call(self, text):
+    events = []
+    for call in rules.ParseCalls(text):
+      events.extend(self.table.Call(self.table.ToAct(), call))
+    return events
+
+  def testSeating(self):
+    self.assertRaises(table.TableError, self.table.Sit, 0, 'x')
+    self.assertRaises(table.TableError, self.table.Sit, 4, 'x')
+    self.assertRaises(table.TableError, self.table.Leave, 7)
+    self.assertRaises(table.TableError, self.table.Leave, -1)
+    self.assertEqual(self.table.players[3], 'p3')
+    deals = _Events(self.events, 'deal')
+    self.assertEqual([seat for seat, _ in deals], [0, 1, 2, 3])
+    self.assertEqual([e[1:4] for _, e in deals],
+                     [(1, 0, (False, False))] * 4)
+    self.assertEqual(self.table.hands, [e[4] for _, e in deals])
+    self.assertEqual(self.events[-1], (0, ('turn', 0, 'call')))
+
+  def testAuction(self):
+    self.assertRaises(table.TableError, self.table.Call, 1, rules.Pass())
+    self.assertRaises(table.TableError, self.table.Play, 0,
+                      list(self.table.hands[0])[0])
+    self._Call('1H')
+    self.assertRaises(rules.InsufficientBid, self.table.Call, 1,
+                      rules.ParseCalls('1D')[0])
+    self.assertEqual(self.table.ToAct(), 1)
+    events = self._Call('P P P')
+    self.assertEqual(_Events(events, 'contract')[0][1][1].declarer, 0)
+    self.assertEqual(self.table.state, table.PLAY)
+    self.assertEqual(events[-1], (1, ('turn', 1, 'play')))
+
+  def testPassOut(self):
+    events = self._Call('P P P P')
+    self.assertEqual(_Events(events, 'result'),
+                     [(None, ('result', 1, self.table.results[0][1], 0, 0))])
+    self.assertEqual(self.table.results[0][1].level, 0)
+    # Board 2 is dealt by East, with North-South vulnerable.
+    self.assertEqual(self.table.number, 2)
+    self.assertEqual(_Events(events, 'deal')[0][1][1:4],
+                     (2, 1, (True, False)))
+    self.assertEqual(self.table.ToAct(), 1)
+
+  def testPlay(self):
+    self._Call('1N P P P')
+    rand = random.Random(0)
+    events = []
+    for _ in xrange(52):
+      to_act = self.table.ToAct()
+      actor = self.table.Actor(to_act)
+      if to_act == 2:
+        self.assertEqual(actor, 0)
+        self.assertRaises(table.TableError, self.table.Play, 2,
+                          list(self.table.play.Hand(2))[0])
+      legal = list(self.table.play.LegalPlays())
+      events.extend(self.table.Play(actor, rand.choice(legal)))
+    self.assertEqual(len(_Events(events, 'play')), 52)
+    self.assertEqual(len(_Events(events, 'trick')), 13)
+    self.assertEqual(_Events(events, 'dummy')[0][1][1], 2)
+    number, contract, tricks, score = self.table.results[0]
+    self.assertEqual(tricks, len([1 for _, e in _Events(events, 'trick')
+                                  if e[1] % 2 == 0]))
+    self.assertEqual(score > 0, tricks >= 7)
+    self.assertEqual(self.table.number, 2)
+
+  def testLeave(self):
+    self._Call('1S')
+    self.assertEqual(self.table.Leave(1), [(None, ('leave', 1))])
+    self.assertEqual(self.table.state, table.WAITING)
+    self.assertRaises(table.TableError, self.table.Call, 1, rules.Pass())
+    self.assertRaises(table.TableError, self.table.Leave, 1)
+    # The abandoned board is dealt again, afresh.
+    events = self.table.Sit(1, 'q')
+    self.assertEqual(_Events(events, 'deal')[0][1][1], 1)
+
+  def testBoards(self):
+    t = table.Table('u', boards=1)
+    for seat in xrange(4):
+      t.Sit(seat, str(seat))
+    for call in rules.ParseCalls('P P P P'):
+      t.Call(t.ToAct(), call)
+    self.assertEqual(t.state, table.FINISHED)
+    self.assertEqual(len(t.results), 1)
+
+
+class _Recorder(object):
+  def __init__(self):
+    self.events = []
+
+  def Send(self, event):
+    self.events.append(event)
+
+
+class TestLobby(unittest.TestCase):
+  def testRouting(self):
+    lobby = table.Lobby(seed=1)
+    clients = [_Recorder() for _ in xrange(4)]
+    for seat, client in enumerate(clients):
+      lobby.Join(client, 'a', seat, str(seat))
+    self.assertEqual(lobby.Pump(limit=1), 1)
+    lobby.Pump()
+    for seat, client in enumerate(clients):
+      deals = [e for e in client.events if e[0] == 'deal']
+      self.assertEqual(len(deals), 1)
+      self.assertEqual(deals[0][4], lobby.tables['a'].hands[seat])
+    self.assertEqual(clients[0].events[-1], ('turn', 0, 'call'))
+    self.assertEqual(clients[1].events[-1][0], 'deal')
+    lobby.Leave('a', 2)
+    lobby.Pump()
+    self.assertEqual(clients[0].events[-1], ('leave', 2))
+    self.failIf(('leave', 2) in clients[2].events)
+
+  def testLoopback(self):
+    lobby = table.RunLoopback(tables=5, boards=3, seed=2)
+    self.assertEqual(len(lobby.tables), 5)
+    for t in lobby.tables.itervalues():
+      self.assertEqual(t.state, table.FINISHED)
+      self.assertEqual([r[0] for r in t.results], [1, 2, 3])
+    again = table.RunLoopback(tables=5, boards=3, seed=2)
+    self.assertEqual(repr([again.tables[i].results for i in xrange(5)]),
+                     repr([lobby.tables[i].results for i in xrange(5)]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,333 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""A compact binary encoding of calls, cards, hands and table events.
+
+The encodings are:
+
+  call      1 byte   The Call's index into rules.ALL_CALLS (0 to 37).
+  card      1 byte   The Card's index (0 to 51; see cardlib.CardSet).
+  hand      7 bytes  The CardSet's bits, little-endian.
+  contract  2 bytes  The Call.index of the bid, or PASSED_OUT; then the
+                     declarer's seat | DOUBLED | REDOUBLED (the scheme of
+                     boardfile's records).
+
+Decoding returns the interned rules.Call and cardlib.Card objects.
+
+A message is one table event (see table.py), a type byte followed by its
+fields; EncodeEvent and DecodeEvent convert between the two. Board
+numbers are 2 bytes, and player names are UTF-8 and decode to a str.
+Messages are framed for a stream by a 2-byte big-endian length prefix; a
+batch of messages is just their frames concatenated, and a Reader splits
+a stream back into messages however it was chunked.
+"""
+
+import struct
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import boardfile
+from gameclient.cards.bridge import rules
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class DecodeError(Error):
+  """The bytes do not encode what was expected."""
+
+
+HAND_BYTES = 7
+MAX_BOARD = 0xffff
+MAX_FRAME = 0xffff
+
+# The contract flags are boardfile's, so the two formats agree.
+PASSED_OUT = boardfile.PASSED_OUT
+DOUBLED = boardfile.DOUBLED
+REDOUBLED = boardfile.REDOUBLED
+
+_FRAME = struct.Struct('!H')
+_QWORD = struct.Struct('<Q')
+_FULL_HAND = (1 << 52) - 1
+
+# Byte <-> object tables, so that coding is a lookup.
+_CALL_BYTES = [chr(call.index) for call in rules.ALL_CALLS]
+_BYTE_CALLS = dict((chr(call.index), call) for call in rules.ALL_CALLS)
+_CARD_BYTES = [chr(i) for i in xrange(52)]
+_BYTE_CARDS = dict((chr(i), cardlib.Card.FromIndex(i, rules.ORDER))
+                   for i in xrange(52))
+
+
+def EncodeCall(call):
+  """Returns the byte of a rules.Call."""
+  return _CALL_BYTES[call.index]
+
+
+def DecodeCall(byte):
+  """Returns the rules.Call of a byte.
+
+  Raises:
+    DecodeError if the byte is not a call.
+  """
+  try:
+    return _BYTE_CALLS[byte]
+  except KeyError:
+    raise DecodeError('%r is not a call.' % byte)
+
+
+def EncodeCalls(calls):
+  """Returns the bytes of a sequence of rules.Calls, one per call."""
+  return ''.join([_CALL_BYTES[c.index] for c in calls])
+
+
+def DecodeCalls(data):
+  """Returns the list of rules.Calls encoded in data.
+
+  Raises:
+    DecodeError if a byte is not a call.
+  """
+  try:
+    return map(_BYTE_CALLS.__getitem__, data)
+  except KeyError, e:
+    raise DecodeError('%r is not a call.' % e.args[0])
+
+
+def EncodeCard(card):
+  """Returns the byte of a cardlib.Card."""
+  return _CARD_BYTES[card.index]
+
+
+def DecodeCard(byte):
+  """Returns the cardlib.Card of a byte.
+
+  Raises:
+    DecodeError if the byte is not a card.
+  """
+  try:
+    return _BYTE_CARDS[byte]
+  except KeyError:
+    raise DecodeError('%r is not a card.' % byte)
+
+
+def EncodeCards(cards):
+  """Returns the bytes of a sequence of cardlib.Cards, one per card."""
+  return ''.join([_CARD_BYTES[c.index] for c in cards])
+
+
+def DecodeCards(data):
+  """Returns the list of cardlib.Cards encoded in data.
+
+  Raises:
+    DecodeError if a byte is not a card.
+  """
+  try:
+    return map(_BYTE_CARDS.__getitem__, data)
+  except KeyError, e:
+    raise DecodeError('%r is not a card.' % e.args[0])
+
+
+def EncodeHand(hand):
+  """Returns the 7 bytes of a cardlib.CardSet."""
+  return _QWORD.pack(hand.bits)[:HAND_BYTES]
+
+
+def DecodeHand(data):
+  """Returns the cardlib.CardSet of 7 bytes.
+
+  Raises:
+    DecodeError if data is not a hand.
+  """
+  if len(data) != HAND_BYTES:
+    raise DecodeError('A hand is %d bytes, not %d.' % (HAND_BYTES, len(data)))
+  bits = _QWORD.unpack(data + '\0')[0]
+  if bits & ~_FULL_HAND:
+    raise DecodeError('%r is not a hand.' % data)
+  return cardlib.CardSet.FromBits(bits)
+
+
+def EncodeContract(contract):
+  """Returns the 2 bytes of a rules.Contract whose declarer is a seat."""
+  if contract.level == 0:
+    return chr(PASSED_OUT) + '\0'
+  declarer = contract.declarer
+  if contract.doubled:
+    declarer |= DOUBLED
+  if contract.redoubled:
+    declarer |= REDOUBLED
+  return (_CALL_BYTES[rules.Bid(contract.level, contract.strain).index]
+          + chr(declarer))
+
+
+def DecodeContract(data):
+  """Returns the rules.Contract of 2 bytes.
+
+  Raises:
+    DecodeError if data is not a contract.
+  """
+  if len(data) != 2:
+    raise DecodeError('A contract is 2 bytes, not %d.' % len(data))
+  bid, declarer = ord(data[0]), ord(data[1])
+  if bid == PASSED_OUT:
+    return rules.Contract(None, None)
+  if not rules.BIDS[0].index <= bid < len(rules.ALL_CALLS):
+    raise DecodeError('%r is not a contract.' % data)
+  return rules.Contract(rules.ALL_CALLS[bid], declarer & 3,
+                        bool(declarer & DOUBLED), bool(declarer & REDOUBLED))
+
+
+# Messages. Each event kind has a type byte and a struct for its fixed
+# fields; a hand, contract or name follows as noted.
+_KINDS = ('sit', 'leave', 'deal', 'turn', 'call', 'contract', 'dummy',
+          'play', 'trick', 'result')
+_TYPE_BYTES = dict((kind, chr(i)) for i, kind in enumerate(_KINDS))
+_BYTE_TYPES = dict((chr(i), kind) for i, kind in enumerate(_KINDS))
+_TURNS = ('call', 'play')
+_SEAT = struct.Struct('B')
+_DEAL = struct.Struct('!HBB')
+_RESULT = struct.Struct('!HBh')
+
+
+def EncodeEvent(event):
+  """Returns the message of a table event.
+
+  A player's name is sent as UTF-8: a unicode name is encoded, and a str
+  is taken to be UTF-8 already and sent as it is.
+
+  Raises:
+    Error if a field does not fit its encoding, e.g. a board number above
+    MAX_BOARD.
+  """
+  try:
+    return _EncodeEvent(event)
+  except (struct.error, ValueError), e:
+    raise Error('Cannot encode %r (%s).' % (event, e))
+
+
+def _EncodeEvent(event):
+  kind = event[0]
+  head = _TYPE_BYTES[kind]
+  if kind == 'sit':
+    name = event[2]
+    if isinstance(name, unicode):
+      name = name.encode('utf-8')
+    return head + chr(event[1]) + name
+  if kind in ('leave', 'trick'):
+    return head + chr(event[1])
+  if kind == 'deal':
+    _, number, dealer, vulnerable, hand = event
+    return (head + _DEAL.pack(number, dealer,
+                              vulnerable[0] | vulnerable[1] << 1)
+            + EncodeHand(hand))
+  if kind == 'turn':
+    return head + chr(event[1]) + chr(_TURNS.index(event[2]))
+  if kind == 'call':
+    return head + chr(event[1]) + _CALL_BYTES[event[2].index]
+  if kind == 'contract':
+    return head + EncodeContract(event[1])
+  if kind == 'dummy':
+    return head + chr(event[1]) + EncodeHand(event[2])
+  if kind == 'play':
+    return head + chr(event[1]) + _CARD_BYTES[event[2].index]
+  # 'result'
+  _, number, contract, tricks, score = event
+  return head + _RESULT.pack(number, tricks, score) + EncodeContract(contract)
+
+
+def DecodeEvent(data):
+  """Returns the table event of a message.
+
+  Raises:
+    DecodeError if data is not a message.
+  """
+  try:
+    kind = _BYTE_TYPES[data[:1]]
+    body = data[1:]
+    if kind == 'sit':
+      return (kind, ord(body[0]), body[1:])
+    if kind in ('leave', 'trick'):
+      return (kind, _SEAT.unpack(body)[0])
+    if kind == 'deal':
+      number, dealer, vulnerable = _DEAL.unpack(body[:_DEAL.size])
+      return (kind, number, dealer,
+              (bool(vulnerable & 1), bool(vulnerable & 2)),
+              DecodeHand(body[_DEAL.size:]))
+    if kind == 'turn':
+      if len(body) != 2:
+        raise DecodeError('Bad turn message.')
+      return (kind, ord(body[0]), _TURNS[ord(body[1])])
+    if kind == 'call':
+      if len(body) != 2:
+        raise DecodeError('Bad call message.')
+      return (kind, ord(body[0]), DecodeCall(body[1]))
+    if kind == 'contract':
+      if len(body) != 2:
+        raise DecodeError('Bad contract message.')
+      return (kind, DecodeContract(body))
+    if kind == 'dummy':
+      return (kind, ord(body[0]), DecodeHand(body[1:]))
+    if kind == 'play':
+      if len(body) != 2:
+        raise DecodeError('Bad play message.')
+      return (kind, ord(body[0]), DecodeCard(body[1]))
+    number, tricks, score = _RESULT.unpack(body[:_RESULT.size])
+    return (kind, number, DecodeContract(body[_RESULT.size:]), tricks, score)
+  except (KeyError, IndexError, TypeError, struct.error), e:
+    raise DecodeError('Bad message %r (%s).' % (data, e))
+
+
+def Frame(message):
+  """Returns message with its length prefix.
+
+  Raises:
+    Error if the message is too long to frame.
+  """
+  if len(message) > MAX_FRAME:
+    raise Error('A message of %d bytes is too long.' % len(message))
+  return _FRAME.pack(len(message)) + message
+
+
+def EncodeBatch(events):
+  """Returns the frames of a sequence of table events, concatenated."""
+  return ''.join([Frame(EncodeEvent(e)) for e in events])
+
+
+class Reader(object):
+  """Splits a stream of frames into messages."""
+  def __init__(self):
+    self._buffer = ''
+
+  def Feed(self, data):
+    """Add bytes read from the stream.
+
+    Returns:
+      The list of messages completed by data.
+    """
+    buf = self._buffer + data
+    messages = []
+    start = 0
+    while len(buf) - start >= _FRAME.size:
+      size = _FRAME.unpack_from(buf, start)[0]
+      end = start + _FRAME.size + size
+      if end > len(buf):
+        break
+      messages.append(buf[start + _FRAME.size:end])
+      start = end
+    self._buffer = buf[start:]
+    return messages
+
+  def Pending(self):
+    """Returns the number of bytes of incomplete frames held."""
+    return len(self._buffer)
+
+
+def DecodeBatch(data):
+  """Returns the table events of a batch of frames.
+
+  Raises:
+    DecodeError if data does not end on a frame boundary.
+  """
+  reader = Reader()
+  events = [DecodeEvent(m) for m in reader.Feed(data)]
+  if reader.Pending():
+    raise DecodeError('The batch ends in the middle of a frame.')
+  return events
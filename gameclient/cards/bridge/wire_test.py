@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.bridge import wire
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+from gameclient.cards.bridge import table
+
+
+class TestWire(unittest.TestCase):
+  def testCalls(self):
+    calls = list(rules.ALL_CALLS)
+    data = wire.EncodeCalls(calls)
+    self.assertEqual(data, ''.join(chr(i) for i in xrange(38)))
+    decoded = wire.DecodeCalls(data)
+    self.failUnless(all(a is b for a, b in zip(decoded, calls)))
+    self.failUnless(wire.DecodeCall(wire.EncodeCall(rules.Double()))
+                    is rules.ALL_CALLS[rules.Double.index])
+    self.assertRaises(wire.DecodeError, wire.DecodeCall, chr(38))
+    self.assertRaises(wire.DecodeError, wire.DecodeCalls, '\0\x01\xff')
+
+  def testCards(self):
+    cards = [cardlib.Card.FromIndex(i) for i in xrange(52)]
+    data = wire.EncodeCards(cards)
+    self.assertEqual(len(data), 52)
+    self.assertEqual(wire.EncodeCard(cardlib.Card.NewCard('AS')), chr(51))
+    decoded = wire.DecodeCards(data)
+    self.failUnless(all(a is b for a, b in zip(decoded, cards)))
+    self.assertRaises(wire.DecodeError, wire.DecodeCard, chr(52))
+
+  def testHand(self):
+    deck = cardlib.Deck(random.Random(1).shuffle)
+    for _ in xrange(4):
+      hand = deck.PickSet(13)
+      data = wire.EncodeHand(hand)
+      self.assertEqual(len(data), wire.HAND_BYTES)
+      self.assertEqual(wire.DecodeHand(data), hand)
+    self.assertRaises(wire.DecodeError, wire.DecodeHand, '\0' * 6)
+    self.assertRaises(wire.DecodeError, wire.DecodeHand, '\xff' * 7)
+
+  def testContract(self):
+    for contract in (rules.Contract(None, None),
+                     rules.Contract(rules.ParseCalls('3N')[0], 2),
+                     rules.Contract(rules.ParseCalls('4S')[0], 1, True),
+                     rules.Contract(rules.ParseCalls('7C')[0], 3, False,
+                                    True)):
+      decoded = wire.DecodeContract(wire.EncodeContract(contract))
+      self.assertEqual(repr(decoded), repr(contract))
+    self.assertRaises(wire.DecodeError, wire.DecodeContract, '\x02\0')
+    self.assertRaises(wire.DecodeError, wire.DecodeContract, '\x05')
+
+  def testEvents(self):
+    lobby = table.Lobby(boards=2, seed=5)
+
+    class Recorder(table.LocalClient):
+      events = []
+
+      def Send(self, event):
+        self.events.append(event)
+        table.LocalClient.Send(self, event)
+
+    for seat in xrange(4):
+      Recorder(lobby, 'x', seat, name='pl\xc3\xa4yer').Join()
+    lobby.Pump()
+    events = Recorder.events
+    self.assertEqual(set(e[0] for e in events),
+                     set(['sit', 'deal', 'turn', 'call', 'contract', 'dummy',
+                          'play', 'trick', 'result']))
+    events.append(('leave', 2))
+    batch = wire.EncodeBatch(events)
+    self.assertEqual(repr(wire.DecodeBatch(batch)), repr(events))
+    self.assertRaises(wire.DecodeError, wire.DecodeBatch, batch[:-1])
+    self.assertRaises(wire.DecodeError, wire.DecodeEvent, '\x09\0')
+    self.assertRaises(wire.DecodeError, wire.DecodeEvent, '\xff')
+
+  def testNames(self):
+    for name in ('bob', 'b\xc3\xa4b'):
+      self.assertEqual(wire.DecodeEvent(wire.EncodeEvent(('sit', 1, name))),
+                       ('sit', 1, name))
+    self.assertEqual(wire.DecodeEvent(wire.EncodeEvent(('sit', 1, u'b\xe4b'))),
+                     ('sit', 1, 'b\xc3\xa4b'))
+
+  def testEncodeErrors(self):
+    hand = cardlib.CardSet.FromBits(1)
+    wire.EncodeEvent(('deal', wire.MAX_BOARD, 0, (False, False), hand))
+    self.assertRaises(wire.Error, wire.EncodeEvent,
+                      ('deal', wire.MAX_BOARD + 1, 0, (False, False), hand))
+    self.assertRaises(wire.Error, wire.EncodeEvent,
+                      ('result', 70000, rules.Contract(None, None), 0, 0))
+    self.assertRaises(wire.Error, wire.EncodeEvent, ('trick', 256))
+
+  def testReader(self):
+    messages = ['', 'a', 'bc' * 300]
+    stream = ''.join(wire.Frame(m) for m in messages)
+    for chunk in (1, 2, 7, len(stream)):
+      reader = wire.Reader()
+      received = []
+      for i in xrange(0, len(stream), chunk):
+        received.extend(reader.Feed(stream[i:i + chunk]))
+      self.assertEqual(received, messages)
+      self.assertEqual(reader.Pending(), 0)
+    self.assertRaises(wire.Error, wire.Frame, 'x' * (wire.MAX_FRAME + 1))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,8 +1,11 @@
 #!/usr/bin/python
 # Copyright 2009 Matt Rudary (matt@rudary.com)
 
+import bisect
 import random
 
+from gameclient import instrument
+
 
 class Error(Exception):
   """Base exception class for this module."""
@@ -12,26 +15,52 @@ class EmptyDeckException(Error):
   """Your deck is out of cards."""
 
 
+_METRICS = instrument.METRICS
+
+
 class Card(object):
-  """Represents a playing card."""
+  """Represents a playing card.
+
+  Cards are interned, immutable flyweights: Card(suit, rank) always returns
+  the same object for a given suit and rank, so cards compare and hash by
+  identity.
+  """
+  __slots__ = ('suit', 'rank', 'index')
+
   class Suit(object):
-    def __init__(self, name, abbrev):
-      self.name = name
-      self.abbrev = abbrev
+    """A card suit. Suits are interned and compare by identity."""
+    __slots__ = ('name', 'abbrev', 'index')
+    _BY_ABBREV = {}
+
+    def __new__(cls, name, abbrev):
+      suit = cls._BY_ABBREV.get(abbrev)
+      if suit is not None:
+        if suit.name != name:
+          raise Error('Suit %s already exists as %s.' % (abbrev, suit.name))
+        return suit
+      suit = object.__new__(cls)
+      object.__setattr__(suit, 'name', name)
+      object.__setattr__(suit, 'abbrev', abbrev)
+      object.__setattr__(suit, 'index', len(cls._BY_ABBREV))
+      cls._BY_ABBREV[abbrev] = suit
+      return suit
 
     @staticmethod
     def NewSuit(abbrev):
-      # TODO(matt): if this becomes a bottleneck, d should be created once
-      # instead of on-the-fly
-      d = dict((s.abbrev, s) for s in Card.Suits())
-      return d[abbrev]
+      return Card.Suit._BY_ABBREV[abbrev]
+
+    def __setattr__(self, name, value):
+      raise AttributeError('Suit objects are immutable.')
+
+    def __reduce__(self):
+      return (_NewSuit, (self.abbrev,))
 
     def __eq__(self, other):
-      if not isinstance(other, Card.Suit):
-        return False
-      return self.name == other.name
+      return self is other
     def __ne__(self, other):
-      return not self == other
+      return self is not other
+    def __hash__(self):
+      return object.__hash__(self)
     def __cmp__(self, other):
       """Somewhat arbitrary, but oh well."""
       return cmp(self.name, other.name)
@@ -60,25 +89,58 @@ class Card(object):
   THREE = 3
   TWO = 2
   ACELO = 1
-  # rules engines should set ACE to ACEHI or ACELO to reflect the 
-  # default ordering of the cards if one exists, updating REVERSE_RANK_MAP
-  # as well.
+  # The rank of the ace in the default, ace-high ordering. Games that order
+  # the ranks differently pass a RankOrder (see ACE_LOW) rather than
+  # changing this.
   ACE = ACEHI
   RANK_MAP = {TEN: '0', JACK: 'J', QUEEN: 'Q', KING: 'K',
               ACE: 'A', ACEHI: 'A', ACELO: 'A'} 
-  RANK_MAP.update((i, '%d' % i) for i in xrange(1, 10))
+  RANK_MAP.update((i, '%d' % i) for i in xrange(2, 10))
   REVERSE_RANK_MAP = dict((v, k) for k,v in RANK_MAP.iteritems())
   REVERSE_RANK_MAP[ACE] = 'A'
 
-  def __init__(self, suit, rank):
-    """Initialize a Card.
+  def __new__(cls, suit, rank):
+    """Look up a Card.
 
     Arguments:
       suit: A Card.Suit object.
       rank: One of Card.ACE, Card.TWO, ...
+
+    Raises:
+      Error if there is no such card.
+    """
+    try:
+      return _CARDS[(suit, rank)]
+    except KeyError:
+      raise Error('There is no card of rank %s in %s.'
+                  % (repr(rank), repr(suit)))
+
+  @staticmethod
+  def NewCard(short, order=None):
+    """Look up a Card by its short name, e.g. 'AS', '0H' or 'TH'.
+
+    Arguments:
+      short: The short name.
+      order: The RankOrder that decides which card is the ace; ACE_HIGH by
+             default.
     """
-    self.suit = suit
-    self.rank = rank
+    return (order or ACE_HIGH).NewCard(short)
+
+  @staticmethod
+  def FromIndex(index, order=None):
+    """Look up a Card by its index in [0, 51] (see CardSet).
+
+    Arguments:
+      index: The index.
+      order: As for NewCard.
+    """
+    return (order or ACE_HIGH).cards[index]
+
+  def __setattr__(self, name, value):
+    raise AttributeError('Card objects are immutable.')
+
+  def __reduce__(self):
+    return (Card, (self.suit, self.rank))
 
   def value(self):
     return (self.suit, self.rank)
@@ -88,13 +150,9 @@ class Card(object):
     return [Card.CLUBS, Card.DIAMONDS, Card.HEARTS, Card.SPADES]
 
   @staticmethod
-  def Ranks():
-    if Card.ACE == Card.ACELO:
-      return xrange(1, 14)
-    elif Card.ACE == Card.ACEHI:
-      return xrange(2, 15)
-    else:
-      return range(2,14) + [Card.ACE]
+  def Ranks(order=None):
+    """Returns the ranks from lowest to highest in order (ACE_HIGH)."""
+    return (order or ACE_HIGH).ranks
 
   @staticmethod
   def RankShort(rank):
@@ -105,19 +163,290 @@ class Card(object):
     return suit.abbrev
 
   def __str__(self):
-    return '%s%s' % (RankShort(self.rank), SuitShort(self.suit))
+    return '%s%s' % (Card.RankShort(self.rank), Card.SuitShort(self.suit))
   def __repr__(self):
     return 'Card(%s, %d)' % (repr(self.suit), self.rank)
 
 
+def _NewSuit(abbrev):
+  return Card.Suit.NewSuit(abbrev)
+
+
+SUIT_BITS = 13
+HAND_SIZE = 13
+LANE_MASK = (1 << SUIT_BITS) - 1
+# LANE_LENGTH[lane] is the number of cards in a suit's lane of CardSet bits.
+LANE_LENGTH = [bin(i).count('1') for i in xrange(1 << SUIT_BITS)]
+
+
+def _InternCards():
+  """Build the 52 cards, plus the ace-low variants of the aces."""
+  cards = {}
+  for suit in Card.Suits():
+    for rank in xrange(Card.ACELO, Card.ACEHI + 1):
+      card = object.__new__(Card)
+      object.__setattr__(card, 'suit', suit)
+      object.__setattr__(card, 'rank', rank)
+      if rank == Card.ACELO:
+        index = suit.index * SUIT_BITS + Card.ACEHI - 2
+      else:
+        index = suit.index * SUIT_BITS + rank - 2
+      object.__setattr__(card, 'index', index)
+      cards[(suit, rank)] = card
+  return cards
+
+_CARDS = _InternCards()
+
+
+def _PlaceKeys(positions):
+  """Returns, by Card.index, the place in positions of each card's lane."""
+  keys = [0] * (4 * SUIT_BITS)
+  for place, position in enumerate(positions):
+    for suit in xrange(4):
+      keys[suit * SUIT_BITS + position] = place
+  return tuple(keys)
+
+
+class RankOrder(object):
+  """An immutable ordering of the ranks, for one kind of game.
+
+  A RankOrder decides which Card object stands for the ace and how ranks
+  compare. Everything is computed when the order is created, so that
+  games with different orders can run side by side, in any thread,
+  without sharing mutable state. Use the ACE_HIGH and ACE_LOW instances.
+
+  Attributes:
+    name: A description, e.g. 'ace high'.
+    ace: Card.ACEHI or Card.ACELO.
+    ranks: The ranks, lowest first.
+    positions: The CardSet lane position (0 for the two, 12 for the ace)
+               of each rank, lowest first.
+    cards: The Cards indexed by Card.index.
+    deck: The Cards of a fresh deck, by suit and then rank.
+  """
+  __slots__ = ('name', 'ace', 'ranks', 'positions', 'cards', 'deck',
+               '_keys', '_short')
+
+  def __init__(self, name, ace):
+    set_ = object.__setattr__
+    set_(self, 'name', name)
+    set_(self, 'ace', ace)
+    if ace == Card.ACELO:
+      ranks = tuple(xrange(Card.ACELO, Card.KING + 1))
+    else:
+      ranks = tuple(xrange(Card.TWO, Card.ACEHI + 1))
+    set_(self, 'ranks', ranks)
+    # The ace's lane position is that of Card.ACEHI.
+    positions = tuple((r if r != ace else Card.ACEHI) - 2 for r in ranks)
+    set_(self, 'positions', positions)
+    cards = []
+    for suit in Card.Suits():
+      for rank in xrange(2, 14):
+        cards.append(Card(suit, rank))
+      cards.append(Card(suit, ace))
+    set_(self, 'cards', tuple(cards))
+    set_(self, 'deck', tuple(Card(s, r) for s in Card.Suits()
+                             for r in ranks))
+    # _keys[i] is the place in ranks of the card with index i.
+    set_(self, '_keys', _PlaceKeys(positions))
+    short = dict((str(c), c) for c in cards)
+    short.update(('T' + c.suit.abbrev, c) for c in cards
+                 if c.rank == Card.TEN)
+    set_(self, '_short', short)
+
+  def __setattr__(self, name, value):
+    raise AttributeError('RankOrder objects are immutable.')
+
+  def __reduce__(self):
+    return (_RankOrder, (self.ace,))
+
+  def Key(self, card):
+    """Returns card's place in the order of ranks, from 0 for the lowest."""
+    return self._keys[card.index]
+
+  def Keys(self):
+    """Returns the tuple of Key values, indexed by Card.index."""
+    return self._keys
+
+  def NewCard(self, short):
+    """Look up a Card by its short name, e.g. 'AS', '0H' or 'TH'."""
+    try:
+      return self._short[short.upper()]
+    except KeyError:
+      raise Error('"%s" is not a card.' % short)
+
+  def Sorted(self, cards):
+    """Returns cards sorted by suit and then rank, lowest first."""
+    keys = self._keys
+    return sorted(cards, key=lambda c: (c.suit.index, keys[c.index]))
+
+  def __repr__(self):
+    return 'RankOrder(%s)' % self.name
+
+
+ACE_HIGH = RankOrder('ace high', Card.ACEHI)
+ACE_LOW = RankOrder('ace low', Card.ACELO)
+
+
+def _RankOrder(ace):
+  if ace == Card.ACELO:
+    return ACE_LOW
+  return ACE_HIGH
+
+
+class CardSet(object):
+  """An immutable set of cards packed into a 52-bit integer.
+
+  Each suit occupies a 13-bit lane (clubs in the low bits, then diamonds,
+  hearts and spades). Within a lane the two is the lowest bit and the ace
+  the highest, whatever the game's RankOrder.
+  """
+  __slots__ = ('bits',)
+
+  def __init__(self, cards=()):
+    """Initialize a CardSet.
+
+    Arguments:
+      cards: An iterable of Card objects.
+    """
+    bits = 0
+    for card in cards:
+      bits |= 1 << card.index
+    self.bits = bits
+
+  @staticmethod
+  def FromBits(bits):
+    """Build a CardSet directly from its integer representation."""
+    s = CardSet.__new__(CardSet)
+    s.bits = bits
+    return s
+
+  def __reduce__(self):
+    return (_CardSetFromBits, (self.bits,))
+
+  def __or__(self, other):
+    return CardSet.FromBits(self.bits | other.bits)
+
+  def __and__(self, other):
+    return CardSet.FromBits(self.bits & other.bits)
+
+  def __sub__(self, other):
+    return CardSet.FromBits(self.bits & ~other.bits)
+
+  def __xor__(self, other):
+    return CardSet.FromBits(self.bits ^ other.bits)
+
+  def __eq__(self, other):
+    if not isinstance(other, CardSet):
+      return False
+    return self.bits == other.bits
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash(self.bits)
+
+  def __nonzero__(self):
+    return self.bits != 0
+
+  def __len__(self):
+    return bin(self.bits).count('1')
+
+  def __contains__(self, card):
+    return bool(self.bits >> card.index & 1)
+
+  def __iter__(self):
+    """Yields the cards in the set, by suit and then from two to ace."""
+    return self.Cards()
+
+  def Cards(self, order=None):
+    """Yields the cards in the set, by suit and then from two to ace.
+
+    Arguments:
+      order: The RankOrder that decides which card is the ace; ACE_HIGH by
+             default.
+    """
+    cards = (order or ACE_HIGH).cards
+    bits = self.bits
+    while bits:
+      low = bits & -bits
+      yield cards[low.bit_length() - 1]
+      bits ^= low
+
+  def Add(self, card):
+    """Returns a new CardSet that also contains card."""
+    return CardSet.FromBits(self.bits | 1 << card.index)
+
+  def Remove(self, card):
+    """Returns a new CardSet that does not contain card."""
+    return CardSet.FromBits(self.bits & ~(1 << card.index))
+
+  def SuitBits(self, suit):
+    """Returns the 13-bit lane for suit as an integer."""
+    return self.bits >> (suit.index * SUIT_BITS) & LANE_MASK
+
+  def Suit(self, suit):
+    """Returns a CardSet holding only the cards of suit."""
+    shift = suit.index * SUIT_BITS
+    return CardSet.FromBits(self.bits & (LANE_MASK << shift))
+
+  def SuitLength(self, suit):
+    """Returns the number of cards of suit in the set."""
+    return LANE_LENGTH[self.SuitBits(suit)]
+
+  def Highest(self, suit, order=None):
+    """Returns the highest Card of suit in the set, or None.
+
+    Arguments:
+      suit: A Card.Suit.
+      order: The RankOrder to rank by; ACE_HIGH by default.
+    """
+    return self._Extreme(suit, order or ACE_HIGH, reversed)
+
+  def Lowest(self, suit, order=None):
+    """Returns the lowest Card of suit in the set, or None.
+
+    Arguments:
+      suit: A Card.Suit.
+      order: The RankOrder to rank by; ACE_HIGH by default.
+    """
+    return self._Extreme(suit, order or ACE_HIGH, iter)
+
+  def _Extreme(self, suit, order, direction):
+    lane = self.SuitBits(suit)
+    if not lane:
+      return None
+    shift = suit.index * SUIT_BITS
+    if order is ACE_HIGH:
+      if direction is iter:
+        return order.cards[shift + (lane & -lane).bit_length() - 1]
+      return order.cards[shift + lane.bit_length() - 1]
+    for position in direction(order.positions):
+      if lane >> position & 1:
+        return order.cards[shift + position]
+
+  def __repr__(self):
+    return 'CardSet(%s)' % repr(list(self))
+
+
+def _CardSetFromBits(bits):
+  return CardSet.FromBits(bits)
+
+
 class Deck(object):
   """Represents a deck of playing cards."""
-  def __init__(self):
-    self._deck = []
-    for suit in Card.Suits():
-      for rank in Card.Ranks():
-        self._deck.append(Card(suit, rank))
-    self.Shuffle()
+  def __init__(self, shuf=random.shuffle, order=None):
+    """Initialize a shuffled Deck.
+
+    Arguments:
+      shuf: As for Shuffle. The deck starts in a fixed order, so a seeded
+            shuf gives a reproducible deck.
+      order: The game's RankOrder, which decides which card is the ace;
+             ACE_HIGH by default.
+    """
+    self.order = order or ACE_HIGH
+    self._deck = list(self.order.deck)
+    self.Shuffle(shuf)
 
   def Shuffle(self, shuf=random.shuffle):
     """Shuffle the cards remaining in the deck.
@@ -127,6 +456,8 @@ class Deck(object):
             place and, optionally, a function r() that returns floats in
             [0.0, 1.0).
     """
+    if _METRICS.enabled:
+      return _METRICS.Call('deck_shuffle', (), shuf, self._deck)
     shuf(self._deck)
 
   def Pick(self, n=None):
@@ -141,6 +472,11 @@ class Deck(object):
       By default, a single Card. If n is not None, a sequence
       containing n Cards.
     """
+    if _METRICS.enabled:
+      return _METRICS.Call('deck_pick', (), self._Pick, n)
+    return self._Pick(n)
+
+  def _Pick(self, n):
     if n is None:
       if len(self._deck) == 0:
         raise EmptyDeckException("No more cards.")
@@ -154,3 +490,477 @@ class Deck(object):
       del self._deck[-n:]
       return cards
     return []
+
+  def PickSet(self, n):
+    """Take n cards off the top of the deck as a CardSet.
+
+    Arguments:
+      n: An integer; the number of cards to take.
+
+    Returns:
+      A CardSet containing n Cards.
+    """
+    return CardSet(self.Pick(n))
+
+  def Remove(self, cards):
+    """Remove specific cards from the deck.
+
+    Arguments:
+      cards: A CardSet or a sequence of Cards, all of which must still be
+             in the deck.
+
+    Raises:
+      Error if some card is no longer in the deck.
+    """
+    if not isinstance(cards, CardSet):
+      cards = CardSet(cards)
+    remaining = CardSet(self._deck)
+    if cards - remaining:
+      raise Error('Cards not in the deck: %s' % repr(cards - remaining))
+    self._deck = [c for c in self._deck if c not in cards]
+
+
+def CardBits(exclude=0):
+  """Returns a list of one power of two per card, for cards not in exclude.
+
+  A hand dealt from a shuffle of the list is the SliceBits of a slice.
+  """
+  return [1 << i for i in xrange(4 * SUIT_BITS) if not exclude >> i & 1]
+
+
+def SliceBits(bits, start, end):
+  """Returns the CardSet bits of the hand bits[start:end] of CardBits.
+
+  The bits are distinct powers of two, so their sum is their bitwise or.
+  """
+  return sum(bits[start:end])
+
+
+class DeckPool(object):
+  """Deals hands from one preallocated deck, reshuffled in place.
+
+  Unlike Deck, which builds a new list of cards and is used up as cards
+  are picked, a DeckPool keeps a single array of card bits and shuffles
+  it again for every deal instead of building a new deck. A DeckPool is
+  not thread-safe; give each thread its own.
+  """
+  def __init__(self, rand=None, order=None):
+    """Initialize a DeckPool.
+
+    Arguments:
+      rand: A random.Random, or a seed for one. A fresh random.Random by
+            default.
+      order: The game's RankOrder; ACE_HIGH by default.
+    """
+    if rand is None or not isinstance(rand, random.Random):
+      rand = random.Random(rand)
+    self._shuffle = rand.shuffle
+    self.order = order or ACE_HIGH
+    self._bits = CardBits()
+
+  def DealBits(self, hands=4, size=HAND_SIZE):
+    """Shuffle and deal, returning the hands as CardSet bits.
+
+    Arguments:
+      hands: The number of hands.
+      size: The number of cards in each hand.
+
+    Raises:
+      Error if there are not enough cards.
+    """
+    if hands * size > len(self._bits):
+      raise Error('Cannot deal %d hands of %d cards.' % (hands, size))
+    bits = self._bits
+    self._shuffle(bits)
+    return [SliceBits(bits, i, i + size)
+            for i in xrange(0, hands * size, size)]
+
+  def Deal(self, hands=4, size=HAND_SIZE):
+    """Shuffle and deal, returning a list of CardSets; see DealBits."""
+    return [CardSet.FromBits(b) for b in self.DealBits(hands, size)]
+
+  def Cards(self):
+    """Shuffle and return all the cards, in a new list."""
+    self._shuffle(self._bits)
+    cards = self.order.cards
+    return [cards[b.bit_length() - 1] for b in self._bits]
+
+
+# SUIT_MASKS[i] is the CardSet bits of the suit with index i.
+SUIT_MASKS = tuple(LANE_MASK << (i * SUIT_BITS) for i in xrange(4))
+_NO_TRUMP = 4
+# Stands for the game's own trump suit in TrickGame's arguments.
+_DEFAULT = object()
+
+
+class TrickGame(object):
+  """The trick-taking rules of a card game, compiled into tables.
+
+  A card's power in a trick depends only on the trump suit, the suit led
+  and the card, so TrickGame computes it for every combination when the
+  game is created. Finding the winner of a trick is then a table lookup
+  per card, and the legal plays are a mask of the hand.
+
+  Trump suits are given as Card.Suits, or None for no trump.
+  """
+  def __init__(self, ranks=ACE_HIGH, trump=None, players=4,
+               must_trump=False):
+    """Initialize a TrickGame.
+
+    Arguments:
+      ranks: The game's RankOrder, or any ordering of the lane positions
+             range(SUIT_BITS), lowest first.
+      trump: The game's usual trump suit, or None.
+      players: The number of cards in a trick.
+      must_trump: Whether a player who cannot follow suit must trump if
+                  able.
+
+    Raises:
+      Error if ranks is not an ordering of the lane positions.
+    """
+    if isinstance(ranks, RankOrder):
+      strength = ranks.Keys()
+      ranks = ranks.positions
+    else:
+      if sorted(ranks) != range(SUIT_BITS):
+        raise Error('Bad rank order: %r' % (ranks,))
+      strength = _PlaceKeys(ranks)
+    self.ranks = tuple(ranks)
+    self.trump = trump
+    self.players = players
+    self.must_trump = must_trump
+    # _strength[i] is the place in ranks of the card with index i.
+    self._strength = strength
+    # _power[trump][led][i] is the power of the card with index i: 0 if it
+    # can not win, then the cards of the suit led and then the trumps.
+    self._power = []
+    for trump_index in xrange(_NO_TRUMP + 1):
+      by_led = []
+      for led in xrange(4):
+        power = []
+        for index in xrange(4 * SUIT_BITS):
+          suit = index // SUIT_BITS
+          if suit == trump_index:
+            power.append(1 + 2 * SUIT_BITS + strength[index])
+          elif suit == led:
+            power.append(1 + strength[index])
+          else:
+            power.append(0)
+        by_led.append(tuple(power))
+      self._power.append(tuple(by_led))
+    self._power = tuple(self._power)
+
+  def _TrumpIndex(self, trump):
+    if trump is _DEFAULT:
+      trump = self.trump
+    if trump is None:
+      return _NO_TRUMP
+    return trump.index
+
+  def Strength(self, card):
+    """Returns the place of card's rank in the game's order, from 0."""
+    return self._strength[card.index]
+
+  def Power(self, led, trump=_DEFAULT):
+    """Returns the table of card powers for a trick.
+
+    Arguments:
+      led: The Card.Suit led.
+      trump: The trump suit, or None.
+
+    Returns:
+      A tuple indexed by Card.index; a card with greater power beats one
+      with less, and a card with power 0 can not win the trick.
+    """
+    return self._power[self._TrumpIndex(trump)][led.index]
+
+  def WinningPosition(self, cards, trump=_DEFAULT):
+    """Returns the position in cards of the card that wins the trick.
+
+    Arguments:
+      cards: A sequence of Cards, starting with the card led.
+      trump: The trump suit, or None; the game's trump by default.
+    """
+    power = self._power[self._TrumpIndex(trump)][cards[0].suit.index]
+    best = 0
+    top = power[cards[0].index]
+    for i in xrange(1, len(cards)):
+      p = power[cards[i].index]
+      if p > top:
+        best = i
+        top = p
+    return best
+
+  def Winner(self, cards, leader, trump=_DEFAULT):
+    """Returns the player who wins a trick.
+
+    Arguments:
+      cards: A sequence of Cards, starting with the card led.
+      leader: The offset of the player on lead.
+      trump: As for WinningPosition.
+    """
+    return (leader + self.WinningPosition(cards, trump)) % self.players
+
+  def LegalMask(self, hand, led, trump=_DEFAULT):
+    """Returns the cards that may be played to a trick, as CardSet bits.
+
+    Arguments:
+      hand: The CardSet bits of the player's hand.
+      led: The Card.Suit led, or None if the player is on lead.
+      trump: As for WinningPosition.
+    """
+    if led is None:
+      return hand
+    follow = hand & SUIT_MASKS[led.index]
+    if follow:
+      return follow
+    if self.must_trump:
+      trump_index = self._TrumpIndex(trump)
+      if trump_index != _NO_TRUMP:
+        trumps = hand & SUIT_MASKS[trump_index]
+        if trumps:
+          return trumps
+    return hand
+
+  def LegalPlays(self, hand, trick, trump=_DEFAULT):
+    """Returns the CardSet of cards in hand that may be played to trick.
+
+    Arguments:
+      hand: A CardSet, or a sequence of Cards.
+      trick: A sequence of the Cards already played, starting with the
+             card led.
+      trump: As for WinningPosition.
+    """
+    if not isinstance(hand, CardSet):
+      hand = CardSet(hand)
+    led = None
+    if trick:
+      led = trick[0].suit
+    return CardSet.FromBits(self.LegalMask(hand.bits, led, trump))
+
+
+# Deal indexing.
+#
+# A deal of four 13-card hands is numbered by ranking each of the first
+# three hands among the cards left for it, in colexicographic order of
+# Card.index, and combining the ranks as the digits of a mixed-radix
+# number: N's hand is the most significant digit. Ranks are computed a
+# byte of the hand's bits at a time from precomputed tables, and hands
+# after the first are first compressed to the cards still undealt.
+
+DEAL_HANDS = 4
+DECK_SIZE = DEAL_HANDS * HAND_SIZE
+_FULL_DECK = (1 << DECK_SIZE) - 1
+
+
+def _Binomials(n):
+  table = [[1] + [0] * n]
+  for i in xrange(1, n + 1):
+    prev = table[-1]
+    table.append([1] + [prev[j - 1] + prev[j] for j in xrange(1, n + 1)])
+  return table
+
+_BINOMIAL = _Binomials(DECK_SIZE)
+# The number of ways to deal each hand from the cards left for it.
+_HAND_WAYS = [_BINOMIAL[DECK_SIZE - i * HAND_SIZE][HAND_SIZE]
+              for i in xrange(DEAL_HANDS - 1)]
+DEALS = _HAND_WAYS[0] * _HAND_WAYS[1] * _HAND_WAYS[2]
+DEAL_KEY_BYTES = 12
+
+_BYTES = (DECK_SIZE + 7) // 8
+_POP8 = [bin(i).count('1') for i in xrange(256)]
+
+
+# _BYTE_POSITIONS[j][b] lists the positions of the set bits of b, as byte
+# j of a larger integer.
+_BYTE_POSITIONS = [[tuple(8 * j + bit for bit in xrange(8) if b >> bit & 1)
+                    for b in xrange(256)] for j in xrange(_BYTES)]
+
+
+def _Positions(bits):
+  """Returns the ascending list of the positions of the set bits of bits."""
+  positions = []
+  for j, table in enumerate(_BYTE_POSITIONS):
+    positions.extend(table[bits >> 8 * j & 255])
+  return positions
+
+
+def _RankTable(j):
+  """Returns the table of byte j's shares of colex ranks.
+
+  Entry c << 8 | b is the sum of C(p, c + i + 1) over the set bits of b,
+  where p is the bit's position in the hand and i the number of set bits
+  of b below it, given c set bits in the lower bytes.
+  """
+  table = [0] * ((HAND_SIZE + 1) << 8)
+  for c in xrange(HAND_SIZE + 1):
+    for b in xrange(1, 256):
+      # Add the top bit's term to the entry for the bits below it.
+      top = b.bit_length() - 1
+      i = c + _POP8[b]
+      p = 8 * j + top
+      share = table[c << 8 | b ^ 1 << top]
+      if i <= HAND_SIZE and p < DECK_SIZE:
+        share += _BINOMIAL[p][i]
+      table[c << 8 | b] = share
+  return table
+
+_RANK_BYTES = [_RankTable(j) for j in xrange(_BYTES)]
+
+
+def _PextTable():
+  """_PEXT[k << 8 | b] packs the bits of b that are set in k."""
+  table = [0] * (1 << 16)
+  for k in xrange(1, 256):
+    # Pack the bits above k's lowest bit, then add that one if it is kept.
+    low = k & 1
+    rest = (k >> 1) << 8
+    for b in xrange(256):
+      table[k << 8 | b] = table[rest | b >> 1] << low | (b & low)
+  return table
+
+_PEXT = _PextTable()
+
+
+def _ColexRank(bits):
+  # Unrolled over the 7 bytes of a 52-bit hand.
+  r0, r1, r2, r3, r4, r5, r6 = _RANK_BYTES
+  b = bits & 255
+  rank = r0[b]
+  c = _POP8[b] << 8
+  b = bits >> 8 & 255
+  rank += r1[c | b]
+  c += _POP8[b] << 8
+  b = bits >> 16 & 255
+  rank += r2[c | b]
+  c += _POP8[b] << 8
+  b = bits >> 24 & 255
+  rank += r3[c | b]
+  c += _POP8[b] << 8
+  b = bits >> 32 & 255
+  rank += r4[c | b]
+  c += _POP8[b] << 8
+  b = bits >> 40 & 255
+  rank += r5[c | b]
+  c += _POP8[b] << 8
+  return rank + r6[c | bits >> 48]
+
+
+def _Compress(bits, keep):
+  """Packs the bits of bits that are set in keep into the low bits."""
+  out = 0
+  n = 0
+  for j in xrange(_BYTES):
+    k = keep >> 8 * j & 255
+    out |= _PEXT[k << 8 | bits >> 8 * j & 255] << n
+    n += _POP8[k]
+  return out
+
+
+# _COLUMN[i] lists C(p, i) for p in [0, DECK_SIZE], in ascending order.
+_COLUMN = [[_BINOMIAL[p][i] for p in xrange(DECK_SIZE + 1)]
+           for i in xrange(HAND_SIZE + 1)]
+
+
+def _ColexUnrank(rank, cards):
+  """Returns the bits of the hand with the given rank among cards.
+
+  Arguments:
+    rank: The colex rank of the hand.
+    cards: The ascending list of Card.index values the hand is dealt from.
+  """
+  bits = 0
+  hi = len(cards)
+  for i in xrange(HAND_SIZE, 0, -1):
+    column = _COLUMN[i]
+    # The largest p with C(p, i) <= rank.
+    p = bisect.bisect_right(column, rank, i - 1, hi) - 1
+    rank -= column[p]
+    bits |= 1 << cards[p]
+    hi = p
+  return bits
+
+
+def _DealBits(hands):
+  bits = []
+  for hand in hands:
+    if not isinstance(hand, CardSet):
+      hand = CardSet(hand)
+    bits.append(hand.bits)
+  if len(bits) != DEAL_HANDS:
+    raise Error('A deal has %d hands, not %d.' % (DEAL_HANDS, len(bits)))
+  if any(_LaneCount(b) != HAND_SIZE for b in bits):
+    raise Error('Every hand of a deal must hold %d cards.' % HAND_SIZE)
+  if bits[0] | bits[1] | bits[2] | bits[3] != _FULL_DECK:
+    raise Error('The hands of a deal must not share cards.')
+  return bits
+
+
+def _LaneCount(bits):
+  return (LANE_LENGTH[bits & LANE_MASK]
+          + LANE_LENGTH[bits >> SUIT_BITS & LANE_MASK]
+          + LANE_LENGTH[bits >> 2 * SUIT_BITS & LANE_MASK]
+          + LANE_LENGTH[bits >> 3 * SUIT_BITS])
+
+
+def DealIndex(hands):
+  """Number a deal.
+
+  Arguments:
+    hands: A sequence of 4 CardSets (or sequences of Cards) of 13 cards
+           each, together holding the whole deck.
+
+  Returns:
+    An integer in [0, DEALS); see DealFromIndex.
+
+  Raises:
+    Error if hands is not a deal.
+  """
+  n, e, s, _ = _DealBits(hands)
+  left = _FULL_DECK & ~n
+  index = _ColexRank(n)
+  index = index * _HAND_WAYS[1] + _ColexRank(_Compress(e, left))
+  left &= ~e
+  return index * _HAND_WAYS[2] + _ColexRank(_Compress(s, left))
+
+
+def DealFromIndex(index):
+  """Returns the deal numbered index by DealIndex, as 4 CardSets."""
+  if not 0 <= index < DEALS:
+    raise Error('There is no deal %s.' % repr(index))
+  index, s = divmod(index, _HAND_WAYS[2])
+  n, e = divmod(index, _HAND_WAYS[1])
+  left = _FULL_DECK
+  hands = []
+  for rank in (n, e, s):
+    bits = _ColexUnrank(rank, _Positions(left))
+    hands.append(bits)
+    left &= ~bits
+  hands.append(left)
+  return [CardSet.FromBits(h) for h in hands]
+
+
+def DealKey(hands):
+  """Returns DealIndex(hands) as a 12-byte big-endian string."""
+  index = DealIndex(hands)
+  return ('%024x' % index).decode('hex')
+
+
+def DealFromKey(key):
+  """Returns the deal whose DealKey is key, as 4 CardSets."""
+  if len(key) != DEAL_KEY_BYTES:
+    raise Error('A deal key is %d bytes, not %d.'
+                % (DEAL_KEY_BYTES, len(key)))
+  return DealFromIndex(long(key.encode('hex'), 16))
+
+
+def RandomDeal(rand=random):
+  """Deal uniformly at random from a single random integer.
+
+  Arguments:
+    rand: A random.Random, or the random module.
+
+  Returns:
+    A list of 4 CardSets.
+  """
+  return DealFromIndex(rand.randrange(DEALS))
@@ -3,9 +3,46 @@
 
 from gameclient.cards import cardlib
 
+import pickle
+import random
 import unittest
 
 
+class TestCard(unittest.TestCase):
+  def testInterning(self):
+    C = cardlib.Card
+    self.failUnless(C(C.SPADES, C.ACE) is C(C.SPADES, C.ACE))
+    self.failUnless(C(C.HEARTS, C.ACELO) is not C(C.HEARTS, C.ACEHI))
+    self.assertEqual(C(C.HEARTS, C.ACELO).index, C(C.HEARTS, C.ACEHI).index)
+    self.failUnless(C.Suit.NewSuit('H') is C.HEARTS)
+    self.failUnless(C.Suit('Hearts', 'H') is C.HEARTS)
+    self.assertNotEqual(C(C.SPADES, C.KING), C(C.HEARTS, C.KING))
+    self.assertRaises(cardlib.Error, C, C.SPADES, 15)
+
+  def testNewCard(self):
+    C = cardlib.Card
+    self.failUnless(C.NewCard('AS') is C(C.SPADES, C.ACE))
+    self.failUnless(C.NewCard('th') is C(C.HEARTS, C.TEN))
+    self.failUnless(C.NewCard('0H') is C(C.HEARTS, C.TEN))
+    self.failUnless(C.NewCard('2c') is C(C.CLUBS, C.TWO))
+    self.assertRaises(cardlib.Error, C.NewCard, '1S')
+    self.assertEqual(str(C.NewCard('QD')), 'QD')
+
+  def testImmutable(self):
+    C = cardlib.Card
+    card = C(C.SPADES, C.ACE)
+    self.assertRaises(AttributeError, setattr, card, 'rank', C.KING)
+    self.assertRaises(AttributeError, setattr, C.SPADES, 'name', 'Swords')
+
+  def testPickle(self):
+    C = cardlib.Card
+    card = C(C.DIAMONDS, C.SEVEN)
+    for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+      self.failUnless(pickle.loads(pickle.dumps(card, protocol)) is card)
+      self.failUnless(pickle.loads(pickle.dumps(C.CLUBS, protocol))
+                      is C.CLUBS)
+
+
 class TestDeck(unittest.TestCase):
   def setUp(self):
     self.deck = cardlib.Deck()
@@ -29,5 +66,258 @@ class TestDeck(unittest.TestCase):
                      "2H3H4H5H6H7H8H9H0HJHQHKHAH" +
                      "2S3S4S5S6S7S8S9S0SJSQSKSAS")
 
+  def testPickSet(self):
+    hand = self.deck.PickSet(13)
+    self.assert_(isinstance(hand, cardlib.CardSet))
+    self.assertEqual(len(hand), 13)
+    rest = cardlib.CardSet(self.deck.Pick(39))
+    self.failIf(hand & rest)
+    self.assertEqual(len(hand | rest), 52)
+
+  def testRemove(self):
+    ace = cardlib.Card(cardlib.Card.SPADES, cardlib.Card.ACE)
+    self.deck.Remove(cardlib.CardSet([ace]))
+    self.failIf(ace in cardlib.CardSet(self.deck.Pick(51)))
+    self.assertRaises(cardlib.Error, self.deck.Remove, [ace])
+
+
+class TestDeckPool(unittest.TestCase):
+  def testDeal(self):
+    pool = cardlib.DeckPool(random.Random(4))
+    seen = set()
+    for _ in xrange(20):
+      hands = pool.Deal()
+      self.assertEqual([len(h) for h in hands], [13] * 4)
+      self.assertEqual(len(hands[0] | hands[1] | hands[2] | hands[3]), 52)
+      seen.add(hands[0])
+    self.assertEqual(len(seen), 20)
+    self.assertEqual([len(cardlib.CardSet.FromBits(b))
+                      for b in pool.DealBits(3, 5)], [5] * 3)
+    self.assertRaises(cardlib.Error, pool.Deal, 5, 13)
+
+  def testReproducible(self):
+    one = cardlib.DeckPool(7)
+    two = cardlib.DeckPool(random.Random(7))
+    for _ in xrange(3):
+      self.assertEqual(one.Deal(), two.Deal())
+
+  def testCards(self):
+    C = cardlib.Card
+    cards = cardlib.DeckPool(1, cardlib.ACE_LOW).Cards()
+    self.assertEqual(len(set(cards)), 52)
+    self.failUnless(C(C.HEARTS, C.ACELO) in cards)
+
+  def testCardBits(self):
+    bits = cardlib.CardBits(0b101)
+    self.assertEqual(len(bits), 50)
+    self.assertEqual(bits[:2], [0b10, 0b1000])
+    self.assertEqual(cardlib.SliceBits(bits, 0, 2), 0b1010)
+
+
+class TestCardSet(unittest.TestCase):
+  def setUp(self):
+    C = cardlib.Card
+    self.hand = cardlib.CardSet([C(C.SPADES, C.ACE), C(C.SPADES, C.TEN),
+                                 C(C.SPADES, C.TWO), C(C.HEARTS, C.KING),
+                                 C(C.CLUBS, C.FIVE)])
+
+  def testMembership(self):
+    C = cardlib.Card
+    self.failUnless(C(C.SPADES, C.ACE) in self.hand)
+    self.failUnless(C(C.HEARTS, C.KING) in self.hand)
+    self.failIf(C(C.HEARTS, C.ACE) in self.hand)
+    self.failIf(C(C.DIAMONDS, C.FIVE) in self.hand)
+    self.assertEqual(len(self.hand), 5)
+    self.failIf(cardlib.CardSet())
+
+  def testSetOperations(self):
+    C = cardlib.Card
+    other = cardlib.CardSet([C(C.SPADES, C.ACE), C(C.DIAMONDS, C.THREE)])
+    self.assertEqual(len(self.hand | other), 6)
+    self.assertEqual(list(self.hand & other), [C(C.SPADES, C.ACE)])
+    self.assertEqual(len(self.hand - other), 4)
+    self.failIf(C(C.SPADES, C.ACE) in self.hand - other)
+    self.assertEqual(self.hand.Remove(C(C.CLUBS, C.FIVE)).Add(
+        C(C.CLUBS, C.FIVE)), self.hand)
+
+  def testSuits(self):
+    C = cardlib.Card
+    self.assertEqual(self.hand.SuitLength(C.SPADES), 3)
+    self.assertEqual(self.hand.SuitLength(C.DIAMONDS), 0)
+    self.assertEqual(self.hand.Highest(C.SPADES).rank, C.ACE)
+    self.assertEqual(self.hand.Lowest(C.SPADES).rank, C.TWO)
+    self.assertEqual(self.hand.Highest(C.CLUBS).rank, C.FIVE)
+    self.failUnless(self.hand.Highest(C.DIAMONDS) is None)
+    self.assertEqual(len(self.hand.Suit(C.SPADES)), 3)
+
+  def testIteration(self):
+    self.assertEqual([(c.suit.abbrev, c.rank) for c in self.hand],
+                     [('C', 5), ('H', 13), ('S', 2), ('S', 10), ('S', 14)])
+    self.assertEqual(cardlib.CardSet(self.hand), self.hand)
+    self.assertEqual(cardlib.CardSet.FromBits(self.hand.bits), self.hand)
+    for protocol in xrange(3):
+      self.assertEqual(pickle.loads(pickle.dumps(self.hand, protocol)),
+                       self.hand)
+
+
+class TestRankOrder(unittest.TestCase):
+  def testOrders(self):
+    C = cardlib.Card
+    high, low = cardlib.ACE_HIGH, cardlib.ACE_LOW
+    self.failUnless(high.NewCard('AS') is C(C.SPADES, C.ACEHI))
+    self.failUnless(low.NewCard('AS') is C(C.SPADES, C.ACELO))
+    self.failUnless(C.NewCard('AS', low) is C(C.SPADES, C.ACELO))
+    self.failUnless(C.FromIndex(12, low) is C(C.CLUBS, C.ACELO))
+    self.assertEqual(list(C.Ranks(low)), range(1, 14))
+    self.assertEqual(list(C.Ranks()), range(2, 15))
+    self.assertEqual(high.Key(C.NewCard('AH')), 12)
+    self.assertEqual(low.Key(C.NewCard('AH')), 0)
+    self.assertEqual(low.Key(C.NewCard('KH')), 12)
+    self.assertEqual([str(c) for c in low.Sorted(
+        [C.NewCard('KS'), C.NewCard('AS'), C.NewCard('2C')])],
+        ['2C', 'AS', 'KS'])
+    self.assertRaises(AttributeError, setattr, high, 'ace', C.ACELO)
+    self.failUnless(pickle.loads(pickle.dumps(low)) is low)
+
+  def testCardSets(self):
+    C = cardlib.Card
+    low = cardlib.ACE_LOW
+    hand = cardlib.CardSet([C.NewCard(c) for c in ('AS', 'KS', '2S')])
+    self.failUnless(hand.Highest(C.SPADES) is C(C.SPADES, C.ACEHI))
+    self.failUnless(hand.Highest(C.SPADES, low) is C(C.SPADES, C.KING))
+    self.failUnless(hand.Lowest(C.SPADES, low) is C(C.SPADES, C.ACELO))
+    self.failUnless(hand.Lowest(C.SPADES) is C(C.SPADES, C.TWO))
+    self.failUnless(C(C.SPADES, C.ACELO) in list(hand.Cards(low)))
+    deck = cardlib.Deck(lambda x: None, low)
+    self.failUnless(deck.Pick(52)[0] is C(C.CLUBS, C.ACELO))
+
+  def testConcurrentGames(self):
+    import threading
+    from gameclient.cards.bridge import rules
+    C = cardlib.Card
+    results = []
+    def Bridge():
+      for _ in xrange(200):
+        rules.Rules(players=['N', 'E', 'S', 'W'], dealer=0)
+        results.append(C.NewCard('AS').rank)
+    def AceLow():
+      deck = cardlib.Deck(order=cardlib.ACE_LOW)
+      for _ in xrange(200):
+        results.append(cardlib.ACE_LOW.NewCard('AS').rank)
+    threads = [threading.Thread(target=Bridge),
+               threading.Thread(target=AceLow)]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    self.assertEqual(sorted(set(results)), [C.ACELO, C.ACEHI])
+    self.assertEqual(results.count(C.ACELO), 200)
+    self.assertEqual(C.ACE, C.ACEHI)
+
+
+class TestTrickGame(unittest.TestCase):
+  def setUp(self):
+    self.C = cardlib.Card
+
+  def testWinner(self):
+    C = self.C
+    game = cardlib.TrickGame()
+    trick = [C.NewCard(c) for c in ('TS', 'AS', '2H', '3S')]
+    self.assertEqual(game.WinningPosition(trick), 1)
+    self.assertEqual(game.Winner(trick, 3), 0)
+    self.assertEqual(game.Winner(trick, 3, C.HEARTS), 1)
+    self.assertEqual(game.Winner(trick, 0, C.CLUBS), 1)
+    spades = cardlib.TrickGame(trump=C.SPADES)
+    off = [C.NewCard(c) for c in ('2H', 'AH', '2S', 'AD')]
+    self.assertEqual(spades.Winner(off, 1), 3)
+    self.assertEqual(spades.Winner(off, 1, None), 2)
+    self.assertEqual(cardlib.TrickGame(players=3).Winner(off[:3], 2), 0)
+
+  def testRankOrder(self):
+    C = self.C
+    low = cardlib.TrickGame(ranks=cardlib.ACE_LOW)
+    trick = [C.NewCard(c) for c in ('KH', 'AH')]
+    self.assertEqual(low.WinningPosition(trick), 0)
+    self.assertEqual(cardlib.TrickGame().WinningPosition(trick), 1)
+    self.assertEqual(low.Strength(C.NewCard('AC')), 0)
+    self.assertEqual(low.Strength(C.NewCard('KC')), 12)
+    # An ordering of lane positions works like the equivalent RankOrder.
+    positions = cardlib.TrickGame(ranks=cardlib.ACE_LOW.positions)
+    for card in cardlib.ACE_LOW.cards:
+      self.assertEqual(positions.Strength(card), cardlib.ACE_LOW.Key(card))
+    self.assertRaises(cardlib.Error, cardlib.TrickGame, range(12))
+
+  def testMatchesMax(self):
+    C = self.C
+    game = cardlib.TrickGame()
+    rand = random.Random(9)
+    deck = list(cardlib.Deck().Pick(52))
+    for _ in xrange(200):
+      trick = rand.sample(deck, 4)
+      trump = rand.choice(C.Suits() + [None])
+      trumps = [(c.rank, i) for i, c in enumerate(trick) if c.suit == trump]
+      followers = [(c.rank, i) for i, c in enumerate(trick)
+                   if c.suit == trick[0].suit]
+      self.assertEqual(game.WinningPosition(trick, trump),
+                       max(trumps or followers)[1])
+
+  def testLegalPlays(self):
+    C = self.C
+    hand = cardlib.CardSet([C.NewCard(c) for c in ('AS', 'TS', 'KH', '2C')])
+    game = cardlib.TrickGame()
+    self.assertEqual(game.LegalPlays(hand, []), hand)
+    self.assertEqual(game.LegalPlays(hand, [C.NewCard('2S')]),
+                     hand.Suit(C.SPADES))
+    self.assertEqual(game.LegalPlays(list(hand), [C.NewCard('2D')]), hand)
+    ruff = cardlib.TrickGame(trump=C.HEARTS, must_trump=True)
+    self.assertEqual(ruff.LegalPlays(hand, [C.NewCard('2D')]),
+                     hand.Suit(C.HEARTS))
+    self.assertEqual(ruff.LegalPlays(hand, [C.NewCard('2D')], C.DIAMONDS),
+                     hand)
+    self.assertEqual(ruff.LegalMask(hand.bits, None), hand.bits)
+
+
+class TestDealIndex(unittest.TestCase):
+  def testRoundTrip(self):
+    rand = random.Random(11)
+    for _ in xrange(200):
+      deck = cardlib.Deck(rand.shuffle)
+      deal = [deck.PickSet(13) for _ in xrange(4)]
+      index = cardlib.DealIndex(deal)
+      self.failUnless(0 <= index < cardlib.DEALS)
+      self.assertEqual(cardlib.DealFromIndex(index), deal)
+      key = cardlib.DealKey(deal)
+      self.assertEqual(len(key), cardlib.DEAL_KEY_BYTES)
+      self.assertEqual(cardlib.DealFromKey(key), deal)
+
+  def testEnds(self):
+    self.assertEqual(cardlib.DEALS, 53644737765488792839237440000)
+    first = cardlib.DealFromIndex(0)
+    self.assertEqual(cardlib.DealIndex(first), 0)
+    # The lowest-ranked deal gives N the 13 lowest cards.
+    self.assertEqual(first[0].bits, (1 << 13) - 1)
+    last = cardlib.DealFromIndex(cardlib.DEALS - 1)
+    self.assertEqual(cardlib.DealIndex(last), cardlib.DEALS - 1)
+    self.assertEqual(last[0].bits, ((1 << 13) - 1) << 39)
+    self.assertEqual(cardlib.DealIndex([list(h) for h in last]),
+                     cardlib.DEALS - 1)
+
+  def testRandomDeal(self):
+    deal = cardlib.RandomDeal(random.Random(3))
+    self.assertEqual(map(len, deal), [13] * 4)
+    self.assertEqual(cardlib.DealFromIndex(cardlib.DealIndex(deal)), deal)
+
+  def testErrors(self):
+    deal = cardlib.DealFromIndex(12345)
+    self.assertRaises(cardlib.Error, cardlib.DealFromIndex, -1)
+    self.assertRaises(cardlib.Error, cardlib.DealFromIndex, cardlib.DEALS)
+    self.assertRaises(cardlib.Error, cardlib.DealIndex, deal[:3])
+    self.assertRaises(cardlib.Error, cardlib.DealIndex,
+                      [deal[0], deal[0], deal[2], deal[3]])
+    self.assertRaises(cardlib.Error, cardlib.DealIndex,
+                      [deal[0] | deal[1], deal[1], deal[2], deal[3]])
+    self.assertRaises(cardlib.Error, cardlib.DealFromKey, 'short')
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Deal many boards at once with NumPy.
+
+A batch of N deals is an (N, 52) uint8 array. Each row is a permutation of
+the card indices 0 to 51 (see cardlib.Card.index); hand i of a deal is
+row[13 * i:13 * (i + 1)]. Hands can also be had as (N, 4) uint64 arrays of
+52-bit masks in the layout of cardlib.CardSet.
+
+This module requires NumPy.
+"""
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from gameclient.cards import cardlib
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+HANDS = 4
+DECK_SIZE = HANDS * cardlib.HAND_SIZE
+
+
+def _CheckNumpy():
+  if numpy is None:
+    raise Error('This module requires NumPy.')
+
+
+def NewGenerator(seed=None):
+  """Create a seeded NumPy random number generator.
+
+  Returns a numpy.random.Generator where available, and a
+  numpy.random.RandomState on older versions of NumPy.
+  """
+  _CheckNumpy()
+  if hasattr(numpy.random, 'default_rng'):
+    return numpy.random.default_rng(seed)
+  return numpy.random.RandomState(seed)
+
+
+def _Uniform(rng, shape):
+  if hasattr(rng, 'random'):
+    return rng.random(shape)
+  return rng.random_sample(shape)
+
+
+def HandMasks(cards):
+  """Pack dealt cards into per-hand 52-bit masks.
+
+  Arguments:
+    cards: An (N, 52) array of card indices, as described above.
+
+  Returns:
+    An (N, 4) uint64 array; entry [d, i] is the mask of hand i of deal d.
+  """
+  _CheckNumpy()
+  bits = numpy.left_shift(numpy.uint64(1), cards.astype(numpy.uint64))
+  return numpy.bitwise_or.reduce(
+      bits.reshape(len(cards), HANDS, cardlib.HAND_SIZE), axis=2)
+
+
+class Deals(object):
+  """A batch of deals, converted to cards only on demand."""
+  def __init__(self, cards):
+    """Initialize a batch.
+
+    Arguments:
+      cards: An (N, 52) uint8 array of card indices, as described above.
+    """
+    self.cards = cards
+    self._masks = None
+
+  def __len__(self):
+    return len(self.cards)
+
+  def Masks(self):
+    """Returns the (N, 4) uint64 array of hand masks."""
+    if self._masks is None:
+      self._masks = HandMasks(self.cards)
+    return self._masks
+
+  def __getitem__(self, i):
+    """Returns deal i as a tuple of 4 cardlib.CardSets."""
+    return tuple(cardlib.CardSet.FromBits(int(m)) for m in self.Masks()[i])
+
+  def __iter__(self):
+    for i in xrange(len(self)):
+      yield self[i]
+
+  def Hands(self, i):
+    """Returns deal i as 4 lists of cardlib.Cards, in dealt order."""
+    row = self.cards[i]
+    return [[cardlib.Card.FromIndex(c)
+             for c in row[h * cardlib.HAND_SIZE:(h + 1) * cardlib.HAND_SIZE]]
+            for h in xrange(HANDS)]
+
+
+def DealBatch(n, rng=None):
+  """Deal n boards at once.
+
+  Arguments:
+    n: The number of deals.
+    rng: A numpy.random.Generator or RandomState (see NewGenerator), or an
+         integer seed. A fresh, unseeded generator by default.
+
+  Returns:
+    A Deals object.
+  """
+  _CheckNumpy()
+  if rng is None or isinstance(rng, (int, long)):
+    rng = NewGenerator(rng)
+  # Sorting a row of uniform keys yields a uniform permutation.
+  cards = _Uniform(rng, (n, DECK_SIZE)).argsort(axis=1).astype(numpy.uint8)
+  return Deals(cards)
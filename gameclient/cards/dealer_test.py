@@ -0,0 +1,46 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards import dealer
+
+import unittest
+
+from gameclient.cards import cardlib
+
+
+@unittest.skipIf(dealer.numpy is None, 'NumPy is not installed.')
+class TestDealer(unittest.TestCase):
+  def setUp(self):
+    self.deals = dealer.DealBatch(200, 7)
+
+  def testShape(self):
+    numpy = dealer.numpy
+    self.assertEqual(self.deals.cards.shape, (200, 52))
+    self.assertEqual(self.deals.cards.dtype, numpy.uint8)
+    self.failUnless((numpy.sort(self.deals.cards, axis=1)
+                     == numpy.arange(52)).all())
+    masks = self.deals.Masks()
+    self.assertEqual(masks.shape, (200, 4))
+    full = numpy.bitwise_or.reduce(masks, axis=1)
+    self.failUnless((full == numpy.uint64((1 << 52) - 1)).all())
+
+  def testReproducible(self):
+    again = dealer.DealBatch(200, 7)
+    self.failUnless((again.cards == self.deals.cards).all())
+    other = dealer.DealBatch(200, 8)
+    self.failIf((other.cards == self.deals.cards).all())
+
+  def testConversion(self):
+    self.assertEqual(len(self.deals), 200)
+    hands = self.deals[3]
+    self.assertEqual(len(hands), 4)
+    self.assertEqual(map(len, hands), [13] * 4)
+    lists = self.deals.Hands(3)
+    for hand, cards in zip(hands, lists):
+      self.assertEqual(cardlib.CardSet(cards), hand)
+      self.failUnless(isinstance(cards[0], cardlib.Card))
+    self.assertEqual(len(list(self.deals)), 200)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""The rules of Hearts, on cardlib.TrickGame.
+
+Four players play 13 tricks without trumps, trying not to take hearts
+(a point each) or the queen of spades (13 points). The holder of the two
+of clubs leads it to the first trick, on which no points may be discarded;
+hearts may not be led until one has been played. A player who takes all
+26 points shoots the moon, and each other player scores 26 instead.
+"""
+
+import random
+
+from gameclient.cards import cardlib
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class RulesException(Error):
+  """Base exception class for errors raised by methods of Rules."""
+
+
+class IllegalPlay(RulesException):
+  """Exception indicating a card may not be played."""
+
+
+ORDER = cardlib.ACE_HIGH
+TRICKS = cardlib.TrickGame(ORDER)
+TWO_OF_CLUBS = cardlib.Card(cardlib.Card.CLUBS, cardlib.Card.TWO)
+QUEEN_OF_SPADES = cardlib.Card(cardlib.Card.SPADES, cardlib.Card.QUEEN)
+_HEARTS = cardlib.SUIT_MASKS[cardlib.Card.HEARTS.index]
+_POINT_CARDS = _HEARTS | 1 << QUEEN_OF_SPADES.index
+MOON = 26
+
+
+def Points(cards):
+  """Returns the points in a CardSet of cards taken."""
+  bits = cards.bits
+  points = bin(bits & _HEARTS).count('1')
+  if bits >> QUEEN_OF_SPADES.index & 1:
+    points += 13
+  return points
+
+
+class Rules(object):
+  """Run a game of Hearts."""
+  def __init__(self, players):
+    """Initialize a game of Hearts.
+
+    Arguments:
+      players: An array of 4 players.
+
+    Raises:
+      RulesException: when there's a problem with the arguments.
+    """
+    if len(players) != 4:
+      raise RulesException('%d is the wrong number of players.' % len(players))
+    self.players = players
+    self.order = ORDER
+
+  def Deal(self, shuf=random.shuffle):
+    """Deal the whole deck.
+
+    Returns:
+      A list of 4 cardlib.CardSet objects, one per player, starting with
+      self.players[0].
+    """
+    deck = cardlib.Deck(shuf, ORDER)
+    return [deck.PickSet(13) for _ in xrange(4)]
+
+  def FirstLeader(self, hands):
+    """Returns the offset into self.players of the holder of the 2C."""
+    for i, hand in enumerate(hands):
+      if TWO_OF_CLUBS in hand:
+        return i
+    raise RulesException('Nobody holds the two of clubs.')
+
+  def LegalPlays(self, hand, trick, hearts_broken, first_trick=False):
+    """Determine which cards may be played to a trick.
+
+    Arguments:
+      hand: A cardlib.CardSet holding the cards of the player to act.
+      trick: A list of cardlib.Card objects already played to the trick,
+             starting with the card led.
+      hearts_broken: Whether a heart has been played to an earlier trick.
+      first_trick: Whether this is the first trick of the hand.
+
+    Returns:
+      A cardlib.CardSet of the cards in hand that may be played.
+    """
+    bits = hand.bits
+    if not trick:
+      if first_trick and bits >> TWO_OF_CLUBS.index & 1:
+        return cardlib.CardSet([TWO_OF_CLUBS])
+      if not hearts_broken and bits & ~_HEARTS:
+        bits &= ~_HEARTS
+      return cardlib.CardSet.FromBits(bits)
+    legal = TRICKS.LegalMask(bits, trick[0].suit)
+    if first_trick and legal & ~_POINT_CARDS:
+      legal &= ~_POINT_CARDS
+    return cardlib.CardSet.FromBits(legal)
+
+  def IsLegal(self, hand, trick, card, hearts_broken, first_trick=False):
+    """Returns True if card may be played; see LegalPlays."""
+    return card in self.LegalPlays(hand, trick, hearts_broken, first_trick)
+
+  def EvaluateTrick(self, cards, leader):
+    """Determine the winner of a trick.
+
+    Arguments:
+      cards: A list of cardlib.Card objects, starting with the card led.
+      leader: The offset into self.players of the player on lead.
+
+    Returns:
+      The offset into self.players of the player who won the trick.
+    """
+    return TRICKS.Winner(cards, leader, None)
+
+  def Score(self, taken):
+    """Score a hand.
+
+    Arguments:
+      taken: A list of 4 cardlib.CardSets, the cards each player took.
+
+    Returns:
+      A list of the points each player scores for the hand.
+    """
+    points = [Points(cards) for cards in taken]
+    if MOON in points:
+      return [MOON - p for p in points]
+    return points
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.hearts import rules
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+
+
+def _Set(*names):
+  return cardlib.CardSet([cardlib.Card.NewCard(n) for n in names])
+
+
+class TestHeartsRules(unittest.TestCase):
+  def setUp(self):
+    self.rules = rules.Rules(players=['N', 'E', 'S', 'W'])
+
+  def testDeal(self):
+    hands = self.rules.Deal(random.Random(1).shuffle)
+    self.assertEqual(len(hands[0] | hands[1] | hands[2] | hands[3]), 52)
+    leader = self.rules.FirstLeader(hands)
+    self.failUnless(rules.TWO_OF_CLUBS in hands[leader])
+    self.assertRaises(rules.RulesException, rules.Rules, ['N', 'E'])
+
+  def testLegalPlays(self):
+    C = cardlib.Card
+    hand = _Set('2C', 'AC', 'QS', '3H', '4H')
+    self.assertEqual(self.rules.LegalPlays(hand, [], False, True),
+                     _Set('2C'))
+    self.assertEqual(self.rules.LegalPlays(hand, [], False),
+                     _Set('2C', 'AC', 'QS'))
+    self.assertEqual(self.rules.LegalPlays(hand, [], True), hand)
+    self.assertEqual(self.rules.LegalPlays(_Set('3H', '4H'), [], False),
+                     _Set('3H', '4H'))
+    # No points on the first trick, unless there is nothing else.
+    led = [C.NewCard('5D')]
+    self.assertEqual(self.rules.LegalPlays(hand, led, False, True),
+                     _Set('2C', 'AC'))
+    self.assertEqual(self.rules.LegalPlays(_Set('QS', '3H'), led, False,
+                                           True), _Set('QS', '3H'))
+    self.assertEqual(self.rules.LegalPlays(hand, [C.NewCard('2S')], False),
+                     _Set('QS'))
+    self.failIf(self.rules.IsLegal(hand, led, C.NewCard('QS'), False, True))
+
+  def testTricksAndScore(self):
+    C = cardlib.Card
+    trick = [C.NewCard(c) for c in ('5S', 'AH', 'KS', 'QS')]
+    self.assertEqual(self.rules.EvaluateTrick(trick, 2), 0)
+    self.assertEqual(rules.Points(cardlib.CardSet(trick)), 14)
+    hearts = cardlib.CardSet([C(C.HEARTS, r) for r in C.Ranks()])
+    self.assertEqual(self.rules.Score(
+        [hearts, _Set('QS'), cardlib.CardSet(), cardlib.CardSet()]),
+        [13, 13, 0, 0])
+    self.assertEqual(self.rules.Score(
+        [hearts | _Set('QS'), cardlib.CardSet(), cardlib.CardSet(),
+         _Set('2C')]), [0, 26, 26, 26])
+
+
+if __name__ == '__main__':
+  unittest.main()
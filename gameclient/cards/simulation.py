@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Running simulations over many boards, reproducibly and in parallel.
+
+A simulation is a function task(board, rand) called once per board number,
+where rand is a random.Random seeded only from the simulation's seed and
+the board number. Results therefore do not depend on how the boards are
+split between processes, so a run on one core and a run on 64 cores give
+the same numbers.
+
+Tasks run in worker processes must be picklable, i.e. defined at the top
+level of a module, and so must their results.
+"""
+
+import hashlib
+import multiprocessing
+import random
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+# Chunks are sized so that each worker gets about this many over a run,
+# which balances the load while keeping the number of messages small.
+CHUNKS_PER_PROCESS = 4
+MAX_CHUNKSIZE = 1000
+
+
+def BoardSeed(seed, board):
+  """Derive the seed for one board from the simulation's seed.
+
+  Arguments:
+    seed: An integer or string; the simulation's seed.
+    board: The board number.
+
+  Returns:
+    A 256-bit integer. Equal seeds give equal results whatever their type,
+    so 1 and 1L, or 'x' and u'x', seed the same boards.
+
+  Raises:
+    Error if seed is not an integer or string.
+  """
+  if isinstance(seed, (int, long)):
+    key = '%d' % seed
+  elif isinstance(seed, basestring):
+    if isinstance(seed, unicode):
+      seed = seed.encode('utf-8')
+    key = repr(seed)
+  else:
+    raise Error('Bad seed: %s' % repr(seed))
+  digest = hashlib.sha256('%s:%d' % (key, board)).hexdigest()
+  return long(digest, 16)
+
+
+def BoardRandom(seed, board):
+  """Returns the random.Random for one board (see BoardSeed)."""
+  return random.Random(BoardSeed(seed, board))
+
+
+def _RunChunk(args):
+  task, seed, start, end = args
+  return [task(board, BoardRandom(seed, board))
+          for board in xrange(start, end)]
+
+
+def ChunkSize(n, processes):
+  """Returns the default number of boards per chunk."""
+  size = n // (processes * CHUNKS_PER_PROCESS)
+  return max(1, min(size, MAX_CHUNKSIZE))
+
+
+def Run(task, n, seed, processes=None, chunksize=None, start=0):
+  """Run a simulation, yielding results in board order.
+
+  Arguments:
+    task: A function task(board, rand) returning the result for a board.
+    n: The number of boards.
+    seed: An integer or string; the simulation's seed.
+    processes: The number of worker processes; by default, the number of
+               CPUs. With 1, boards are run in this process.
+    chunksize: The number of boards sent to a worker at once; by default,
+               from ChunkSize.
+    start: The number of the first board, so that a simulation can be
+           extended without repeating boards.
+
+  Yields:
+    task's result for each board from start to start + n - 1.
+  """
+  if n < 0:
+    raise Error('Bad number of boards: %d' % n)
+  if processes is None:
+    processes = multiprocessing.cpu_count()
+  if processes == 1:
+    for board in xrange(start, start + n):
+      yield task(board, BoardRandom(seed, board))
+    return
+  if chunksize is None:
+    chunksize = ChunkSize(n, processes)
+  chunks = [(task, seed, i, min(i + chunksize, start + n))
+            for i in xrange(start, start + n, chunksize)]
+  pool = multiprocessing.Pool(processes)
+  try:
+    for results in pool.imap(_RunChunk, chunks):
+      for result in results:
+        yield result
+    pool.close()
+  finally:
+    pool.terminate()
+    pool.join()
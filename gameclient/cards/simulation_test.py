@@ -0,0 +1,51 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards import simulation
+
+import unittest
+
+from gameclient.cards import cardlib
+
+
+def _Deal(board, rand):
+  deck = cardlib.Deck(rand.shuffle)
+  return (board, [str(c) for c in deck.Pick(13)])
+
+
+class TestSimulation(unittest.TestCase):
+  def testSeeds(self):
+    self.assertEqual(simulation.BoardSeed(1, 2), simulation.BoardSeed(1, 2))
+    self.assertNotEqual(simulation.BoardSeed(1, 2),
+                        simulation.BoardSeed(1, 3))
+    self.assertNotEqual(simulation.BoardSeed(1, 2),
+                        simulation.BoardSeed(2, 2))
+    self.assertNotEqual(simulation.BoardSeed(1, 2),
+                        simulation.BoardSeed('1', 2))
+    self.assertEqual(simulation.BoardSeed(1, 2), simulation.BoardSeed(1L, 2))
+    self.assertEqual(simulation.BoardSeed('x', 2),
+                     simulation.BoardSeed(u'x', 2))
+    self.assertRaises(simulation.Error, simulation.BoardSeed, 1.0, 2)
+
+  def testReproducible(self):
+    serial = list(simulation.Run(_Deal, 50, 17, processes=1))
+    self.assertEqual([r[0] for r in serial], range(50))
+    self.assertEqual(list(simulation.Run(_Deal, 50, 17, processes=2)),
+                     serial)
+    self.assertEqual(list(simulation.Run(_Deal, 50, 17, processes=3,
+                                         chunksize=7)), serial)
+    self.assertEqual(list(simulation.Run(_Deal, 20, 17, processes=2,
+                                         start=30)), serial[30:])
+    self.assertNotEqual(list(simulation.Run(_Deal, 50, 18, processes=1)),
+                        serial)
+    self.assertEqual(list(simulation.Run(_Deal, 0, 17)), [])
+
+  def testChunkSize(self):
+    self.assertEqual(simulation.ChunkSize(10, 8), 1)
+    self.assertEqual(simulation.ChunkSize(1000, 2), 125)
+    self.assertEqual(simulation.ChunkSize(10 ** 7, 2),
+                     simulation.MAX_CHUNKSIZE)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""The rules of Spades, on cardlib.TrickGame.
+
+Four players in two partnerships (offsets 0 and 2 against 1 and 3) bid
+the number of tricks they will take, then play 13 tricks with spades
+always trumps. Spades may not be led until one has been played, unless
+the leader holds nothing else. A bid of NIL promises to take no tricks.
+"""
+
+import random
+
+from gameclient.cards import cardlib
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+class RulesException(Error):
+  """Base exception class for errors raised by methods of Rules."""
+
+
+ORDER = cardlib.ACE_HIGH
+TRICKS = cardlib.TrickGame(ORDER, trump=cardlib.Card.SPADES)
+NIL = 0
+NIL_BONUS = 100
+TRICK_POINTS = 10
+BAG_LIMIT = 10
+BAG_PENALTY = 100
+_SPADES = cardlib.SUIT_MASKS[cardlib.Card.SPADES.index]
+
+
+class Rules(object):
+  """Run a game of Spades."""
+  def __init__(self, players):
+    """Initialize a game of Spades.
+
+    Arguments:
+      players: An array of 4 players.
+
+    Raises:
+      RulesException: when there's a problem with the arguments.
+    """
+    if len(players) != 4:
+      raise RulesException('%d is the wrong number of players.' % len(players))
+    self.players = players
+    self.order = ORDER
+
+  def Deal(self, shuf=random.shuffle):
+    """Deal the whole deck.
+
+    Returns:
+      A list of 4 cardlib.CardSet objects, one per player, starting with
+      self.players[0].
+    """
+    deck = cardlib.Deck(shuf, ORDER)
+    return [deck.PickSet(13) for _ in xrange(4)]
+
+  def LegalPlays(self, hand, trick, spades_broken):
+    """Determine which cards may be played to a trick.
+
+    Arguments:
+      hand: A cardlib.CardSet holding the cards of the player to act.
+      trick: A list of cardlib.Card objects already played to the trick,
+             starting with the card led.
+      spades_broken: Whether a spade has been played to an earlier trick.
+
+    Returns:
+      A cardlib.CardSet of the cards in hand that may be played.
+    """
+    bits = hand.bits
+    if trick:
+      return cardlib.CardSet.FromBits(TRICKS.LegalMask(bits, trick[0].suit))
+    if not spades_broken and bits & ~_SPADES:
+      bits &= ~_SPADES
+    return cardlib.CardSet.FromBits(bits)
+
+  def EvaluateTrick(self, cards, leader):
+    """Determine the winner of a trick.
+
+    Arguments:
+      cards: A list of cardlib.Card objects, starting with the card led.
+      leader: The offset into self.players of the player on lead.
+
+    Returns:
+      The offset into self.players of the player who won the trick.
+    """
+    return TRICKS.Winner(cards, leader)
+
+  def Score(self, bids, tricks, bags=0):
+    """Score a hand for one partnership.
+
+    A nil bid scores NIL_BONUS if made and loses it if not; the nil
+    bidder's tricks count only as overtricks (bags). Otherwise the
+    partnership scores TRICK_POINTS per trick bid if it takes at least
+    that many, with a point per bag, and loses TRICK_POINTS per trick bid
+    if not. Every BAG_LIMIT bags cost BAG_PENALTY.
+
+    Arguments:
+      bids: The two partners' bids; NIL for nil.
+      tricks: The two partners' tricks.
+      bags: The partnership's bags from earlier hands.
+
+    Returns:
+      A pair (points, bags): the points for the hand and the bags carried
+      forward.
+    """
+    points = 0
+    contract = 0
+    made = 0
+    for bid, taken in zip(bids, tricks):
+      if bid == NIL:
+        if taken:
+          points -= NIL_BONUS
+          bags += taken
+        else:
+          points += NIL_BONUS
+      else:
+        contract += bid
+        made += taken
+    if made >= contract:
+      points += TRICK_POINTS * contract + made - contract
+      bags += made - contract
+    else:
+      points -= TRICK_POINTS * contract
+    while bags >= BAG_LIMIT:
+      points -= BAG_PENALTY
+      bags -= BAG_LIMIT
+    return points, bags
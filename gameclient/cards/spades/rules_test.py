@@ -0,0 +1,54 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient.cards.spades import rules
+
+import random
+import unittest
+
+from gameclient.cards import cardlib
+
+
+def _Set(*names):
+  return cardlib.CardSet([cardlib.Card.NewCard(n) for n in names])
+
+
+class TestSpadesRules(unittest.TestCase):
+  def setUp(self):
+    self.rules = rules.Rules(players=['N', 'E', 'S', 'W'])
+
+  def testDeal(self):
+    hands = self.rules.Deal(random.Random(2).shuffle)
+    self.assertEqual([len(h) for h in hands], [13] * 4)
+    self.assertEqual(len(hands[0] | hands[1] | hands[2] | hands[3]), 52)
+
+  def testLegalPlays(self):
+    C = cardlib.Card
+    hand = _Set('AS', '2S', 'KH', '3D')
+    self.assertEqual(self.rules.LegalPlays(hand, [], False), _Set('KH', '3D'))
+    self.assertEqual(self.rules.LegalPlays(hand, [], True), hand)
+    self.assertEqual(self.rules.LegalPlays(_Set('AS', '2S'), [], False),
+                     _Set('AS', '2S'))
+    self.assertEqual(self.rules.LegalPlays(hand, [C.NewCard('5H')], False),
+                     _Set('KH'))
+    self.assertEqual(self.rules.LegalPlays(hand, [C.NewCard('5C')], False),
+                     hand)
+
+  def testEvaluateTrick(self):
+    C = cardlib.Card
+    trick = [C.NewCard(c) for c in ('KH', 'AH', '2S', 'AD')]
+    self.assertEqual(self.rules.EvaluateTrick(trick, 3), 1)
+    trick = [C.NewCard(c) for c in ('KH', 'AH', '2H', 'AD')]
+    self.assertEqual(self.rules.EvaluateTrick(trick, 3), 0)
+
+  def testScore(self):
+    self.assertEqual(self.rules.Score((3, 4), (3, 4)), (70, 0))
+    self.assertEqual(self.rules.Score((3, 4), (5, 4)), (72, 2))
+    self.assertEqual(self.rules.Score((3, 4), (2, 4)), (-70, 0))
+    self.assertEqual(self.rules.Score((rules.NIL, 4), (0, 5)), (141, 1))
+    self.assertEqual(self.rules.Score((rules.NIL, 4), (1, 4)), (-60, 1))
+    self.assertEqual(self.rules.Score((3, 4), (4, 5), bags=8), (-28, 0))
+
+
+if __name__ == '__main__':
+  unittest.main()
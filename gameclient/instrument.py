@@ -0,0 +1,271 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+"""Optional counters, latency histograms and a sampling profiler.
+
+A Recorder keeps counters and latency histograms keyed by a metric name
+and a tuple of (label, value) pairs. METRICS is the Recorder that the
+instrumented operations of the library report to: rules.Rules.EvaluateCall
+(labelled by the type of call), rules.Rules.EvaluateTrick and
+cardlib.Deck's Shuffle and Pick. Each of them checks METRICS.enabled and
+nothing else when the Recorder is disabled, which it is by default:
+
+  instrument.METRICS.Enable()
+  ...
+  print instrument.METRICS.Prometheus()
+
+An operation that raises is counted in errors_total by operation and
+exception class, so rule violations (rules.RulesException) can be told
+apart from other failures.
+
+Profile is a context manager that samples the main thread's stack on a
+profiling timer, for a cheap view of where the time goes in a long run.
+"""
+
+import bisect
+import collections
+import signal
+import threading
+import time
+
+
+class Error(Exception):
+  """Base exception class for this module."""
+
+
+PREFIX = 'gameclient_'
+# Latency bucket bounds in seconds, from 1us to 1s.
+DEFAULT_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4,
+                   5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25,
+                   0.5, 1.0)
+DEFAULT_INTERVAL = 0.001
+
+
+class Histogram(object):
+  """A histogram of values in fixed buckets.
+
+  Attributes:
+    buckets: The ascending upper bounds of the buckets.
+    counts: counts[i] is the number of values v with
+            buckets[i - 1] < v <= buckets[i]; the last count is of values
+            above every bound.
+    count: The number of values.
+    sum: The sum of the values.
+  """
+  def __init__(self, buckets=DEFAULT_BUCKETS):
+    self.buckets = tuple(buckets)
+    self.counts = [0] * (len(self.buckets) + 1)
+    self.count = 0
+    self.sum = 0.0
+
+  def Observe(self, value):
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+    self.count += 1
+    self.sum += value
+
+  def Cumulative(self):
+    """Returns (bound, count of values <= bound) pairs, ending at +inf."""
+    out = []
+    total = 0
+    for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+      total += n
+      out.append((bound, total))
+    return out
+
+
+def _Series(name, labels):
+  if not labels:
+    return name
+  return '%s{%s}' % (name, ','.join(
+      '%s="%s"' % (k, str(v).replace('"', r'\"')) for k, v in labels))
+
+
+def _Bound(bound):
+  if bound == float('inf'):
+    return '+Inf'
+  return repr(bound)
+
+
+class Recorder(object):
+  """Counters and latency histograms; see the module docstring.
+
+  Attributes:
+    enabled: Whether the instrumented operations report here. Checking it
+             is the only cost of a disabled Recorder.
+  """
+  def __init__(self, buckets=DEFAULT_BUCKETS):
+    self.enabled = False
+    self.buckets = buckets
+    self._lock = threading.Lock()
+    self.Reset()
+
+  def Enable(self):
+    self.enabled = True
+
+  def Disable(self):
+    self.enabled = False
+
+  def Reset(self):
+    """Forget every metric."""
+    with self._lock:
+      # _counters[name][labels] and _histograms[name][labels].
+      self._counters = collections.defaultdict(dict)
+      self._histograms = collections.defaultdict(dict)
+
+  def Count(self, name, labels=(), n=1):
+    """Add n to a counter.
+
+    Arguments:
+      name: The metric name.
+      labels: A tuple of (label, value) pairs.
+      n: The amount to add.
+    """
+    with self._lock:
+      series = self._counters[name]
+      series[labels] = series.get(labels, 0) + n
+
+  def Observe(self, name, value, labels=()):
+    """Add a value to a histogram; the arguments are as for Count."""
+    with self._lock:
+      series = self._histograms[name]
+      histogram = series.get(labels)
+      if histogram is None:
+        histogram = series[labels] = Histogram(self.buckets)
+      histogram.Observe(value)
+
+  def Call(self, op, labels, func, *args):
+    """Call func(*args), recording its latency in op_seconds.
+
+    If func raises, the exception is counted in errors_total, labelled by
+    op and the exception's class, and raised again.
+    """
+    start = time.time()
+    try:
+      return func(*args)
+    except Exception, e:
+      self.Count('errors_total', (('op', op), ('error', type(e).__name__)))
+      raise
+    finally:
+      self.Observe(op + '_seconds', time.time() - start, labels)
+
+  def Counter(self, name, labels=()):
+    """Returns the value of a counter, 0 if it has not been counted."""
+    return self._counters.get(name, {}).get(labels, 0)
+
+  def Histogram(self, name, labels=()):
+    """Returns a Histogram, or None if nothing has been observed."""
+    return self._histograms.get(name, {}).get(labels)
+
+  def ToDict(self):
+    """Returns every metric as a dict of plain values.
+
+    The dict maps 'counters' to a dict from series names, like
+    'errors_total{op="rules_evaluate_call",error="InsufficientBid"}', to
+    counts, and 'histograms' to a dict from series names to dicts with the
+    'count', 'sum' and 'buckets' (a list of [bound, cumulative count]) of
+    each histogram.
+    """
+    with self._lock:
+      counters = dict((_Series(name, labels), n)
+                      for name, series in self._counters.iteritems()
+                      for labels, n in series.iteritems())
+      histograms = dict(
+          (_Series(name, labels),
+           {'count': h.count, 'sum': h.sum,
+            'buckets': [[b, n] for b, n in h.Cumulative()]})
+          for name, series in self._histograms.iteritems()
+          for labels, h in series.iteritems())
+    return {'counters': counters, 'histograms': histograms}
+
+  def Prometheus(self, prefix=PREFIX):
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    with self._lock:
+      for name in sorted(self._counters):
+        full = prefix + name
+        lines.append('# TYPE %s counter' % full)
+        for labels, n in sorted(self._counters[name].iteritems()):
+          lines.append('%s %d' % (_Series(full, labels), n))
+      for name in sorted(self._histograms):
+        full = prefix + name
+        lines.append('# TYPE %s histogram' % full)
+        for labels, h in sorted(self._histograms[name].iteritems()):
+          for bound, n in h.Cumulative():
+            lines.append('%s %d' % (
+                _Series(full + '_bucket', labels + (('le', _Bound(bound)),)),
+                n))
+          lines.append('%s %r' % (_Series(full + '_sum', labels), h.sum))
+          lines.append('%s %d' % (_Series(full + '_count', labels), h.count))
+    return '\n'.join(lines) + '\n'
+
+
+METRICS = Recorder()
+
+
+class Profile(object):
+  """A sampling profiler for the main thread, used as a context manager.
+
+    with instrument.Profile() as profile:
+      ...
+    for (filename, function), n in profile.Functions(10): ...
+
+  Every interval seconds of CPU time, a SIGPROF handler records the
+  stack of the code running in the main thread. Only one Profile may be
+  active at a time, and only on platforms with setitimer.
+
+  Attributes:
+    samples: A collections.Counter of stacks, each a tuple of
+             (file, line, function) frames from the outermost in.
+  """
+  def __init__(self, interval=DEFAULT_INTERVAL):
+    self.interval = interval
+    self.samples = collections.Counter()
+    self._previous = None
+
+  def _Sample(self, unused_signum, frame):
+    stack = []
+    while frame is not None:
+      code = frame.f_code
+      stack.append((code.co_filename, frame.f_lineno, code.co_name))
+      frame = frame.f_back
+    stack.reverse()
+    self.samples[tuple(stack)] += 1
+
+  def __enter__(self):
+    if threading.current_thread().name != 'MainThread':
+      raise Error('Profile must be started from the main thread.')
+    if not hasattr(signal, 'setitimer'):
+      raise Error('Profile requires signal.setitimer.')
+    self._previous = signal.signal(signal.SIGPROF, self._Sample)
+    signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+    return self
+
+  def __exit__(self, *unused):
+    signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+  def Total(self):
+    """Returns the number of samples taken."""
+    return sum(self.samples.itervalues())
+
+  def Functions(self, n=None):
+    """Returns the n functions most often running when sampled.
+
+    Returns:
+      A list of ((file, function), samples) pairs, most samples first.
+    """
+    counts = collections.Counter()
+    for stack, k in self.samples.iteritems():
+      if stack:
+        filename, _, function = stack[-1]
+        counts[(filename, function)] += k
+    return counts.most_common(n)
+
+  def Collapsed(self):
+    """Returns the samples in the collapsed-stack format of flame graphs."""
+    lines = []
+    for stack, k in sorted(self.samples.iteritems()):
+      lines.append('%s %d' % (';'.join(
+          '%s (%s:%d)' % (function, filename, line)
+          for filename, line, function in stack), k))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# Copyright 2009 Matt Rudary (matt@rudary.com)
+
+from gameclient import instrument
+
+import json
+import time
+import unittest
+
+from gameclient.cards import cardlib
+from gameclient.cards.bridge import rules
+
+
+def _Busy(seconds):
+  end = time.clock() + seconds
+  n = 0
+  while time.clock() < end:
+    n += 1
+  return n
+
+
+class TestInstrument(unittest.TestCase):
+  def tearDown(self):
+    instrument.METRICS.Disable()
+    instrument.METRICS.Reset()
+
+  def testHistogram(self):
+    h = instrument.Histogram((1, 10))
+    for value in (0.5, 1, 5, 10, 50):
+      h.Observe(value)
+    self.assertEqual(h.counts, [2, 2, 1])
+    self.assertEqual(h.Cumulative(), [(1, 2), (10, 4), (float('inf'), 5)])
+    self.assertEqual((h.count, h.sum), (5, 66.5))
+
+  def testRecorder(self):
+    metrics = instrument.Recorder(buckets=(1.0,))
+    metrics.Count('hands_total', (('seat', 'N'),))
+    metrics.Count('hands_total', (('seat', 'N'),), 2)
+    self.assertEqual(metrics.Counter('hands_total', (('seat', 'N'),)), 3)
+    self.assertEqual(metrics.Counter('hands_total'), 0)
+    self.assertEqual(metrics.Call('add', (), lambda a, b: a + b, 1, 2), 3)
+    self.assertRaises(ZeroDivisionError, metrics.Call, 'div', (),
+                      lambda: 1 / 0)
+    self.assertEqual(metrics.Histogram('add_seconds').count, 1)
+    self.assertEqual(metrics.Histogram('div_seconds').count, 1)
+    self.assertEqual(metrics.Counter(
+        'errors_total', (('op', 'div'), ('error', 'ZeroDivisionError'))), 1)
+    data = json.loads(json.dumps(metrics.ToDict()))
+    self.assertEqual(data['counters']['hands_total{seat="N"}'], 3)
+    self.assertEqual(data['histograms']['add_seconds']['count'], 1)
+    text = metrics.Prometheus()
+    self.failUnless('# TYPE gameclient_hands_total counter\n'
+                    'gameclient_hands_total{seat="N"} 3\n' in text)
+    self.failUnless('# TYPE gameclient_add_seconds histogram\n' in text)
+    self.failUnless('gameclient_add_seconds_bucket{le="+Inf"} 1\n' in text)
+    self.failUnless('gameclient_add_seconds_count 1\n' in text)
+    metrics.Reset()
+    self.assertEqual(metrics.Prometheus(), '\n')
+
+  def testLibrary(self):
+    metrics = instrument.METRICS
+    game = rules.Rules(range(4), 0)
+    one_heart = rules.ParseCalls('1H')[0]
+    game.EvaluateCall([], one_heart)
+    deck = cardlib.Deck()
+    self.assertEqual(metrics.ToDict(), {'counters': {}, 'histograms': {}})
+    metrics.Enable()
+    self.assertEqual(game.EvaluateCall([], one_heart), None)
+    game.EvaluateCall([one_heart], rules.Double())
+    self.assertRaises(rules.InsufficientBid, game.EvaluateCall, [one_heart],
+                      rules.ParseCalls('1D')[0])
+    cards = deck.Pick(4)
+    self.assertEqual(len(cards), 4)
+    deck.Shuffle()
+    self.assertEqual(game.EvaluateTrick(cards, 0, None),
+                     rules.TRICKS.Winner(cards, 0, None))
+    self.assertEqual(metrics.Histogram('rules_evaluate_call_seconds',
+                                       (('call', 'bid'),)).count, 2)
+    self.assertEqual(metrics.Histogram('rules_evaluate_call_seconds',
+                                       (('call', 'double'),)).count, 1)
+    self.assertEqual(metrics.Counter('errors_total',
+                                     (('op', 'rules_evaluate_call'),
+                                      ('error', 'InsufficientBid'))), 1)
+    for name in ('deck_pick_seconds', 'deck_shuffle_seconds',
+                 'rules_evaluate_trick_seconds'):
+      self.assertEqual(metrics.Histogram(name).count, 1)
+    self.assertRaises(cardlib.EmptyDeckException, deck.Pick, 60)
+    self.assertEqual(metrics.Counter('errors_total',
+                                     (('op', 'deck_pick'),
+                                      ('error', 'EmptyDeckException'))), 1)
+
+  def testProfile(self):
+    with instrument.Profile(interval=0.001) as profile:
+      _Busy(0.1)
+    self.failUnless(profile.Total() > 0)
+    functions = [f for (_, f), _ in profile.Functions()]
+    self.failUnless('_Busy' in functions)
+    self.failUnless('_Busy (' in profile.Collapsed())
+
+
+if __name__ == '__main__':
+  unittest.main()
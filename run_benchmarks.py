@@ -0,0 +1,203 @@
+#!/usr/bin/python
+
+"""Run the benchmark suite; see gameclient/benchmark.py.
+
+  run_benchmarks.py [-k PATTERN] [--json OUT] [--baseline FILE]
+                    [--threshold 0.1] [--min-time 0.2] [--repeat 3]
+
+With --baseline, exits with status 1 if any benchmark has regressed.
+"""
+
+import optparse
+import random
+import sys
+
+from gameclient import benchmark
+from gameclient.cards import cardlib
+from gameclient.cards import dealer
+from gameclient.cards.bridge import constrained
+from gameclient.cards.bridge import ddsolver
+from gameclient.cards.bridge import handeval
+from gameclient.cards.bridge import rules
+from gameclient.cards.bridge import scoring
+from gameclient.cards.bridge import wire
+
+Benchmark = benchmark.Benchmark
+
+# A typical competitive auction, and the longest possible one: every bid
+# doubled and redoubled.
+REALISTIC = rules.ParseCalls('1H 1S 2H 2S 3H P P 3S P P X P P P')
+WORST = []
+for _bid in rules.BIDS:
+  WORST.extend([_bid, rules.Double(), rules.Redouble()])
+WORST.extend([rules.Pass()] * 3)
+del _bid
+
+
+def _Hands(seed, cards=13):
+  deck = cardlib.Deck(random.Random(seed).shuffle)
+  hands = [deck.PickSet(13) for _ in xrange(4)]
+  return [cardlib.CardSet(list(h)[:cards]) for h in hands]
+
+
+def _EvaluateCalls(auction):
+  game = rules.Rules(range(4), 0)
+  for i in xrange(len(auction)):
+    game.EvaluateCall(auction[:i], auction[i])
+
+
+def _AppendCalls(auction):
+  a = rules.Auction(range(4), 0)
+  for call in auction:
+    a.Append(call)
+
+
+def _Tricks():
+  hands = _Hands(3)
+  return [[list(h)[i] for h in hands] for i in xrange(13)]
+
+
+def _EvaluateTricks(tricks):
+  game = rules.Rules(range(4), 0)
+  trump = rules.Bid.STRAINS[2]
+  for trick in tricks:
+    game.EvaluateTrick(trick, 1, trump)
+
+
+def _PlayDeal(arg):
+  hands, rand = arg
+  play = rules.Play(hands, 1, None)
+  while not play.IsOver():
+    play.PlayCard(rand.choice(list(play.LegalPlays())))
+
+
+def _Deal(pool):
+  pool.Deal()
+
+
+def _ConstrainedDeal(d):
+  d.DealBits()
+
+
+def _Solve(hands):
+  ddsolver.Solver(hands).Solve(None, 0)
+
+
+def _Scores(contracts):
+  for contract in contracts:
+    for tricks in xrange(14):
+      scoring.DuplicateScore(contract, tricks, False)
+
+
+def _Contracts():
+  return [rules.Contract(bid, 0) for bid in rules.BIDS]
+
+
+def _Evaluate(hands):
+  for hand in hands:
+    handeval.Hcp(hand)
+    handeval.Losers(hand)
+    handeval.ShapeClass(hand)
+
+
+def _WireRoundTrip(arg):
+  hand, calls = arg
+  wire.DecodeHand(wire.EncodeHand(hand))
+  wire.DecodeCalls(wire.EncodeCalls(calls))
+
+
+def _Benchmarks():
+  yield Benchmark('cardlib.deck', lambda _: cardlib.Deck())
+  yield Benchmark('cardlib.shuffle', lambda d: d.Shuffle(),
+                  setup=cardlib.Deck)
+  yield Benchmark('cardlib.pick', lambda _: cardlib.Deck().Pick(13))
+  yield Benchmark('cardlib.pickset', lambda _: cardlib.Deck().PickSet(13))
+  yield Benchmark('cardlib.pool_deal', _Deal,
+                  setup=lambda: cardlib.DeckPool(random.Random(1)))
+  tokens = ['1C', '3nt', 'P', 'X', 'XX', '7S', 'pass', '-']
+  yield Benchmark('rules.new_call',
+                  lambda _: [rules.NewCall(t) for t in tokens],
+                  ops=len(tokens))
+  yield Benchmark('rules.evaluate_call.realistic',
+                  lambda _: _EvaluateCalls(REALISTIC), ops=len(REALISTIC))
+  yield Benchmark('rules.evaluate_call.worst',
+                  lambda _: _EvaluateCalls(WORST), ops=len(WORST))
+  yield Benchmark('rules.auction_append.worst',
+                  lambda _: _AppendCalls(WORST), ops=len(WORST))
+  yield Benchmark('rules.parse_auction',
+                  lambda _: rules.ParseAuction('1H 1S 2H 2S 3H P P 3S P P X '
+                                               'P P P'))
+  yield Benchmark('rules.evaluate_trick', _EvaluateTricks, setup=_Tricks,
+                  ops=13)
+  yield Benchmark('rules.play_deal', _PlayDeal,
+                  setup=lambda: (_Hands(4), random.Random(4)))
+  yield Benchmark('constrained.deal_1nt', _ConstrainedDeal,
+                  setup=lambda: constrained.Dealer(
+                      specs={0: constrained.HandSpec(
+                          hcp=(15, 17), shapes=constrained.BALANCED)},
+                      rand=random.Random(5)))
+  yield Benchmark('ddsolver.ending_5', _Solve, setup=lambda: _Hands(6, 5))
+  yield Benchmark('scoring.duplicate', _Scores, setup=_Contracts,
+                  ops=14 * len(rules.BIDS))
+  yield Benchmark('handeval.scalar', _Evaluate, setup=lambda: _Hands(7),
+                  ops=4)
+  yield Benchmark('wire.round_trip', _WireRoundTrip,
+                  setup=lambda: (_Hands(8)[0], WORST))
+  if dealer.numpy is not None:
+    yield Benchmark('dealer.batch_1000', lambda _: dealer.DealBatch(1000, 9),
+                    ops=1000)
+    yield Benchmark('handeval.batch_1000',
+                    lambda masks: handeval.EvaluateBatch(masks),
+                    setup=lambda: dealer.DealBatch(1000, 9).Masks(),
+                    ops=4000)
+
+
+def _Report(result):
+  print '%-32s %14.1f ops/s %8.2f retained/op' % (
+      result.name, result.ops_per_sec, result.retained_per_op)
+  sys.stdout.flush()
+
+
+def main(argv):
+  parser = optparse.OptionParser(usage='%prog [options]')
+  parser.add_option('-k', dest='pattern', default=None,
+                    help='Run only benchmarks whose names match PATTERN.')
+  parser.add_option('--json', dest='json', default=None,
+                    help='Write the results as JSON to this file.')
+  parser.add_option('--baseline', dest='baseline', default=None,
+                    help='Compare against results saved with --json.')
+  parser.add_option('--threshold', dest='threshold', type='float',
+                    default=benchmark.DEFAULT_THRESHOLD,
+                    help='The slowdown that counts as a regression.')
+  parser.add_option('--min-time', dest='min_time', type='float',
+                    default=benchmark.DEFAULT_MIN_TIME)
+  parser.add_option('--repeat', dest='repeat', type='int',
+                    default=benchmark.DEFAULT_REPEAT)
+  options, _ = parser.parse_args(argv[1:])
+  baseline = None
+  if options.baseline:
+    f = open(options.baseline)
+    try:
+      baseline = benchmark.Load(f)
+    finally:
+      f.close()
+  results = benchmark.Run(_Benchmarks(), options.pattern, options.min_time,
+                          options.repeat, _Report)
+  if options.json:
+    out = open(options.json, 'w')
+    try:
+      benchmark.Save(results, out)
+    finally:
+      out.close()
+  if baseline is not None:
+    regressions = benchmark.Compare(results, baseline, options.threshold)
+    for r in regressions:
+      print 'REGRESSION %s' % r
+    if regressions:
+      return 1
+    print 'No regressions beyond %.0f%%.' % (100 * options.threshold)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
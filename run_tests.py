@@ -1,7 +1,27 @@
 #!/usr/bin/python
 
 from gameclient.cards.cardlib_test import *
+from gameclient.cards.dealer_test import *
+from gameclient.cards.simulation_test import *
 from gameclient.cards.bridge.rules_test import *
+from gameclient.cards.bridge.ddsolver_test import *
+from gameclient.cards.bridge.constrained_test import *
+from gameclient.cards.bridge.scoring_test import *
+from gameclient.cards.bridge.ddtable_test import *
+from gameclient.cards.bridge.board_test import *
+from gameclient.cards.bridge.pbn_test import *
+from gameclient.cards.bridge.lin_test import *
+from gameclient.cards.bridge.boardfile_test import *
+from gameclient.cards.bridge.gamestate_test import *
+from gameclient.cards.bridge.singledummy_test import *
+from gameclient.cards.bridge.table_test import *
+from gameclient.cards.bridge.server_test import *
+from gameclient.cards.bridge.wire_test import *
+from gameclient.cards.bridge.handeval_test import *
+from gameclient.cards.hearts.rules_test import *
+from gameclient.cards.spades.rules_test import *
+from gameclient.benchmark_test import *
+from gameclient.instrument_test import *
 from gameclient.util_test import *
 
 import unittest
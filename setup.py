@@ -11,6 +11,9 @@ setup(name='gameclient',
       packages=['gameclient',
                   'gameclient.cards',
                     'gameclient.cards.bridge',
+                    'gameclient.cards.hearts',
+                    'gameclient.cards.spades',
                 ],
-      data_files=[('gameclient/scripts', ['run_tests.py'])],
+      data_files=[('gameclient/scripts',
+                   ['run_tests.py', 'run_benchmarks.py'])],
       )